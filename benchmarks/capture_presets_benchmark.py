@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Measure the microphone latency presets on this board.
+
+Captures from the ALSA device with each preset ('low-latency', 'balanced',
+'low-cpu') and reports the achieved capture wakeups per second and the CPU used
+by the process. Needs a real microphone; run it on the Raspberry Pi.
+
+Usage:
+    python benchmarks/capture_presets_benchmark.py [--seconds 10] [--rate 44100] [--channels 2] [--device plughw:1,0]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+from tjbot.microphone import MicrophoneController
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0, help='seconds of capture per preset')
+    parser.add_argument('--rate', type=int, default=44100, help='capture sample rate')
+    parser.add_argument('--channels', type=int, default=2, help='capture channels')
+    parser.add_argument('--device', default='', help='ALSA device name')
+    args = parser.parse_args()
+
+    mic = MicrophoneController()
+    mic.initialize(args.rate, args.channels, args.device)
+    results = mic.measure_presets(seconds=args.seconds)
+
+    print(f"{'preset':>12}  {'period':>12}  {'periods':>7}  {'wakeups/s':>9}  {'CPU %':>6}")
+    for preset, r in results.items():
+        print(f"{preset:>12}  {r['period_size']:>5} ({r['period_ms']:4.1f} ms)  {r['period_count']:>7}  "
+              f"{r['wakeups_per_second']:>9.1f}  {r['cpu_percent']:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
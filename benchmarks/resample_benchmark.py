@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the microphone -> STT resample/downmix stage.
+
+Reports the CPU time needed to convert one second of captured audio to each
+engine input format. Run it on the target board (e.g. a Raspberry Pi 3) to get
+Pi-class numbers; onnxruntime and capture threads are not running, so this is
+the cost of the stage alone.
+
+Usage:
+    python benchmarks/resample_benchmark.py [--seconds 30] [--chunk 1024]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+import numpy as np
+
+from tjbot.audio import StreamingResampler
+
+CASES = [
+    # (input rate, input channels, output rate, output channels)
+    (44100, 2, 16000, 1),
+    (44100, 1, 16000, 1),
+    (48000, 2, 16000, 1),
+    (16000, 2, 16000, 1),
+]
+
+
+def run_case(input_rate: int, input_channels: int, output_rate: int, output_channels: int,
+             seconds: float, chunk_frames: int) -> float:
+    rng = np.random.default_rng(0)
+    audio = rng.integers(-8000, 8000, size=(int(input_rate * seconds), input_channels), dtype=np.int16).tobytes()
+    chunk_bytes = chunk_frames * input_channels * 2
+    chunks = [audio[i:i + chunk_bytes] for i in range(0, len(audio), chunk_bytes)]
+
+    resampler = StreamingResampler(input_rate, output_rate, input_channels, output_channels)
+    start = time.process_time()
+    for chunk in chunks:
+        resampler.process(chunk)
+    elapsed = time.process_time() - start
+
+    # CPU milliseconds per second of audio
+    return elapsed * 1000.0 / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=30.0, help='seconds of audio per case')
+    parser.add_argument('--chunk', type=int, default=1024, help='frames per microphone chunk')
+    args = parser.parse_args()
+
+    print(f"{'input':>14}  {'output':>14}  {'CPU ms / audio s':>16}  {'% of one core':>13}")
+    for input_rate, input_channels, output_rate, output_channels in CASES:
+        ms = run_case(input_rate, input_channels, output_rate, output_channels, args.seconds, args.chunk)
+        print(f"{input_rate:>8} Hz x{input_channels}  {output_rate:>8} Hz x{output_channels}  {ms:>16.2f}  {ms / 10.0:>12.2f}%")
+
+
+if __name__ == '__main__':
+    main()
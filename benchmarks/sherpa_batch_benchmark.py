@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark of batched vs independent decoding of concurrent streams with sherpa-onnx.
+
+Replays the same WAV file (16 kHz mono, 16-bit) on N threads at once and reports the
+aggregate speed (seconds of audio transcribed per wall-clock second) when:
+  - independent: every thread decodes its own stream (batchDecoding = false)
+  - batched:     all threads share one SherpaBatchDecoder (batchDecoding = true)
+
+Endpoint detection is turned off, so every stream decodes the whole file instead of
+returning at the first endpoint.
+
+Usage:
+    python benchmarks/sherpa_batch_benchmark.py --model sherpa-onnx-streaming-zipformer-en-2023-06-26 --wav speech.wav [--streams 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+from tjbot.config.models import EndpointConfig, STTBackendLocalConfig
+from tjbot.microphone import ReplayAudioSource
+from tjbot.stt.backends.sherpa_onnx_stt import SherpaONNXSTTEngine
+
+
+def run_streams(engine: SherpaONNXSTTEngine, wav: str, streams: int, chunk: int) -> float:
+    sources = [ReplayAudioSource(wav, chunk_size=chunk, realtime=False) for _ in range(streams)]
+    threads = [threading.Thread(target=engine.transcribe, args=(s.generator(),)) for s in sources]
+
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    return sum(s.duration for s in sources) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True, help='streaming transducer model directory or name in ~/.tjbot/models')
+    parser.add_argument('--wav', required=True, help='16 kHz mono 16-bit WAV file')
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of concurrent streams')
+    parser.add_argument('--chunk', type=int, default=1024, help='frames per chunk')
+    args = parser.parse_args()
+
+    endpoint = EndpointConfig(enabled=False)
+    independent = SherpaONNXSTTEngine(STTBackendLocalConfig(model=args.model, endpoint=endpoint))
+    batched = SherpaONNXSTTEngine(STTBackendLocalConfig(model=args.model, batchDecoding=True, endpoint=endpoint))
+
+    print(f"{'streams':>7}  {'independent (audio s / s)':>25}  {'batched (audio s / s)':>21}")
+    for streams in args.streams:
+        a = run_streams(independent, args.wav, streams, args.chunk)
+        b = run_streams(batched, args.wav, streams, args.chunk)
+        print(f"{streams:>7}  {a:>25.1f}  {b:>21.1f}")
+
+    decoder = batched.batch_decoder
+    if decoder.batches:
+        print(f"mean batch size: {decoder.batched_streams / decoder.batches:.2f}")
+    decoder.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the sherpa-onnx streaming transcribe loop.
+
+Replays a long WAV file (16 kHz mono, 16-bit) through SherpaONNXSTTEngine as fast
+as possible and reports the CPU time per second of audio for:
+  - before: the previous loop (per-chunk numpy conversion copies, get_result and a
+    partial callback after every chunk)
+  - after:  SherpaONNXSTTEngine.transcribe (reused float32 buffer, decode only when
+    ready, partials only when the hypothesis changes)
+
+Most of the CPU is the model itself, so also compare the 'overhead' column, which
+subtracts a run that only decodes. Endpoint detection is turned off, so transcribe
+decodes the whole file like the other runs.
+
+Usage:
+    python benchmarks/sherpa_stt_benchmark.py --model sherpa-onnx-streaming-zipformer-en-2023-06-26 --wav long.wav [--chunk 1024]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+import numpy as np
+
+from tjbot.config.models import EndpointConfig, STTBackendLocalConfig
+from tjbot.microphone import ReplayAudioSource
+from tjbot.stt.backends.sherpa_onnx_stt import SherpaONNXSTTEngine, _result_text
+
+
+def transcribe_before(engine, audio_stream, on_partial_result):
+    # The loop as it was before the hot path was reworked
+    stream = engine.recognizer.create_stream()
+    for chunk in audio_stream:
+        samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+        stream.accept_waveform(engine.sample_rate, samples)
+        while engine.recognizer.is_ready(stream):
+            engine.recognizer.decode_stream(stream)
+        text = _result_text(engine.recognizer.get_result(stream))
+        if text:
+            on_partial_result(text)
+    stream.input_finished()
+    while engine.recognizer.is_ready(stream):
+        engine.recognizer.decode_stream(stream)
+    return _result_text(engine.recognizer.get_result(stream))
+
+
+def decode_only(engine, samples):
+    stream = engine.recognizer.create_stream()
+    stream.accept_waveform(engine.sample_rate, samples)
+    stream.input_finished()
+    while engine.recognizer.is_ready(stream):
+        engine.recognizer.decode_stream(stream)
+
+
+def measure(fn) -> float:
+    start = time.process_time()
+    fn()
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True, help='streaming transducer model directory or name in ~/.tjbot/models')
+    parser.add_argument('--wav', required=True, help='16 kHz mono 16-bit WAV file, ideally several minutes long')
+    parser.add_argument('--chunk', type=int, default=1024, help='frames per chunk')
+    args = parser.parse_args()
+
+    engine = SherpaONNXSTTEngine(STTBackendLocalConfig(model=args.model, endpoint=EndpointConfig(enabled=False)))
+    source = ReplayAudioSource(args.wav, chunk_size=args.chunk, realtime=False)
+    if source.rate != engine.sample_rate or source.channels != 1:
+        sys.exit(f"{args.wav}: expected {engine.sample_rate} Hz mono audio")
+
+    partials = []
+    samples = np.frombuffer(b''.join(bytes(c) for c in source.generator()), dtype='<i2').astype(np.float32) / 32768.0
+    baseline = measure(lambda: decode_only(engine, samples))
+    before = measure(lambda: transcribe_before(engine, source.generator(), partials.append))
+    before_partials = len(partials)
+    partials.clear()
+    after = measure(lambda: engine.transcribe(source.generator(), on_partial_result=partials.append))
+
+    seconds = source.duration
+    print(f"audio: {seconds:.1f} s, chunk: {args.chunk} frames")
+    print(f"{'':>8}  {'CPU ms / audio s':>16}  {'overhead ms / audio s':>21}  {'partials':>8}")
+    for name, elapsed, count in (('before', before, before_partials), ('after', after, len(partials))):
+        ms = elapsed * 1000.0 / seconds
+        overhead = (elapsed - baseline) * 1000.0 / seconds
+        print(f"{name:>8}  {ms:>16.2f}  {overhead:>21.2f}  {count:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark of the STT backends.
+
+Replays a WAV corpus through each STTEngine with real-time pacing, using the same
+STTController pipeline as listen() (resampling, VAD endpointing, frame coalescing,
+partial filtering). For each utterance it reports:
+  - first_partial_ms: time from the start of speech to the first partial result
+  - final_ms:         time from the end of speech to the final result
+  - rtf:              processing time / audio time, from a second run without pacing
+  - cpu_ms_per_audio_s: process CPU time per second of audio in that unpaced run
+
+Every backend gets the listen pipeline's VAD endpointing (default [listen.backend.local.vad]
+settings, --no-vad to send whole files), so final_ms includes the VAD hangover.
+Speech start/end in each file are found with the energy VAD. The cloud engines run against the
+local stand-ins in stt_standins.py (a gRPC server for Google, a websocket server for Watson and
+a patched SDK for Azure, with simulated connect time and network latency), so their numbers
+measure the engine, pipeline and SDK transport, not the service or the network. The local
+engine needs a sherpa-onnx model (--model) and is skipped otherwise.
+
+Results are written as JSON. With --baseline, the p50 of every metric is compared to
+a previous run and the script exits with status 1 if any got slower by more than
+--tolerance (relative) plus --slack-ms (absolute, latency metrics only).
+
+Usage:
+    python benchmarks/stt_latency_benchmark.py [--corpus dir_or_wav ...] [--model <streaming model>]
+        [--backends local,ibm-watson-stt,google-cloud-stt,azure-stt] [--output results.json]
+        [--baseline baseline.json --tolerance 0.2]
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from tjbot.audio import EnergyVAD
+from tjbot.config.models import ListenConfig, STTBackendConfig, STTBackendLocalConfig, VADConfig
+from tjbot.microphone import ReplayAudioSource
+from tjbot.stt import STTController
+from tjbot.stt.factory import create_engine
+from stt_standins import cloud_standins
+
+BACKENDS = ['local', 'ibm-watson-stt', 'google-cloud-stt', 'azure-stt']
+METRICS = ['first_partial_ms', 'final_ms', 'rtf', 'cpu_ms_per_audio_s']
+
+# Format version of the JSON report
+REPORT_VERSION = 1
+
+# (name, source) pairs
+Corpus = List[Tuple[str, ReplayAudioSource]]
+
+
+def synthetic_corpus(count: int = 3, rate: int = 16000) -> Corpus:
+    """
+    Utterances of modulated tone between silences, for runs without a recorded corpus.
+    """
+    sources = []
+    for i in range(count):
+        speech_seconds = 0.8 + 0.4 * i
+        t = np.arange(int(rate * speech_seconds)) / rate
+        speech = np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)) * 8000
+        silence = np.zeros(rate // 2)
+        audio = np.concatenate([silence, speech, silence, silence]).astype('<i2')
+        sources.append((f"synthetic-{i + 1}", ReplayAudioSource(audio.tobytes(), rate=rate)))
+    return sources
+
+
+def load_corpus(paths: List[str]) -> Corpus:
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.wav'))) if os.path.isdir(path) else [path])
+
+    return [(os.path.basename(path), ReplayAudioSource(path)) for path in files]
+
+
+def speech_bounds(source: ReplayAudioSource, threshold: float = 0.02):
+    """
+    Offsets in seconds of the first and last speech frame in the source.
+    """
+    source.realtime = False
+    samples = np.frombuffer(b''.join(bytes(c) for c in source.generator()), dtype='<i2').astype(np.float32) / 32768.0
+    samples = samples.reshape(-1, source.channels).mean(axis=1)
+    vad = EnergyVAD(source.rate, threshold)
+    frames = [
+        i for i in range(0, len(samples) - vad.frame_size + 1, vad.frame_size)
+        if vad.is_speech(samples[i:i + vad.frame_size])
+    ]
+    if not frames:
+        return 0.0, source.duration
+    return frames[0] / source.rate, (frames[-1] + vad.frame_size) / source.rate
+
+
+def replay(controller: STTController, source: ReplayAudioSource, realtime: bool) -> Dict[str, Any]:
+    """
+    Transcribe one replay of source and time its results.
+    """
+    source.realtime = realtime
+    times = {'partial': None, 'final': None}
+
+    def on_partial(text):
+        if times['partial'] is None:
+            times['partial'] = time.monotonic()
+
+    def on_final(text):
+        times['final'] = time.monotonic()
+
+    cpu_start = time.process_time()
+    with source:
+        transcript = controller.transcribe(
+            source.generator(),
+            on_partial_result=on_partial,
+            on_final_result=on_final,
+            sample_rate=source.rate,
+            channels=source.channels
+        )
+    finished = time.monotonic()
+
+    return {
+        'transcript': transcript,
+        'started_at': source.started_at,
+        'first_partial_at': times['partial'],
+        'final_at': times['final'] or finished,
+        'finished_at': finished,
+        'cpu_s': time.process_time() - cpu_start,
+    }
+
+
+def measure_utterance(controller: STTController, name: str, source: ReplayAudioSource) -> Dict[str, Any]:
+    speech_start, speech_end = speech_bounds(source)
+
+    paced = replay(controller, source, realtime=True)
+    first_partial_ms = None
+    if paced['first_partial_at'] is not None:
+        first_partial_ms = (paced['first_partial_at'] - paced['started_at'] - speech_start) * 1000.0
+    final_ms = (paced['final_at'] - paced['started_at'] - speech_end) * 1000.0
+
+    unpaced = replay(controller, source, realtime=False)
+    elapsed = unpaced['finished_at'] - unpaced['started_at']
+
+    return {
+        'name': name,
+        'duration_s': round(source.duration, 3),
+        'first_partial_ms': None if first_partial_ms is None else round(first_partial_ms, 1),
+        'final_ms': round(final_ms, 1),
+        'rtf': round(elapsed / source.duration, 4),
+        'cpu_ms_per_audio_s': round(unpaced['cpu_s'] * 1000.0 / source.duration, 2),
+        'transcript': paced['transcript'],
+    }
+
+
+def summarize(utterances: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for metric in METRICS:
+        values = [u[metric] for u in utterances if u[metric] is not None]
+        if values:
+            summary[metric] = {
+                'p50': round(statistics.median(values), 4),
+                'mean': round(statistics.fmean(values), 4),
+                'max': round(max(values), 4),
+            }
+    return summary
+
+
+def backend_config(backend: str, model: Optional[str], vad: bool = True) -> STTBackendConfig:
+    # STTController reads the endpointing settings from the local section for every backend
+    local = STTBackendLocalConfig(model=model, vad=VADConfig(enabled=vad))
+    return STTBackendConfig(type=backend, local=local)
+
+
+def run_benchmark(
+    corpus: Corpus,
+    backends: List[str],
+    model: Optional[str] = None,
+    vad: bool = True,
+    **standin_options
+) -> Dict[str, Any]:
+    """
+    Run the corpus through each backend and return the JSON-serializable report.
+    :param standin_options: partial_ms, latency_ms and connect_ms of the cloud stand-ins.
+    """
+    report: Dict[str, Any] = {
+        'version': REPORT_VERSION,
+        'corpus': [{'name': name, 'duration_s': round(source.duration, 3)} for name, source in corpus],
+        'vad': vad,
+        'standins': standin_options,
+        'backends': {},
+    }
+
+    with cloud_standins(**standin_options):
+        for backend in backends:
+            if backend == 'local' and not model:
+                report['backends'][backend] = {'skipped': 'no --model given'}
+                continue
+            config = backend_config(backend, model, vad)
+            try:
+                engine = create_engine(config)
+            except Exception as e:
+                report['backends'][backend] = {'skipped': str(e)}
+                continue
+
+            # Set directly rather than through the engine cache, so every run starts from a fresh engine
+            controller = STTController(ListenConfig(backend=config))
+            controller.engine = engine
+
+            utterances = [measure_utterance(controller, name, source) for name, source in corpus]
+            result: Dict[str, Any] = {'utterances': utterances, 'summary': summarize(utterances)}
+            if hasattr(engine, 'stats'):
+                result['engine_stats'] = engine.stats()
+            report['backends'][backend] = result
+
+    return report
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2, slack_ms: float = 20.0) -> List[str]:
+    """
+    List the p50 metrics that regressed against the baseline report.
+    """
+    regressions = []
+    for backend, result in report['backends'].items():
+        previous = baseline.get('backends', {}).get(backend, {}).get('summary')
+        if not previous or 'summary' not in result:
+            continue
+        for metric, values in result['summary'].items():
+            if metric not in previous:
+                continue
+            before, after = previous[metric]['p50'], values['p50']
+            limit = before * (1.0 + tolerance) + (slack_ms if metric.endswith('_ms') else 0.0)
+            if after > limit:
+                regressions.append(f"{backend} {metric}: p50 {after:.2f} > {before:.2f} baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', nargs='*', default=[], help='WAV files or directories of WAV files (16-bit PCM); synthetic utterances when omitted')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='comma-separated STT backend types')
+    parser.add_argument('--model', help='streaming model directory or name in ~/.tjbot/models, for the local backend')
+    parser.add_argument('--no-vad', action='store_true', help='send whole files instead of VAD-endpointed utterances')
+    parser.add_argument('--partial-ms', type=int, default=200, help='stand-in speech between partial results')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='stand-in one-way network latency')
+    parser.add_argument('--connect-ms', type=float, default=50.0, help='stand-in connection setup time')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative p50 increase over the baseline')
+    parser.add_argument('--slack-ms', type=float, default=20.0, help='allowed absolute increase of latency metrics')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    report = run_benchmark(
+        corpus,
+        [b.strip() for b in args.backends.split(',') if b.strip()],
+        model=args.model,
+        vad=not args.no_vad,
+        partial_ms=args.partial_ms,
+        latency_ms=args.latency_ms,
+        connect_ms=args.connect_ms
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance, args.slack_ms)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
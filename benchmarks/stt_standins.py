@@ -0,0 +1,494 @@
+"""
+Local stand-ins for the cloud STT services, used by stt_latency_benchmark.py.
+
+Google and Watson are protocol-level fakes: the engines run their real SDK clients against
+local servers, so request and result serialization, HTTP/2 and websocket framing and the
+SDKs' own sender and receiver threads are part of the measurement:
+  - Google: a gRPC server implementing google.cloud.speech.v1.Speech/StreamingRecognize,
+    reached through a SpeechClient on an insecure local channel.
+  - Watson: a websocket server speaking the /v1/recognize protocol (start message,
+    listening state, binary audio, stop action), reached through SpeechToTextV1 with
+    SPEECH_TO_TEXT_URL pointing at it and no authentication.
+  - Azure: the Speech SDK's transport is native code with no local endpoint, so the SDK
+    itself is patched: push stream, recognizer events and Connection.open().
+
+Behind each API the same StandInRecognizer plays the service: it hears speech by
+energy, emits a growing hypothesis every partial_ms of speech and a final once the
+input is closed, with a configurable connect time and one-way network latency. No
+real recognition happens, and no credentials are needed.
+
+What the numbers leave out: TLS and the real network. The servers listen on 127.0.0.1
+without TLS, and the simulated latency stands in for the round trip. A backend whose SDK
+(or grpcio) is not installed is left unpatched, so the benchmark reports it as skipped.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import types
+from concurrent import futures
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from typing import Callable, List, Optional, Tuple
+from unittest import mock
+
+import numpy as np
+
+try:
+    import grpc
+    from google.cloud import speech
+    from google.cloud.speech_v1.services.speech.transports import SpeechGrpcTransport
+except ImportError:
+    grpc = None
+    speech = None
+    SpeechGrpcTransport = None
+
+try:
+    import ibm_watson
+except ImportError:
+    ibm_watson = None
+
+# Marks the end of a stand-in's response queue
+_END = object()
+
+
+class StandInRecognizer:
+    """
+    Fake recognition service session for 16-bit PCM audio.
+    Events are delivered on a separate thread after the simulated network latency.
+    """
+    def __init__(
+        self,
+        on_result: Callable[[str, bool], None],
+        sample_rate: int = 16000,
+        channels: int = 1,
+        partial_ms: int = 200,
+        latency_ms: float = 20.0,
+        connect_ms: float = 50.0,
+        threshold: float = 0.02,
+        on_close: Optional[Callable[[], None]] = None
+    ):
+        """
+        :param on_result: Called with (text, is_final) for every result the service sends.
+        :param partial_ms: Milliseconds of speech between partial results.
+        :param latency_ms: One-way network latency added to every result.
+        :param connect_ms: Connection setup time; no result arrives before it has passed.
+        :param on_close: Called after the final result has been delivered.
+        """
+        self.on_result = on_result
+        self.on_close = on_close
+        self.bytes_per_ms = sample_rate * channels * 2 / 1000.0
+        self.partial_ms = partial_ms
+        self.latency = latency_ms / 1000.0
+        self.threshold = threshold
+        self.words: List[str] = []
+        self._speech_ms = 0.0
+        # Milliseconds of audio received, speech or not
+        self.audio_ms = 0.0
+        self._connected_at = time.monotonic() + connect_ms / 1000.0
+        self._deliveries: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._deliver, name='stt-standin', daemon=True)
+        self._worker.start()
+
+    def feed(self, data: bytes) -> None:
+        self.audio_ms += len(data) / self.bytes_per_ms
+        samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2').astype(np.float32) / 32768.0
+        if not len(samples):
+            return
+        if float(np.sqrt(np.mean(samples * samples))) > self.threshold:
+            self._speech_ms += len(data) / self.bytes_per_ms
+            while self._speech_ms >= (len(self.words) + 1) * self.partial_ms:
+                self.words.append(f"word{len(self.words) + 1}")
+                self._send(' '.join(self.words), False)
+
+    def close(self) -> None:
+        self._send(' '.join(self.words), True)
+        self._deliveries.put((0.0, _END))
+
+    def _send(self, text: str, is_final: bool) -> None:
+        self._deliveries.put((max(time.monotonic(), self._connected_at) + self.latency, (text, is_final)))
+
+    def _deliver(self) -> None:
+        while True:
+            due, event = self._deliveries.get()
+            if event is _END:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.on_result(*event)
+        if self.on_close:
+            self.on_close()
+
+
+class GoogleSpeechServer:
+    """
+    Local gRPC server implementing google.cloud.speech.v1.Speech/StreamingRecognize.
+    """
+    def __init__(self, **options):
+        """
+        :param options: StandInRecognizer options (partial_ms, latency_ms, connect_ms).
+        """
+        self.options = options
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='grpc-standin'))
+        handler = grpc.method_handlers_generic_handler('google.cloud.speech.v1.Speech', {
+            'StreamingRecognize': grpc.stream_stream_rpc_method_handler(
+                self._streaming_recognize,
+                request_deserializer=speech.StreamingRecognizeRequest.deserialize,
+                response_serializer=speech.StreamingRecognizeResponse.serialize,
+            ),
+        })
+        self.server.add_generic_rpc_handlers((handler,))
+        self.port = self.server.add_insecure_port('127.0.0.1:0')
+
+    def start(self) -> 'GoogleSpeechServer':
+        self.server.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.stop(grace=None)
+
+    def client(self):
+        """
+        A real SpeechClient whose channel points at this server.
+        """
+        channel = grpc.insecure_channel(f'127.0.0.1:{self.port}')
+        return speech.SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+
+    def _streaming_recognize(self, requests, context):
+        responses: queue.Queue = queue.Queue()
+        recognizer: Optional[StandInRecognizer] = None
+
+        def on_result(text, is_final):
+            result = speech.StreamingRecognitionResult(
+                alternatives=[speech.SpeechRecognitionAlternative(transcript=text)],
+                is_final=is_final,
+            )
+            if is_final:
+                # Like the service: final results carry the audio offset they end at
+                result.result_end_time = timedelta(milliseconds=recognizer.audio_ms)
+            responses.put(speech.StreamingRecognizeResponse(results=[result]))
+
+        def receive():
+            # Reads the client's half of the stream while responses are written
+            nonlocal recognizer
+            try:
+                for request in requests:
+                    if 'streaming_config' in request:
+                        config = request.streaming_config.config
+                        recognizer = StandInRecognizer(
+                            on_result,
+                            sample_rate=config.sample_rate_hertz or 16000,
+                            channels=config.audio_channel_count or 1,
+                            on_close=lambda: responses.put(_END),
+                            **self.options
+                        )
+                    elif recognizer is not None:
+                        recognizer.feed(request.audio_content)
+            except Exception:
+                # Cancelled by the client
+                pass
+            if recognizer is not None:
+                recognizer.close()
+            else:
+                responses.put(_END)
+
+        threading.Thread(target=receive, name='grpc-standin-receive', daemon=True).start()
+        while True:
+            response = responses.get()
+            if response is _END:
+                return
+            yield response
+
+
+# RFC 6455 opcodes and handshake GUID
+_OPCODE_TEXT = 0x1
+_OPCODE_BINARY = 0x2
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class WebSocketConnection:
+    """
+    Server side of one websocket connection: the opening handshake and unfragmented or
+    fragmented data frames, which is all the Watson SDK's websocket-client uses.
+    """
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def handshake(self) -> str:
+        """
+        Read the HTTP upgrade request and accept it.
+        :return: The request path, including the query string.
+        """
+        request_line = self.reader.readline().decode('latin-1')
+        headers = {}
+        while True:
+            line = self.reader.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers['sec-websocket-key']
+        accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+        self.sock.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+        ).encode())
+        return request_line.split(' ')[1]
+
+    def receive(self) -> Optional[Tuple[int, bytes]]:
+        """
+        Read the next message, answering pings and the closing handshake.
+        :return: (opcode, payload), or None once the connection is closed.
+        """
+        message_opcode, parts = 0, []
+        while True:
+            header = self.reader.read(2)
+            if len(header) < 2:
+                return None
+            fin, opcode = header[0] & 0x80, header[0] & 0x0F
+            masked, length = header[1] & 0x80, header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack('>H', self.reader.read(2))[0]
+            elif length == 127:
+                length = struct.unpack('>Q', self.reader.read(8))[0]
+            mask = self.reader.read(4) if masked else b''
+            payload = self.reader.read(length)
+            if mask:
+                # Clients mask every frame with a 4-byte key
+                key = np.resize(np.frombuffer(mask, dtype=np.uint8), length)
+                payload = (np.frombuffer(payload, dtype=np.uint8) ^ key).tobytes()
+
+            if opcode == _OPCODE_CLOSE:
+                self.send(_OPCODE_CLOSE, payload[:2])
+                self.closed = True
+                return None
+            if opcode == _OPCODE_PING:
+                self.send(_OPCODE_PONG, payload)
+                continue
+            if opcode == _OPCODE_PONG:
+                continue
+            if opcode:
+                message_opcode = opcode
+            parts.append(payload)
+            if fin:
+                return message_opcode, b''.join(parts)
+
+    def send(self, opcode: int, payload: bytes) -> None:
+        # Server frames are not masked
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, message: dict) -> None:
+        self.send(_OPCODE_TEXT, json.dumps(message).encode('utf8'))
+
+
+class WatsonSpeechServer(socketserver.ThreadingTCPServer):
+    """
+    Local websocket server speaking the Watson Speech to Text /v1/recognize protocol.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, **options):
+        """
+        :param options: StandInRecognizer options (partial_ms, latency_ms, connect_ms).
+        """
+        self.options = options
+        super().__init__(('127.0.0.1', 0), _WatsonSessionHandler)
+        self.port = self.server_address[1]
+        self.url = f'ws://127.0.0.1:{self.port}'
+
+    def start(self) -> 'WatsonSpeechServer':
+        threading.Thread(target=self.serve_forever, name='websocket-standin', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _WatsonSessionHandler(socketserver.BaseRequestHandler):
+    """
+    One recognize session: a start message, binary audio, then a stop action. The service
+    answers the start with a listening state, streams results, and after the final result
+    sends the listening state again, which is the client's cue to close.
+    """
+    def handle(self):
+        ws = WebSocketConnection(self.request)
+        ws.handshake()
+        recognizer: Optional[StandInRecognizer] = None
+        interim_results = False
+
+        def on_result(text, is_final):
+            if is_final or interim_results:
+                ws.send_json({'result_index': 0, 'results': [{'alternatives': [{'transcript': text}], 'final': is_final}]})
+
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            opcode, payload = message
+            if opcode == _OPCODE_BINARY:
+                if recognizer is not None:
+                    recognizer.feed(payload)
+                continue
+
+            action = json.loads(payload).get('action')
+            if action == 'start' and recognizer is None:
+                start = json.loads(payload)
+                interim_results = start.get('interim_results') is True
+                params = dict(part.strip().split('=') for part in start.get('content_type', '').split(';')[1:])
+                recognizer = StandInRecognizer(
+                    on_result,
+                    sample_rate=int(params.get('rate', 16000)),
+                    channels=int(params.get('channels', 1)),
+                    on_close=lambda: ws.send_json({'state': 'listening'}),
+                    **self.server.options
+                )
+                ws.send_json({'state': 'listening'})
+            elif action == 'stop' and recognizer is not None:
+                recognizer.close()
+        if recognizer is not None and not ws.closed:
+            recognizer.close()
+
+
+class _Signal:
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+
+    def fire(self, evt):
+        for handler in self.handlers:
+            handler(evt)
+
+
+def azure_speech_module(**options) -> types.SimpleNamespace:
+    """
+    Stand-in for azure.cognitiveservices.speech: push streams, recognizer events and pre-opened connections.
+    """
+    connect_ms = options.get('connect_ms', 50.0)
+    standin_options = dict(options, connect_ms=0.0)
+
+    class PushStream:
+        def __init__(self, stream_format=None):
+            self.stream_format = stream_format
+            self.recognizer = None
+
+        def write(self, data):
+            self.recognizer.feed(data)
+
+        def close(self):
+            self.recognizer.close()
+
+    class Recognizer:
+        def __init__(self, speech_config=None, audio_config=None):
+            self.recognized = _Signal()
+            self.recognizing = _Signal()
+            self.canceled = _Signal()
+            self.session_stopped = _Signal()
+            stream_format = audio_config.stream_input.stream_format
+            self.session = StandInRecognizer(
+                self._on_result,
+                sample_rate=stream_format.get('samples_per_second', 16000),
+                channels=stream_format.get('channels', 1),
+                on_close=lambda: self.session_stopped.fire(None),
+                **standin_options
+            )
+            audio_config.stream_input.recognizer = self.session
+
+        def _on_result(self, text, is_final):
+            reason = 'recognized' if is_final else 'recognizing'
+            event = types.SimpleNamespace(result=types.SimpleNamespace(reason=reason, text=text))
+            (self.recognized if is_final else self.recognizing).fire(event)
+
+        def start_continuous_recognition(self):
+            pass
+
+        def stop_continuous_recognition(self):
+            pass
+
+    class Connection:
+        @classmethod
+        def from_recognizer(cls, recognizer):
+            return cls()
+
+        def open(self, for_continuous_recognition):
+            time.sleep(connect_ms / 1000.0)
+
+        def close(self):
+            pass
+
+    return types.SimpleNamespace(
+        SpeechConfig=lambda subscription, region: types.SimpleNamespace(),
+        SpeechRecognizer=Recognizer,
+        Connection=Connection,
+        ResultReason=types.SimpleNamespace(RecognizedSpeech='recognized', RecognizingSpeech='recognizing'),
+        CancellationReason=types.SimpleNamespace(Error='error'),
+        AudioStreamContainerFormat=types.SimpleNamespace(FLAC='FLAC', OGG_OPUS='OGG_OPUS'),
+        audio=types.SimpleNamespace(
+            AudioStreamFormat=lambda **kwargs: kwargs,
+            PushAudioInputStream=PushStream,
+            AudioConfig=lambda stream_input: types.SimpleNamespace(stream_input=stream_input),
+        ),
+    )
+
+
+@contextmanager
+def cloud_standins(partial_ms: int = 200, latency_ms: float = 20.0, connect_ms: float = 50.0):
+    """
+    Point the Google, Watson and Azure engines at the local stand-ins while the context is active.
+    """
+    from tjbot.stt.backends import azure_stt, google_stt
+
+    options = dict(partial_ms=partial_ms, latency_ms=latency_ms, connect_ms=connect_ms)
+
+    with ExitStack() as stack:
+        if grpc is not None and speech is not None:
+            google = GoogleSpeechServer(**options).start()
+            stack.callback(google.stop)
+            stack.enter_context(mock.patch.object(google_stt, '_client', google.client()))
+        if ibm_watson is not None:
+            watson = WatsonSpeechServer(**options).start()
+            stack.callback(watson.stop)
+            stack.enter_context(mock.patch.dict(os.environ, {
+                'SPEECH_TO_TEXT_AUTH_TYPE': 'noauth',
+                'SPEECH_TO_TEXT_URL': watson.url,
+                # The SDK reads a credentials file before the environment
+                'IBM_CREDENTIALS_FILE': os.devnull,
+            }))
+        stack.enter_context(mock.patch.object(azure_stt, 'speechsdk', azure_speech_module(**options)))
+        stack.enter_context(mock.patch.dict(os.environ, {
+            'AZURE_SPEECH_KEY': 'stand-in',
+            'AZURE_SPEECH_REGION': 'local',
+        }))
+        yield
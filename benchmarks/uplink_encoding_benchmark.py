@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the compressed uplink encodings for cloud STT backends.
+
+Encodes a WAV file (or a synthetic tone when none is given) with each uplinkEncoding
+and reports the compression ratio and the encode CPU time per second of audio. Run it
+on the target board to decide whether compression is worth its CPU cost there.
+
+Usage:
+    python benchmarks/uplink_encoding_benchmark.py [--wav speech.wav] [--chunk 1600]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+import numpy as np
+
+from tjbot.audio import create_uplink_encoder
+from tjbot.microphone import ReplayAudioSource
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wav', help='16-bit WAV file (16 kHz mono recommended)')
+    parser.add_argument('--seconds', type=float, default=30.0, help='length of the synthetic audio')
+    parser.add_argument('--chunk', type=int, default=1600, help='frames per chunk (1600 = 100 ms coalesced frames)')
+    args = parser.parse_args()
+
+    if args.wav:
+        source = ReplayAudioSource(args.wav, chunk_size=args.chunk, realtime=False)
+    else:
+        rate = 16000
+        t = np.arange(int(rate * args.seconds)) / rate
+        tone = (np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) * 8000).astype('<i2')
+        source = ReplayAudioSource(tone.tobytes(), rate=rate, chunk_size=args.chunk, realtime=False)
+
+    print(f"audio: {source.duration:.1f} s at {source.rate} Hz x{source.channels}")
+    print(f"{'encoding':>9}  {'ratio':>6}  {'kbit/s':>7}  {'CPU ms / audio s':>16}")
+    for encoding in ('flac', 'ogg-opus'):
+        encoder = create_uplink_encoder(encoding, source.rate, source.channels)
+        if encoder is None:
+            print(f"{encoding:>9}  unavailable")
+            continue
+        for _ in encoder.process(source.generator()):
+            pass
+        stats = encoder.stats()
+        kbps = stats['bytes_out'] * 8 / 1000.0 / source.duration
+        print(f"{encoding:>9}  {stats['compression_ratio']:>6.2f}  {kbps:>7.1f}  {stats['encode_cpu_ms_per_audio_s']:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
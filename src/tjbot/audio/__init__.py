@@ -0,0 +1,6 @@
+from .resample import StreamingResampler, convert_audio_stream
+from .coalesce import FrameCoalescer
+from .encode import StreamingEncoder, create_uplink_encoder
+from .vad import VADStage, VADSegmenter, EnergyVAD, SileroVAD, create_vad
+
+__all__ = ["StreamingResampler", "convert_audio_stream", "VADStage", "VADSegmenter", "EnergyVAD", "SileroVAD", "create_vad", "FrameCoalescer", "StreamingEncoder", "create_uplink_encoder"]
@@ -0,0 +1,71 @@
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+
+class FrameCoalescer:
+    """
+    Packs small audio chunks into larger frames before they are sent to a cloud STT service.
+
+    A frame is sent once it holds frame_ms of audio, or once the oldest audio in it has
+    waited max_latency_ms, so partial results stay responsive when audio arrives slowly.
+    Counters are cumulative over every stream processed.
+    """
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int = 1,
+        frame_ms: int = 100,
+        max_latency_ms: Optional[int] = None
+    ):
+        frame_size = channels * SAMPLE_WIDTH
+        self.frame_bytes = max(1, sample_rate * frame_ms // 1000) * frame_size
+        self.max_latency = (frame_ms if max_latency_ms is None else max_latency_ms) / 1000.0
+
+        self.chunks_in = 0
+        self.messages = 0
+        self.bytes_sent = 0
+        self.latency_flushes = 0
+
+    def process(self, audio_stream: Iterable) -> Iterator[bytes]:
+        """
+        :param audio_stream: Iterable of bytes-like PCM chunks.
+        :return: Generator of frames of frame_ms (the last one may be shorter).
+        """
+        frame = bytearray()
+        first_at = 0.0
+
+        for chunk in audio_stream:
+            self.chunks_in += 1
+            if not frame:
+                first_at = time.monotonic()
+            frame += chunk
+
+            while len(frame) >= self.frame_bytes:
+                yield self._send(frame[:self.frame_bytes])
+                del frame[:self.frame_bytes]
+                first_at = time.monotonic()
+
+            if frame and time.monotonic() - first_at >= self.max_latency:
+                self.latency_flushes += 1
+                yield self._send(frame)
+                frame = bytearray()
+
+        if frame:
+            yield self._send(frame)
+
+    def _send(self, frame: bytearray) -> bytes:
+        self.messages += 1
+        self.bytes_sent += len(frame)
+        return bytes(frame)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'chunks_in': self.chunks_in,
+            'messages': self.messages,
+            'bytes_sent': self.bytes_sent,
+            'latency_flushes': self.latency_flushes,
+            'mean_message_bytes': self.bytes_sent / self.messages if self.messages else 0.0,
+        }
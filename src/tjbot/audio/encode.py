@@ -0,0 +1,183 @@
+import io
+import logging
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+logger = logging.getLogger(__name__)
+
+ENCODING_PCM = 'pcm'
+ENCODING_FLAC = 'flac'
+ENCODING_OGG_OPUS = 'ogg-opus'
+
+UPLINK_ENCODINGS = (ENCODING_PCM, ENCODING_FLAC, ENCODING_OGG_OPUS)
+
+# libsndfile (format, subtype) for each compressed encoding
+_SOUNDFILE_FORMATS = {
+    ENCODING_FLAC: ('FLAC', 'PCM_16'),
+    ENCODING_OGG_OPUS: ('OGG', 'OPUS'),
+}
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+
+class _UplinkBuffer:
+    """
+    Write-only file for libsndfile that keeps only the encoded bytes not yet taken.
+
+    libsndfile sees a normal file with growing offsets; take() hands over and forgets the
+    bytes written so far, so memory stays bounded however long the stream runs. Writes
+    before the taken offset (the FLAC header rewritten at close) are dropped, since those
+    bytes have already been sent.
+    """
+    def __init__(self):
+        self._data = bytearray()
+        # File offset of _data[0], and the current write position
+        self._base = 0
+        self._position = 0
+
+    def write(self, data) -> int:
+        written = len(data)
+        start = self._position - self._base
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = start + len(data)
+        if start > len(self._data):
+            self._data.extend(bytes(start - len(self._data)))
+        self._data[start:end] = data
+        self._position += written
+        return written
+
+    def read(self, size: int = -1) -> bytes:
+        start = max(self._position - self._base, 0)
+        end = len(self._data) if size < 0 else start + size
+        data = bytes(self._data[start:end])
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._base + len(self._data)
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        out = bytes(self._data)
+        self._base += len(self._data)
+        self._data.clear()
+        return out
+
+
+class StreamingEncoder:
+    """
+    Compresses a 16-bit PCM stream to FLAC or Ogg/Opus for upload to a cloud STT service.
+
+    Encoded bytes are yielded as soon as libsndfile produces them (one codec block at a
+    time). Counters are cumulative over every stream encoded, so compression ratio and
+    encode CPU per second of audio can be compared between boards.
+    """
+    def __init__(self, encoding: str, sample_rate: int, channels: int = 1):
+        if encoding not in _SOUNDFILE_FORMATS:
+            raise ValueError(f"unsupported uplink encoding '{encoding}'")
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.format, self.subtype = _SOUNDFILE_FORMATS[encoding]
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encode_seconds = 0.0
+
+    def process(self, audio_stream: Iterable) -> Iterator[bytes]:
+        """
+        :param audio_stream: Iterable of bytes-like 16-bit PCM chunks.
+        :return: Generator of encoded bytes; together they form one complete file.
+        """
+        buffer = _UplinkBuffer()
+        frame_size = self.channels * SAMPLE_WIDTH
+        pending = b''
+
+        with sf.SoundFile(buffer, mode='w', samplerate=self.sample_rate, channels=self.channels,
+                          format=self.format, subtype=self.subtype) as encoded:
+            for chunk in audio_stream:
+                data = pending + bytes(chunk)
+                usable = len(data) - len(data) % frame_size
+                pending = data[usable:]
+                if not usable:
+                    continue
+
+                start = time.thread_time()
+                samples = np.frombuffer(data, dtype='<i2', count=usable // SAMPLE_WIDTH).reshape(-1, self.channels)
+                encoded.write(samples)
+                self.encode_seconds += time.thread_time() - start
+                self.bytes_in += usable
+
+                out = self._take(buffer)
+                if out:
+                    yield out
+
+            start = time.thread_time()
+            encoded.close()
+            self.encode_seconds += time.thread_time() - start
+
+        out = self._take(buffer)
+        if out:
+            yield out
+
+    def _take(self, buffer: _UplinkBuffer) -> bytes:
+        out = buffer.take()
+        self.bytes_out += len(out)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        audio_seconds = self.bytes_in / (self.sample_rate * self.channels * SAMPLE_WIDTH)
+        return {
+            'encoding': self.encoding,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'compression_ratio': self.bytes_in / self.bytes_out if self.bytes_out else 0.0,
+            'encode_cpu_ms_per_audio_s': self.encode_seconds * 1000.0 / audio_seconds if audio_seconds else 0.0,
+        }
+
+
+def create_uplink_encoder(
+    encoding: Optional[str],
+    sample_rate: int,
+    channels: int = 1,
+    supported: Sequence[str] = (ENCODING_FLAC, ENCODING_OGG_OPUS)
+) -> Optional[StreamingEncoder]:
+    """
+    Create the encoder for a cloud backend's uplinkEncoding, or None to send raw PCM.
+    Falls back to PCM (with a warning) when the service or the installed libraries do not
+    support the encoding.
+    """
+    if not encoding or encoding == ENCODING_PCM:
+        return None
+    if encoding not in supported:
+        logger.warning(f"uplink encoding '{encoding}' is not supported by this STT service, sending PCM")
+        return None
+    if sf is None or np is None:
+        logger.warning(f"soundfile and numpy are needed for '{encoding}' uplink encoding (install python-tjbotlib[compress]), sending PCM")
+        return None
+
+    format, subtype = _SOUNDFILE_FORMATS[encoding]
+    if subtype not in sf.available_subtypes(format):
+        logger.warning(f"libsndfile {sf.__libsndfile_version__} cannot encode {format}/{subtype}, sending PCM")
+        return None
+    return StreamingEncoder(encoding, sample_rate, channels)
@@ -0,0 +1,156 @@
+import math
+from typing import Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..error import TJBotError
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+# Default half-length of the low-pass filter, in zero crossings of its sinc
+ZERO_CROSSINGS = 10
+
+
+class StreamingResampler:
+    """
+    Streaming polyphase resampler and channel downmixer for 16-bit PCM.
+
+    Converts interleaved int16 audio from one sample rate / channel count to another,
+    chunk by chunk. Filter history, fractional phase and partial frames are carried
+    across chunks, so the output is identical to resampling the whole stream at once.
+
+    By default the filter spans ZERO_CROSSINGS zero crossings on each side of its centre, so its
+    transition band stays narrow whatever the ratio (44.1 kHz -> 16 kHz: flat to 6 kHz,
+    >70 dB down from 10 kHz, 56 taps per output sample).
+    """
+    def __init__(
+        self,
+        input_rate: int,
+        output_rate: int,
+        input_channels: int = 1,
+        output_channels: int = 1,
+        taps_per_phase: Optional[int] = None,
+        kaiser_beta: float = 8.0
+    ):
+        if np is None:
+            raise TJBotError("numpy is not installed")
+        if input_rate <= 0 or output_rate <= 0:
+            raise TJBotError("sample rates must be positive")
+        if output_channels not in (1, input_channels):
+            raise TJBotError(f"cannot convert {input_channels} channels to {output_channels} channels")
+
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.input_channels = input_channels
+        self.output_channels = output_channels
+        self._frame_bytes = input_channels * SAMPLE_WIDTH
+        self._remainder = b''
+
+        # Up/down factors: 44100 -> 16000 becomes L=160, M=441
+        g = math.gcd(input_rate, output_rate)
+        self.up = output_rate // g
+        self.down = input_rate // g
+        self.passthrough = self.up == self.down
+
+        if not self.passthrough:
+            if taps_per_phase is None:
+                # Half-length of ZERO_CROSSINGS * max(up, down) taps at the upsampled rate
+                taps_per_phase = -(-2 * ZERO_CROSSINGS * max(self.up, self.down) // self.up)
+            self._taps = taps_per_phase
+            self._bank = self._design_filter_bank(self.up, self.down, taps_per_phase, kaiser_beta)
+            # Last (taps - 1) input samples per output channel, oldest first
+            self._history = np.zeros((taps_per_phase - 1, output_channels), dtype=np.float32)
+            # Position of the next output sample relative to the start of the next chunk, in 1/up input samples
+            self._position = 0
+            self._offsets = np.arange(taps_per_phase, dtype=np.int64)
+
+    @staticmethod
+    def _design_filter_bank(up: int, down: int, taps_per_phase: int, beta: float):
+        """
+        Kaiser-windowed sinc low-pass at the upsampled rate, split into `up` phases.
+        Row p holds the taps for phase p, ordered from newest input sample to oldest.
+        """
+        num_taps = up * taps_per_phase
+        cutoff = 0.5 / max(up, down)
+        n = np.arange(num_taps) - (num_taps - 1) / 2.0
+        h = 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.kaiser(num_taps, beta)
+        h *= up / h.sum()
+        return h.reshape(taps_per_phase, up).T.astype(np.float32).copy()
+
+    def process(self, chunk) -> bytes:
+        """
+        Convert one chunk of interleaved int16 PCM.
+        :param chunk: Bytes-like audio in the input format. Partial frames are kept for the next call.
+        :return: Converted int16 PCM bytes (may be empty).
+        """
+        data = bytes(chunk)
+        if self._remainder:
+            data = self._remainder + data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[usable:]
+        if usable == 0:
+            return b''
+
+        frames = np.frombuffer(data, dtype=np.int16, count=usable // SAMPLE_WIDTH)
+        frames = frames.reshape(-1, self.input_channels)
+
+        if self.output_channels != self.input_channels:
+            samples = frames.mean(axis=1, dtype=np.float32).reshape(-1, 1)
+        else:
+            samples = frames.astype(np.float32)
+
+        if not self.passthrough:
+            samples = self._resample(samples)
+
+        return np.clip(np.rint(samples), -32768, 32767).astype('<i2').tobytes()
+
+    def _resample(self, samples):
+        n = samples.shape[0]
+        up, down, taps = self.up, self.down, self._taps
+
+        # Outputs whose newest input sample falls inside this chunk
+        count = max(0, -(-(n * up - self._position) // down))
+        positions = self._position + down * np.arange(count, dtype=np.int64)
+        phases = positions % up
+        newest = positions // up + (taps - 1)
+
+        x = np.concatenate((self._history, samples), axis=0)
+        # window[k, j] is input sample (newest[k] - j)
+        window = x[newest[:, None] - self._offsets[None, :]]
+        out = np.einsum('kjc,kj->kc', window, self._bank[phases])
+
+        self._history = x[-(taps - 1):].copy() if taps > 1 else x[:0]
+        self._position += count * down - n * up
+        return out
+
+    def convert(self, audio_stream: Iterable) -> Iterator[bytes]:
+        """
+        Convert a whole stream of chunks.
+        :param audio_stream: Iterable of bytes-like chunks in the input format.
+        :return: Generator of chunks in the output format.
+        """
+        for chunk in audio_stream:
+            out = self.process(chunk)
+            if out:
+                yield out
+
+
+def convert_audio_stream(
+    audio_stream: Iterable,
+    input_rate: int,
+    input_channels: int,
+    output_rate: int,
+    output_channels: int
+) -> Iterable:
+    """
+    Wrap an audio stream so it yields the given output format.
+    Returns the stream unchanged when no conversion is needed.
+    """
+    if input_rate == output_rate and input_channels == output_channels:
+        return audio_stream
+    resampler = StreamingResampler(input_rate, output_rate, input_channels, output_channels)
+    return resampler.convert(audio_stream)
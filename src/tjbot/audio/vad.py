@@ -0,0 +1,244 @@
+import logging
+import os
+from collections import deque
+from typing import Deque, Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import sherpa_onnx
+except ImportError:
+    sherpa_onnx = None
+
+from ..config.models import VADConfig
+from ..error import TJBotError
+
+logger = logging.getLogger(__name__)
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detector, used when the Silero model is unavailable.
+    A frame is speech when its RMS level (0.0-1.0 full scale) exceeds the threshold.
+    """
+    def __init__(self, sample_rate: int = 16000, threshold: float = 0.02, frame_ms: int = 30):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_size = sample_rate * frame_ms // 1000
+
+    def is_speech(self, frame) -> bool:
+        return float(np.sqrt(np.mean(frame * frame))) > self.threshold
+
+    def reset(self) -> None:
+        pass
+
+
+class SileroVAD:
+    """
+    Silero voice activity detector running through sherpa-onnx.
+    """
+    def __init__(self, model: str, sample_rate: int = 16000, threshold: float = 0.5):
+        if sherpa_onnx is None:
+            raise TJBotError("sherpa-onnx library not installed. Please install it.")
+
+        config = sherpa_onnx.VadModelConfig()
+        config.silero_vad.model = model
+        config.silero_vad.threshold = threshold
+        # Hangover is handled by VADStage, keep the detector itself responsive
+        config.silero_vad.min_silence_duration = 0.1
+        config.silero_vad.min_speech_duration = 0.1
+        config.sample_rate = sample_rate
+
+        self.sample_rate = sample_rate
+        self.frame_size = config.silero_vad.window_size
+        self.vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=30)
+
+    def is_speech(self, frame) -> bool:
+        self.vad.accept_waveform(frame)
+        # VADStage forwards its own frames; discard the detector's segment copies
+        while not self.vad.empty():
+            self.vad.pop()
+        return self.vad.is_speech_detected()
+
+    def reset(self) -> None:
+        self.vad.reset()
+
+
+def _resolve_model_path(model: Optional[str]) -> Optional[str]:
+    if not model:
+        return None
+    for candidate in (model, os.path.expanduser(os.path.join('~/.tjbot/models', model))):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def create_vad(config: VADConfig, sample_rate: int = 16000):
+    """
+    Create the detector described by config: Silero through sherpa-onnx when the
+    model file is available, otherwise the energy-based fallback.
+    """
+    if np is None:
+        raise TJBotError("numpy is not installed")
+
+    model_path = _resolve_model_path(config.model)
+    if model_path and sherpa_onnx is not None and sample_rate in (8000, 16000):
+        try:
+            return SileroVAD(model_path, sample_rate, config.threshold or 0.5)
+        except Exception as e:
+            logger.warning(f"Failed to load Silero VAD model {model_path}, using energy VAD: {e}")
+    else:
+        logger.debug("Silero VAD unavailable, using energy VAD")
+
+    return EnergyVAD(sample_rate, config.energyThreshold or 0.02)
+
+
+class VADStage:
+    """
+    Streaming endpointing stage for 16-bit mono PCM.
+
+    Drops leading silence, forwards speech (plus a little padding before it), and
+    ends the stream once silence after speech lasts longer than the hangover.
+    """
+    def __init__(self, detector, hangover_ms: int = 800, padding_ms: int = 300):
+        self.detector = detector
+        self.frame_size = detector.frame_size
+        self._frame_bytes = self.frame_size * SAMPLE_WIDTH
+        frame_ms = self.frame_size * 1000.0 / detector.sample_rate
+        self.hangover_frames = max(1, int(round(hangover_ms / frame_ms)))
+        self.padding_frames = int(round(padding_ms / frame_ms))
+
+        # Audio read from the stream but not yet framed
+        self._pending = b''
+        self._offset = 0
+
+    def process(self, audio_stream: Iterable) -> Iterator[bytes]:
+        """
+        Filter an audio stream down to a single utterance.
+        :param audio_stream: Iterable of bytes-like 16-bit mono PCM chunks.
+        :return: Generator of speech frames; it ends at the end of the utterance.
+
+        Audio read past the end of the utterance is kept, so calling process() again on
+        the same iterator continues exactly where the previous utterance ended.
+        """
+        self.detector.reset()
+        padding: Deque[bytes] = deque(maxlen=max(1, self.padding_frames))
+        in_speech = False
+        silent_frames = 0
+
+        for frame in self._frames(iter(audio_stream)):
+            samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+            speech = self.detector.is_speech(samples)
+
+            if not in_speech:
+                if not speech:
+                    if self.padding_frames:
+                        padding.append(frame)
+                    continue
+                in_speech = True
+                yield from padding
+                padding.clear()
+
+            yield frame
+            silent_frames = 0 if speech else silent_frames + 1
+            if silent_frames >= self.hangover_frames:
+                return
+
+    def _frames(self, audio_stream: Iterator) -> Iterator[bytes]:
+        while True:
+            while len(self._pending) - self._offset >= self._frame_bytes:
+                start = self._offset
+                self._offset += self._frame_bytes
+                yield self._pending[start:self._offset]
+
+            chunk = next(audio_stream, None)
+            if chunk is None:
+                return
+            self._pending = self._pending[self._offset:] + bytes(chunk)
+            self._offset = 0
+
+
+class VADSegmenter:
+    """
+    Splits 16-bit mono PCM into speech segments at pauses, for offline recognizers
+    that decode a whole segment at a time.
+    """
+    def __init__(
+        self,
+        detector,
+        gap_ms: int = 300,
+        max_segment_ms: int = 20000,
+        padding_ms: int = 300,
+        end_ms: Optional[int] = None
+    ):
+        """
+        :param end_ms: Stop reading the stream once silence after speech lasts this long.
+                       None reads until the stream ends (e.g. when VADStage already ends it).
+        """
+        self.detector = detector
+        self.frame_size = detector.frame_size
+        self._frame_bytes = self.frame_size * SAMPLE_WIDTH
+        frame_ms = self.frame_size * 1000.0 / detector.sample_rate
+        self.gap_frames = max(1, int(round(gap_ms / frame_ms)))
+        self.max_frames = max(1, int(round(max_segment_ms / frame_ms)))
+        self.padding_frames = max(1, int(round(padding_ms / frame_ms)))
+        self.end_frames = max(1, int(round(end_ms / frame_ms))) if end_ms else None
+
+    def segments(self, audio_stream: Iterable) -> Iterator['np.ndarray']:
+        """
+        :param audio_stream: Iterable of bytes-like 16-bit mono PCM chunks.
+        :return: Generator of float32 sample arrays, one per speech segment. A segment ends
+                 after gap_ms of silence or once it is max_segment_ms long. With end_ms set,
+                 the generator returns after that much silence following speech, leaving the
+                 rest of audio_stream unread.
+        """
+        self.detector.reset()
+        frames: Deque['np.ndarray'] = deque()
+        pending = b''
+        speech_frames = 0
+        silent_frames = 0
+        # Silent frames since the last speech frame of this call, None before any speech
+        quiet_frames: Optional[int] = None
+
+        for chunk in audio_stream:
+            pending += bytes(chunk)
+            offset = 0
+            while len(pending) - offset >= self._frame_bytes:
+                frame = pending[offset:offset + self._frame_bytes]
+                offset += self._frame_bytes
+
+                samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32) / 32768.0
+                frames.append(samples)
+                if self.detector.is_speech(samples):
+                    speech_frames += 1
+                    silent_frames = 0
+                    quiet_frames = 0
+                else:
+                    if quiet_frames is not None:
+                        quiet_frames += 1
+                        if self.end_frames and quiet_frames >= self.end_frames:
+                            if speech_frames:
+                                yield np.concatenate(frames)
+                            return
+                    if not speech_frames:
+                        # Keep only a little silence before the segment starts
+                        if len(frames) > self.padding_frames:
+                            frames.popleft()
+                        continue
+                    silent_frames += 1
+
+                if silent_frames >= self.gap_frames or len(frames) >= self.max_frames:
+                    yield np.concatenate(frames)
+                    frames.clear()
+                    speech_frames = 0
+                    silent_frames = 0
+            pending = pending[offset:]
+
+        if speech_frames:
+            yield np.concatenate(frames)
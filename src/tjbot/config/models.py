@@ -1,4 +1,4 @@
-from typing import Dict, Literal, Optional, Tuple, Any
+from typing import Dict, List, Literal, Optional, Tuple, Any
 from pydantic import BaseModel, Field
 
 
@@ -10,12 +10,27 @@ class VADConfig(BaseModel):
     enabled: Optional[bool] = True
     model: Optional[str] = None
     modelUrl: Optional[str] = None
+    threshold: Optional[float] = 0.5
+    energyThreshold: Optional[float] = 0.02
+    hangoverMs: Optional[int] = 800
+    paddingMs: Optional[int] = 300
+    segmentGapMs: Optional[int] = 300
+
+
+class EndpointConfig(BaseModel):
+    enabled: Optional[bool] = True
+    trailingSilenceMs: Optional[int] = 800
+    maxUtteranceMs: Optional[int] = 20000
 
 
 class STTBackendLocalConfig(BaseModel):
     model: Optional[str] = None
     modelUrl: Optional[str] = None
+    modelType: Optional[Literal['streaming', 'offline']] = None
+    partialIntervalMs: Optional[int] = 0
+    batchDecoding: Optional[bool] = False
     vad: Optional[VADConfig] = None
+    endpoint: Optional[EndpointConfig] = None
 
 
 class STTBackendIBMWatsonConfig(BaseModel):
@@ -23,7 +38,9 @@ class STTBackendIBMWatsonConfig(BaseModel):
     inactivityTimeout: Optional[int] = None
     backgroundAudioSuppression: Optional[float] = None
     interimResults: Optional[bool] = None
+    persistentSession: Optional[bool] = False
     credentialsPath: Optional[str] = None
+    uplinkEncoding: Optional[Literal['pcm', 'flac', 'ogg-opus']] = 'pcm'
 
 
 class STTBackendGoogleCloudConfig(BaseModel):
@@ -35,27 +52,54 @@ class STTBackendGoogleCloudConfig(BaseModel):
     audioChannelCount: Optional[int] = None
     enableAutomaticPunctuation: Optional[bool] = None
     interimResults: Optional[bool] = None
+    uplinkEncoding: Optional[Literal['pcm', 'flac', 'ogg-opus']] = 'pcm'
+    streamLimitSeconds: Optional[int] = 290
 
 
 class STTBackendAzureConfig(BaseModel):
     language: Optional[str] = None
     credentialsPath: Optional[str] = None
+    uplinkEncoding: Optional[Literal['pcm', 'flac', 'ogg-opus']] = 'pcm'
 
 
 class STTBackendConfig(BaseModel):
     type: Optional[Literal['local', 'ibm-watson-stt', 'google-cloud-stt', 'azure-stt']] = 'local'
     local: Optional[STTBackendLocalConfig] = None
-    ibm_watson_stt: Optional[STTBackendIBMWatsonConfig] = Field(None, alias="ibm-watson-stt")
-    google_cloud_stt: Optional[STTBackendGoogleCloudConfig] = Field(None, alias="google-cloud-stt")
-    azure_stt: Optional[STTBackendAzureConfig] = Field(None, alias="azure-stt")
+    ibm_watson_stt: Optional[STTBackendIBMWatsonConfig] = Field(default=None, alias="ibm-watson-stt")
+    google_cloud_stt: Optional[STTBackendGoogleCloudConfig] = Field(default=None, alias="google-cloud-stt")
+    azure_stt: Optional[STTBackendAzureConfig] = Field(default=None, alias="azure-stt")
+
+
+class WakeWordConfig(BaseModel):
+    enabled: Optional[bool] = False
+    model: Optional[str] = None
+    modelUrl: Optional[str] = None
+    keywords: Optional[List[str]] = None
+    threshold: Optional[float] = 0.25
+    boost: Optional[float] = 1.0
 
 
 class ListenConfig(BaseModel):
     device: Optional[str] = None
     microphoneRate: Optional[int] = 44100
     microphoneChannels: Optional[int] = 1
+    bufferChunks: Optional[int] = 64
+    overrunPolicy: Optional[Literal['drop-oldest', 'drop-newest', 'block']] = 'drop-oldest'
+    prerollSeconds: Optional[float] = 0
+    latencyPreset: Optional[Literal['low-latency', 'balanced', 'low-cpu']] = 'balanced'
+    periodSize: Optional[int] = None
+    periodCount: Optional[int] = None
+    sampleFormat: Optional[Literal['S16_LE', 'S32_LE']] = 'S16_LE'
+    warmUp: Optional[bool] = True
+    coalesceFrameMs: Optional[int] = 100
+    coalesceMaxLatencyMs: Optional[int] = 100
+    maxPartialsPerSecond: Optional[float] = 10
+    prerollMs: Optional[int] = 500
     model: Optional[str] = None  # Deprecated in favor of backend.local.model?
     backend: Optional[STTBackendConfig] = None
+    hedgeBackend: Optional[STTBackendConfig] = None
+    hedgeGraceMs: Optional[int] = 300
+    wakeWord: Optional[WakeWordConfig] = None
 
 
 class SeeConfig(BaseModel):
@@ -1,3 +1,23 @@
-from .microphone import MicrophoneController, MicrophoneStream
+from .microphone import MicrophoneController, MicrophoneStream, AudioGap
+from .async_stream import AsyncMicrophoneStream
+from .ring_buffer import AudioRingBuffer
+from .hub import AudioHub, AudioSubscription
+from .preroll import PrerollBuffer
+from .stats import LatencyHistogram
+from .presets import CaptureSettings, resolve_capture_settings
+from .replay import ReplayAudioSource
 
-__all__ = ["MicrophoneController", "MicrophoneStream"]
+__all__ = [
+    "MicrophoneController",
+    "MicrophoneStream",
+    "AsyncMicrophoneStream",
+    "AudioGap",
+    "AudioRingBuffer",
+    "AudioHub",
+    "AudioSubscription",
+    "PrerollBuffer",
+    "LatencyHistogram",
+    "CaptureSettings",
+    "resolve_capture_settings",
+    "ReplayAudioSource",
+]
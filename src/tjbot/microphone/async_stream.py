@@ -0,0 +1,162 @@
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+import asyncio
+import logging
+import select
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from ..error import TJBotError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMicrophoneStream:
+    """
+    Microphone stream for asyncio applications.
+
+    Opens the ALSA PCM in non-blocking mode and waits on its poll descriptors from
+    the event loop, so capture needs no thread and no cross-thread handoff:
+
+        async with mic.stream_async() as stream:
+            async for chunk in stream:
+                ...
+    """
+    def __init__(
+        self,
+        rate: int,
+        channels: int,
+        chunk_size: int,
+        device: str = 'default',
+        is_paused: Optional[Callable[[], bool]] = None
+    ):
+        self.rate = rate
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.device = device
+        self.closed = True
+        self.pcm: Optional['alsaaudio.PCM'] = None
+        self._is_paused = is_paused or (lambda: False)
+        self._fds: List[int] = []
+        self._ready: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Fallback wait when poll reports readiness but no period is available yet
+        self._idle_wait = chunk_size / rate / 4
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._loop is None:
+            # First iteration without `async with`
+            self.open()
+        chunk = await self.read()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    def open(self) -> None:
+        if not self.closed:
+            return
+
+        if not alsaaudio:
+            raise TJBotError("pyalsaaudio is not installed")
+
+        self.pcm = alsaaudio.PCM(
+            type=alsaaudio.PCM_CAPTURE,
+            mode=alsaaudio.PCM_NONBLOCK,
+            device=self.device
+        )
+        self.pcm.setchannels(self.channels)
+        self.pcm.setrate(self.rate)
+        self.pcm.setformat(alsaaudio.PCM_FORMAT_S16_LE)  # 16-bit signed little-endian
+        self.pcm.setperiodsize(self.chunk_size)
+
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._fds = [fd for fd, mask in self._poll_descriptors() if mask & select.POLLIN]
+        for fd in self._fds:
+            self._loop.add_reader(fd, self._ready.set)
+        self.closed = False
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self._loop:
+            for fd in self._fds:
+                self._loop.remove_reader(fd)
+        self._fds = []
+        if self._ready:
+            # Wake up a pending read()
+            self._ready.set()
+        if self.pcm:
+            self.pcm.close()
+            self.pcm = None
+
+    def _poll_descriptors(self) -> List[Tuple[int, int]]:
+        pcm = self.pcm
+        if pcm is None:
+            return []
+        return list(pcm.polldescriptors())
+
+    async def read(self) -> Optional[bytes]:
+        """
+        Wait for the next period of audio.
+        Periods captured while paused are drained and dropped.
+        :return: The chunk, or None once the stream is closed.
+        """
+        woke_empty = False
+        while not self.closed and self.pcm:
+            length, data = self.pcm.read()
+            if length > 0:
+                woke_empty = False
+                if self._is_paused():
+                    continue
+                return data
+            if length < 0:
+                # -EPIPE: ALSA overrun, capture restarts on the next read
+                logger.debug(f"ALSA capture overrun ({length})")
+                continue
+
+            ready = self._ready
+            if woke_empty or not self._fds or ready is None:
+                # Poll readiness is only a hint; don't spin while less than a period is buffered
+                await asyncio.sleep(self._idle_wait)
+                woke_empty = False
+                continue
+
+            ready.clear()
+            await ready.wait()
+            woke_empty = True
+        return None
+
+    def generator(self) -> Iterator[bytes]:
+        """
+        Blocking adapter: drives the async stream on a private event loop in the
+        calling thread, for code that is not written with asyncio.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            async def open_stream() -> None:
+                self.open()
+
+            loop.run_until_complete(open_stream())
+            while True:
+                chunk = loop.run_until_complete(self.read())
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # Readers are registered with this loop; release them before it goes away
+            self.close()
+            loop.close()
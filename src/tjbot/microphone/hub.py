@@ -0,0 +1,238 @@
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from ..error import TJBotError
+from .stats import LatencyHistogram
+
+LAG_LOSSY = 'lossy'
+LAG_LOSSLESS = 'lossless'
+
+LAG_POLICIES = (LAG_LOSSY, LAG_LOSSLESS)
+
+
+class AudioSubscription:
+    """
+    A single reader of an AudioHub.
+    Each subscription keeps its own cursor into the hub's shared slots. Lossless
+    subscribers read without copying: their chunks are memoryviews of a slot the writer
+    cannot reuse until the next read. The writer does not wait for lossy subscribers, so
+    they get a copy of each chunk that stays valid for as long as it is kept.
+    """
+    def __init__(self, hub: 'AudioHub', lag_policy: str, cursor: int):
+        self.hub = hub
+        self.lag_policy = lag_policy
+        self.cursor = cursor
+        self.closed = False
+
+        # Audio captured before the subscription started, yielded first by generator()
+        self.preroll = b''
+
+        # Number of chunks skipped because this (lossy) subscriber fell behind
+        self.lagged = 0
+
+        # Capture timestamp (time.monotonic()) of the chunk returned by the last read
+        self.timestamp = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return self.generator()
+
+    def read(self, timeout: Optional[float] = None) -> Optional[memoryview]:
+        """
+        Return the next chunk for this subscriber, blocking until one is available.
+        :param timeout: Maximum number of seconds to wait, or None to wait forever.
+        :return: The chunk, or None if the hub or subscription was closed (or the timeout expired).
+        """
+        return self.hub._read(self, timeout)
+
+    def generator(self) -> Iterator[memoryview]:
+        try:
+            if self.preroll:
+                yield memoryview(self.preroll)
+            while True:
+                chunk = self.read()
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.close()
+
+    def timed_generator(self) -> Iterator[Tuple[float, memoryview]]:
+        """
+        Like generator(), but yields (capture timestamp, chunk) pairs.
+        Pre-roll audio is stamped with the time the subscription started.
+        """
+        started = time.monotonic()
+        for chunk in self.generator():
+            yield (self.timestamp or started), chunk
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class AudioHub:
+    """
+    Broadcasts audio chunks from one writer to any number of subscribers.
+
+    Chunks are stored once in preallocated slots and tagged with a sequence number.
+    Lossy subscribers that fall more than `capacity` chunks behind skip ahead to the
+    newest chunk; lossless subscribers hold the writer back until they catch up.
+    """
+    def __init__(self, slot_size: int, capacity: int = 64):
+        if slot_size <= 0 or capacity <= 0:
+            raise TJBotError("audio hub slot size and capacity must be positive")
+
+        self.slot_size = slot_size
+        self.capacity = capacity
+
+        # One extra slot so the chunk held by a lossless reader is never overwritten
+        self._num_slots = capacity + 1
+        self._buffer = bytearray(slot_size * self._num_slots)
+        view = memoryview(self._buffer)
+        self._slot_views: List[memoryview] = [
+            view[i * slot_size:(i + 1) * slot_size] for i in range(self._num_slots)
+        ]
+        self._lengths: List[int] = [0] * self._num_slots
+        self._timestamps: List[float] = [0.0] * self._num_slots
+
+        # Sequence number of the next chunk to be written
+        self._head = 0
+        self._subscribers: Set[AudioSubscription] = set()
+        self._lossless: Set[AudioSubscription] = set()
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.closed = False
+
+        # Instrumentation
+        self.latency = LatencyHistogram()
+        self.high_water = 0
+        self.lagged = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @property
+    def head(self) -> int:
+        """Sequence number of the next chunk to be written."""
+        return self._head
+
+    def subscribe(self, lag_policy: str = LAG_LOSSLESS, start: Optional[int] = None) -> AudioSubscription:
+        """
+        Add a subscriber. It starts reading at the next chunk written.
+        :param lag_policy: 'lossy' to skip ahead when falling behind, 'lossless' to slow the writer down instead.
+        :param start: Sequence number to start at instead (must not be older than the oldest buffered chunk).
+        :return: The new subscription.
+        """
+        if lag_policy not in LAG_POLICIES:
+            raise TJBotError(f"unknown lag policy '{lag_policy}', expected one of {', '.join(LAG_POLICIES)}")
+
+        with self._lock:
+            cursor = self._head if start is None else max(start, self._head - self.capacity)
+            subscription = AudioSubscription(self, lag_policy, cursor)
+            if self.closed:
+                subscription.closed = True
+                return subscription
+
+            self._subscribers.add(subscription)
+            if lag_policy == LAG_LOSSLESS:
+                self._lossless.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: AudioSubscription) -> None:
+        with self._lock:
+            subscription.closed = True
+            self._subscribers.discard(subscription)
+            self._lossless.discard(subscription)
+            self._changed.notify_all()
+
+    def write(self, data, timestamp: Optional[float] = None) -> bool:
+        """
+        Publish a chunk to all subscribers.
+        Blocks while any lossless subscriber is a full buffer behind.
+        :param data: Bytes-like chunk, at most slot_size bytes.
+        :param timestamp: Capture time of the chunk (time.monotonic()); defaults to now.
+        :return: True if the chunk was published, False if the hub was closed.
+        """
+        length = len(data)
+        if length > self.slot_size:
+            raise TJBotError(f"audio chunk of {length} bytes exceeds audio hub slot size of {self.slot_size} bytes")
+
+        with self._lock:
+            while not self.closed and any(self._head - s.cursor >= self.capacity for s in self._lossless):
+                self._changed.wait()
+            if self.closed:
+                return False
+
+            slot = self._head % self._num_slots
+            self._slot_views[slot][:length] = data
+            self._lengths[slot] = length
+            self._timestamps[slot] = time.monotonic() if timestamp is None else timestamp
+            self._head += 1
+            self._changed.notify_all()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of hub counters and the capture-to-read latency histogram (milliseconds).
+        """
+        with self._lock:
+            return {
+                'chunks_published': self._head,
+                'subscribers': len(self._subscribers),
+                'high_water': self.high_water,
+                'capacity': self.capacity,
+                'lagged_chunks': self.lagged,
+                'chunk_latency_ms': self.latency.snapshot(),
+            }
+
+    def close(self) -> None:
+        """
+        Close the hub. Subscribers can still read chunks they have not consumed yet.
+        """
+        with self._lock:
+            self.closed = True
+            self._changed.notify_all()
+
+    def _read(self, subscription: AudioSubscription, timeout: Optional[float]) -> Optional[memoryview]:
+        with self._lock:
+            while subscription.cursor >= self._head:
+                if self.closed or subscription.closed:
+                    return None
+                if not self._changed.wait(timeout):
+                    return None
+            if subscription.closed:
+                return None
+
+            backlog = self._head - subscription.cursor
+            if backlog > self.high_water:
+                self.high_water = backlog
+            if backlog > self.capacity:
+                # Oldest unread chunks were overwritten; jump to the newest one
+                skipped = self._head - 1 - subscription.cursor
+                subscription.lagged += skipped
+                self.lagged += skipped
+                subscription.cursor = self._head - 1
+
+            slot = subscription.cursor % self._num_slots
+            subscription.cursor += 1
+            subscription.timestamp = self._timestamps[slot]
+            self.latency.record((time.monotonic() - subscription.timestamp) * 1000.0)
+            if subscription.lag_policy == LAG_LOSSLESS:
+                self._changed.notify_all()
+
+            length = self._lengths[slot]
+            view = self._slot_views[slot]
+            chunk = view if length == self.slot_size else view[:length]
+            if subscription.lag_policy == LAG_LOSSY:
+                # The writer may overwrite this slot as soon as the lock is released
+                return memoryview(bytes(chunk))
+            return chunk
@@ -3,26 +3,86 @@ try:
 except ImportError:
     alsaaudio = None
 
-import queue
+import logging
 import threading
-from typing import Optional, Iterator
+import time
+from collections import deque
+from typing import Any, Deque, Dict, NamedTuple, Optional, Iterator, List
 from ..error import TJBotError
+from .ring_buffer import AudioRingBuffer, OVERRUN_DROP_OLDEST
+from .hub import AudioHub, AudioSubscription, LAG_LOSSLESS
+from .async_stream import AsyncMicrophoneStream
+from .preroll import PrerollBuffer
+from .presets import CaptureSettings, resolve_capture_settings, LATENCY_PRESETS
+
+logger = logging.getLogger(__name__)
+
+# Bytes per sample for PCM_FORMAT_S16_LE
+SAMPLE_WIDTH = 2
+
+# Number of pause gaps remembered per stream
+MAX_GAPS = 32
+
+
+class AudioGap(NamedTuple):
+    """
+    A period during which captured audio was dropped because the microphone was paused.
+    Times are time.monotonic() seconds; `end` is None while the pause is ongoing.
+    """
+    start: float
+    end: Optional[float]
+
+def _s32_to_s16(data: bytes) -> bytes:
+    """Keep the high 16 bits of each little-endian 32-bit sample."""
+    out = bytearray(len(data) // 2)
+    out[0::2] = data[2::4]
+    out[1::2] = data[3::4]
+    return bytes(out)
+
 
 class MicrophoneStream:
     """
     Microphone stream that acts as an iterator or file-like object.
-    It captures audio from ALSA and yields chunks.
+    It captures audio from ALSA into a preallocated ring buffer and yields chunks
+    as memoryviews, which are only valid until the next chunk is requested.
     """
-    def __init__(self, rate: int, channels: int, chunk_size: int, device: str = 'default'):
+    def __init__(
+        self,
+        rate: int,
+        channels: int,
+        chunk_size: int,
+        device: str = 'default',
+        buffer_chunks: int = 64,
+        overrun_policy: str = OVERRUN_DROP_OLDEST,
+        period_count: int = 4,
+        sample_format: str = 'S16_LE'
+    ):
         self.rate = rate
         self.channels = channels
         self.chunk_size = chunk_size
         self.device = device
-        self._buff = queue.Queue()
+        self.period_count = period_count
+        self.sample_format = sample_format
+        # Chunks are always delivered as S16_LE, whatever format the device is read in
+        self.chunk_bytes = chunk_size * channels * SAMPLE_WIDTH
+        self._buff = AudioRingBuffer(self.chunk_bytes, buffer_chunks, overrun_policy)
+        self._buff.close()
         self.closed = True
         self.pcm: Optional['alsaaudio.PCM'] = None
         self._thread: Optional[threading.Thread] = None
 
+        # Pause gate: the capture thread keeps draining ALSA but drops periods
+        self._paused = False
+        self._gaps: Deque[AudioGap] = deque(maxlen=MAX_GAPS)
+        self._gap_lock = threading.Lock()
+        self.dropped_while_paused = 0
+
+        # Capture counters (written only by the capture thread)
+        self.periods_read = 0
+        self.bytes_read = 0
+        self.alsa_overruns = 0
+        self.read_errors = 0
+
     def __enter__(self):
         self.start()
         return self
@@ -38,18 +98,23 @@ class MicrophoneStream:
             raise TJBotError("pyalsaaudio is not installed")
 
         self.closed = False
+        self._buff = AudioRingBuffer(self.chunk_bytes, self._buff.capacity, self._buff.overrun_policy)
 
         # Open ALSA PCM device for recording
         self.pcm = alsaaudio.PCM(
             type=alsaaudio.PCM_CAPTURE,
             mode=alsaaudio.PCM_NORMAL,
-            device=self.device
+            device=self.device,
+            periods=self.period_count
         )
 
         # Set attributes
         self.pcm.setchannels(self.channels)
         self.pcm.setrate(self.rate)
-        self.pcm.setformat(alsaaudio.PCM_FORMAT_S16_LE)  # 16-bit signed little-endian
+        if self.sample_format == 'S32_LE':
+            self.pcm.setformat(alsaaudio.PCM_FORMAT_S32_LE)  # converted to 16-bit as it is read
+        else:
+            self.pcm.setformat(alsaaudio.PCM_FORMAT_S16_LE)  # 16-bit signed little-endian
         self.pcm.setperiodsize(self.chunk_size)
 
         # Start capture thread
@@ -58,14 +123,14 @@ class MicrophoneStream:
 
     def stop(self):
         self.closed = True
+        # Wake up the capture thread if it is blocked on a full buffer
+        self._buff.close()
         if self._thread:
             self._thread.join(timeout=1.0)
             self._thread = None
         if self.pcm:
             self.pcm.close()
             self.pcm = None
-        # Signal end of stream
-        self._buff.put(None)
 
     def _capture_loop(self):
         """Background thread that continuously reads from ALSA"""
@@ -73,15 +138,95 @@ class MicrophoneStream:
             try:
                 # Read audio data
                 length, data = self.pcm.read()
-                if length > 0:
-                    self._buff.put(data)
+                timestamp = time.monotonic()
+                if length < 0:
+                    # -EPIPE: the device overran because periods were not read in time
+                    self.alsa_overruns += 1
+                    logger.debug(f"ALSA capture overrun ({length})")
+                    continue
+                if length == 0:
+                    continue
+
+                self.periods_read += 1
+                self.bytes_read += len(data)
+                if self.sample_format == 'S32_LE':
+                    data = _s32_to_s16(data)
+                if self._paused:
+                    self.dropped_while_paused += 1
+                elif len(data) <= self.chunk_bytes:
+                    self._buff.write(data, timestamp)
+                else:
+                    # ALSA may hand back more than one period; store it slot by slot,
+                    # dating each slot by when its last frame was captured
+                    view = memoryview(data)
+                    byte_rate = self.rate * self.channels * SAMPLE_WIDTH
+                    for offset in range(0, len(data), self.chunk_bytes):
+                        end = min(offset + self.chunk_bytes, len(data))
+                        self._buff.write(view[offset:end], timestamp - (len(data) - end) / byte_rate)
             except Exception as e:
                 if not self.closed:
-                    print(f"Error reading from microphone: {e}")
+                    self.read_errors += 1
+                    logger.error(f"Error reading from microphone: {e}")
                 break
 
-    def generator(self) -> Iterator[bytes]:
-        while not self.closed:
+    def pause(self) -> None:
+        """
+        Drop captured audio until resume() is called. The PCM handle stays open
+        and the capture thread keeps draining periods, so resuming is immediate.
+        """
+        with self._gap_lock:
+            if self._paused:
+                return
+            self._paused = True
+            self._gaps.append(AudioGap(time.monotonic(), None))
+
+    def resume(self) -> None:
+        with self._gap_lock:
+            if not self._paused:
+                return
+            self._paused = False
+            start, _ = self._gaps[-1]
+            self._gaps[-1] = AudioGap(start, time.monotonic())
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def gaps(self) -> List[AudioGap]:
+        """Recent pause gaps, oldest first."""
+        with self._gap_lock:
+            return list(self._gaps)
+
+    @property
+    def overruns(self) -> int:
+        """Number of chunks dropped (or writes blocked) because the buffer was full."""
+        return self._buff.overruns
+
+    @property
+    def timestamp(self) -> float:
+        """Capture timestamp (time.monotonic()) of the chunk last returned by the generator."""
+        return self._buff.timestamp
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of capture counters.
+        """
+        return {
+            'periods_read': self.periods_read,
+            'bytes_read': self.bytes_read,
+            'alsa_overruns': self.alsa_overruns,
+            'read_errors': self.read_errors,
+            'dropped_while_paused': self.dropped_while_paused,
+            'buffer_overruns': self._buff.overruns,
+            'buffer_dropped_bytes': self._buff.dropped_bytes,
+            'buffer_high_water': self._buff.high_water,
+            'buffer_capacity': self._buff.capacity,
+            'buffer_depth': len(self._buff),
+        }
+
+    def generator(self) -> Iterator[memoryview]:
+        while True:
             chunk = self._buff.get()
             if chunk is None:
                 return
@@ -93,22 +238,50 @@ class MicrophoneStream:
         chunk = self._buff.get()
         if chunk is None:
             return b""
-        return chunk
+        return bytes(chunk)
 
 
 class MicrophoneController:
     """
     TJBot Microphone Controller.
+    Captured audio is broadcast through an AudioHub, so several consumers (STT, VAD,
+    level meters, recorders) can read the same capture from one ALSA handle.
     """
     def __init__(self):
         self.rate = 16000
         self.channels = 1
         self.device = 'default'
+        self.buffer_chunks = 64
+        self.overrun_policy = OVERRUN_DROP_OLDEST
+        self.capture_settings = CaptureSettings(period_size=1024, period_count=4, sample_format='S16_LE')
         self.stream: Optional[MicrophoneStream] = None
+        self._paused = False
+        self.hub: Optional[AudioHub] = None
+        self._pump_thread: Optional[threading.Thread] = None
 
-    def initialize(self, rate: int = 16000, channels: int = 1, device_name: str = "") -> None:
+        # Optional always-on window of recent audio
+        self.preroll_seconds = 0.0
+        self.preroll: Optional[PrerollBuffer] = None
+        self._preroll_lock = threading.Lock()
+        self._chunks_captured = 0
+
+    def initialize(
+        self,
+        rate: int = 16000,
+        channels: int = 1,
+        device_name: str = "",
+        buffer_chunks: int = 64,
+        overrun_policy: str = OVERRUN_DROP_OLDEST,
+        preroll_seconds: float = 0.0,
+        capture_settings: Optional[CaptureSettings] = None
+    ) -> None:
         self.rate = rate
         self.channels = channels
+        self.buffer_chunks = buffer_chunks
+        self.overrun_policy = overrun_policy
+        self.preroll_seconds = preroll_seconds
+        if capture_settings:
+            self.capture_settings = capture_settings
 
         if device_name:
             # Use the device name directly for ALSA
@@ -123,29 +296,194 @@ class MicrophoneController:
         self.stream = MicrophoneStream(
             rate=self.rate,
             channels=self.channels,
-            chunk_size=1024,
-            device=self.device
+            chunk_size=self.capture_settings.period_size,
+            device=self.device,
+            buffer_chunks=self.buffer_chunks,
+            overrun_policy=self.overrun_policy,
+            period_count=self.capture_settings.period_count,
+            sample_format=self.capture_settings.sample_format
         )
+        if self._paused:
+            self.stream.pause()
         self.stream.start()
 
+        self.hub = AudioHub(self.stream.chunk_bytes, self.buffer_chunks)
+        self._chunks_captured = 0
+        if self.preroll_seconds > 0:
+            self.preroll = PrerollBuffer(self.rate, self.channels, self.preroll_seconds)
+        self._pump_thread = threading.Thread(target=self._pump_loop, args=(self.stream, self.hub), daemon=True)
+        self._pump_thread.start()
+
     def stop(self) -> None:
         if self.stream:
             self.stream.stop()
             self.stream = None
+        if self.hub:
+            self.hub.close()
+            self.hub = None
+        if self._pump_thread:
+            self._pump_thread.join(timeout=1.0)
+            self._pump_thread = None
+
+    def _pump_loop(self, stream: MicrophoneStream, hub: AudioHub) -> None:
+        """Background thread that moves captured chunks into the pre-roll window and the hub"""
+        try:
+            for chunk in stream.generator():
+                if self.preroll:
+                    # Keep the pre-roll and the hub's sequence numbers in step for subscribe()
+                    with self._preroll_lock:
+                        self.preroll.write(chunk)
+                        self._chunks_captured += 1
+                if not hub.write(chunk, stream.timestamp):
+                    break
+        finally:
+            hub.close()
 
     def pause(self) -> None:
-        # ALSA doesn't have native pause/resume, so we stop/start
-        # For now, we'll just leave it running or implement stop/start
-        pass
+        """
+        Stop delivering audio (e.g. while TJBot is speaking) without closing the device.
+        Never blocks; consumers simply receive no chunks until resume().
+        """
+        self._paused = True
+        if self.stream:
+            self.stream.pause()
 
     def resume(self) -> None:
-        # ALSA doesn't have native pause/resume
-        pass
+        self._paused = False
+        if self.stream:
+            self.stream.resume()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
 
-    def get_input_stream(self) -> Iterator[bytes]:
+    @property
+    def gaps(self) -> List[AudioGap]:
         """
-        Returns a generator yielding audio chunks.
+        Timestamped pause gaps (time.monotonic() seconds) for the current capture,
+        so downstream stages can tell where audio is missing.
+        """
+        return self.stream.gaps if self.stream else []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of capture instrumentation, for debugging choppy audio:
+
+        - capture: periods/bytes read, ALSA overruns, read errors, periods dropped while paused,
+          and the capture ring buffer's overruns and high-water mark
+        - hub: subscribers, high-water backlog, chunks skipped by lossy subscribers, and a
+          histogram of the time (ms) from capture until a subscriber read each chunk
+        """
+        return {
+            'running': bool(self.stream and not self.stream.closed),
+            'paused': self._paused,
+            'capture': self.stream.stats() if self.stream else {},
+            'hub': self.hub.stats() if self.hub else {},
+        }
+
+    def measure_presets(self, seconds: float = 5.0, board: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Capture with each latency preset in turn and report what it costs on this board.
+        Any running capture is stopped first and restarted with the configured settings afterwards.
+        :param seconds: How long to capture with each preset.
+        :return: {preset: {period_size, period_count, period_ms, wakeups_per_second, cpu_percent}}
+        """
+        was_running = bool(self.stream and not self.stream.closed)
+        configured = self.capture_settings
+        self.stop()
+
+        results: Dict[str, Dict[str, Any]] = {}
+        try:
+            for preset in LATENCY_PRESETS:
+                self.capture_settings = resolve_capture_settings(
+                    self.rate, preset, sample_format=configured.sample_format, board=board
+                )
+                self.start()
+                stream = self.stream
+                if stream is None:
+                    raise TJBotError("microphone stream did not start")
+                with self.subscribe() as subscription:
+                    cpu_start = time.process_time()
+                    wall_start = time.monotonic()
+                    periods_start = stream.periods_read
+                    while time.monotonic() - wall_start < seconds:
+                        if subscription.read(timeout=0.5) is None and stream.closed:
+                            break
+                    wall = time.monotonic() - wall_start
+                    cpu = time.process_time() - cpu_start
+                    periods = stream.periods_read - periods_start
+                self.stop()
+
+                results[preset] = {
+                    'period_size': self.capture_settings.period_size,
+                    'period_count': self.capture_settings.period_count,
+                    'period_ms': self.capture_settings.period_size * 1000.0 / self.rate,
+                    'wakeups_per_second': periods / wall if wall else 0.0,
+                    'cpu_percent': 100.0 * cpu / wall if wall else 0.0,
+                }
+        finally:
+            self.stop()
+            self.capture_settings = configured
+            if was_running:
+                self.start()
+
+        return results
+
+    def stream_async(self) -> AsyncMicrophoneStream:
+        """
+        Returns an asyncio microphone stream that captures without a background thread:
+
+            async for chunk in mic.stream_async():
+                ...
+
+        It opens its own non-blocking PCM handle, so use it instead of start(),
+        not alongside it. The stream honours pause()/resume().
         """
-        if not self.stream:
+        return AsyncMicrophoneStream(
+            rate=self.rate,
+            channels=self.channels,
+            chunk_size=self.capture_settings.period_size,
+            device=self.device,
+            is_paused=lambda: self._paused
+        )
+
+    def subscribe(self, lag_policy: str = LAG_LOSSLESS, preroll_ms: float = 0) -> AudioSubscription:
+        """
+        Add a consumer of the microphone audio.
+        :param lag_policy: 'lossless' (default) holds capture distribution back for a slow reader;
+                           'lossy' lets a slow reader skip ahead to the newest audio.
+        :param preroll_ms: Milliseconds of already captured audio to deliver first
+                           (requires a pre-roll window, see initialize()).
+        :return: Subscription to read chunks from; close it when done.
+        """
+        if not self.hub:
             raise TJBotError("Microphone not started")
-        return self.stream.generator()
+
+        if preroll_ms > 0 and self.preroll:
+            # Snapshot the window and the matching sequence number together, so no chunk is lost or repeated
+            with self._preroll_lock:
+                preroll = self.preroll.last(preroll_ms)
+                start = self._chunks_captured
+            subscription = self.hub.subscribe(lag_policy, start=start)
+            subscription.preroll = preroll
+            return subscription
+
+        return self.hub.subscribe(lag_policy)
+
+    def get_input_stream(self, lag_policy: str = LAG_LOSSLESS, preroll_ms: float = 0) -> Iterator[memoryview]:
+        """
+        Returns a generator yielding audio chunks.
+        Each call creates a new subscriber, so several generators can be read at once.
+        Each chunk is a memoryview into shared capture buffers and is only valid
+        until the next chunk is requested; copy it with bytes() to keep it.
+        """
+        return self.subscribe(lag_policy, preroll_ms).generator()
+
+    def save_recent_audio(self, file_path: str, seconds: float) -> str:
+        """
+        Write the last `seconds` of captured audio to a WAV file, e.g. to debug field recordings.
+        :return: The path written.
+        """
+        if not self.preroll:
+            raise TJBotError("Pre-roll buffer is not enabled. Set 'prerollSeconds' in the listen config.")
+        return self.preroll.save_wav(file_path, seconds)
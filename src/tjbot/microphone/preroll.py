@@ -0,0 +1,85 @@
+import threading
+import wave
+
+from ..error import TJBotError
+
+# Bytes per sample for PCM_FORMAT_S16_LE
+SAMPLE_WIDTH = 2
+
+
+class PrerollBuffer:
+    """
+    Rolling window of the most recent microphone audio, stored as raw int16 PCM
+    in a single preallocated bytearray.
+    """
+    def __init__(self, rate: int, channels: int, seconds: float):
+        if seconds <= 0:
+            raise TJBotError("pre-roll window must be longer than 0 seconds")
+
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = channels * SAMPLE_WIDTH
+        self.size = int(rate * seconds) * self.frame_bytes
+        self._buffer = bytearray(self.size)
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self._filled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        """Seconds of audio currently held."""
+        return self._filled / self.frame_bytes / self.rate
+
+    def write(self, data) -> None:
+        """
+        Append a chunk, overwriting the oldest audio once the window is full.
+        """
+        length = len(data)
+        with self._lock:
+            if length >= self.size:
+                self._view[:] = data[length - self.size:]
+                self._pos = 0
+                self._filled = self.size
+                return
+
+            first = min(length, self.size - self._pos)
+            self._view[self._pos:self._pos + first] = data[:first]
+            if first < length:
+                self._view[:length - first] = data[first:]
+            self._pos = (self._pos + length) % self.size
+            self._filled = min(self.size, self._filled + length)
+
+    def last(self, ms: float) -> bytes:
+        """
+        Copy out the most recent audio.
+        :param ms: Milliseconds of audio wanted; less is returned if the window holds less.
+        :return: Raw int16 PCM, whole frames only.
+        """
+        nbytes = int(self.rate * ms / 1000) * self.frame_bytes
+        with self._lock:
+            nbytes = min(nbytes, self._filled)
+            start = self._pos - nbytes
+            if start >= 0:
+                return bytes(self._view[start:self._pos])
+            return bytes(self._view[start + self.size:]) + bytes(self._view[:self._pos])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pos = 0
+            self._filled = 0
+
+    def save_wav(self, file_path: str, seconds: float) -> str:
+        """
+        Write the most recent audio to a WAV file (useful for debugging field recordings).
+        :param file_path: Destination path.
+        :param seconds: Seconds of audio to write.
+        :return: The path written.
+        """
+        data = self.last(seconds * 1000)
+        with wave.open(file_path, 'wb') as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(SAMPLE_WIDTH)
+            wav_file.setframerate(self.rate)
+            wav_file.writeframes(data)
+        return file_path
@@ -0,0 +1,82 @@
+import math
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from ..error import TJBotError
+
+PRESET_LOW_LATENCY = 'low-latency'
+PRESET_BALANCED = 'balanced'
+PRESET_LOW_CPU = 'low-cpu'
+
+SAMPLE_FORMATS = ('S16_LE', 'S32_LE')
+
+# (period length in ms, number of periods in the ALSA buffer) per board.
+# Every period is one wakeup of the capture thread, which costs noticeably more
+# on a Pi 3 than on a Pi 5, so slower boards get longer periods.
+LATENCY_PRESETS: Dict[str, Dict[str, Tuple[float, int]]] = {
+    PRESET_LOW_LATENCY: {'pi5': (8, 4), 'pi4': (10, 4), 'pi3': (16, 4), 'other': (10, 4)},
+    PRESET_BALANCED: {'pi5': (23, 4), 'pi4': (23, 4), 'pi3': (23, 4), 'other': (23, 4)},
+    PRESET_LOW_CPU: {'pi5': (93, 3), 'pi4': (93, 3), 'pi3': (186, 3), 'other': (93, 3)},
+}
+
+
+class CaptureSettings(NamedTuple):
+    """
+    ALSA capture parameters.
+    period_size is in frames; sample_format is the ALSA format read from the device
+    (audio is always delivered downstream as 16-bit signed little-endian).
+    """
+    period_size: int
+    period_count: int
+    sample_format: str
+
+
+def board_family() -> str:
+    """Short name of the detected board, used to pick preset values."""
+    # Imported here: rpi_drivers imports the microphone package
+    from ..rpi_drivers.rpi_detect import RPiDetect
+
+    if RPiDetect.is_pi5():
+        return 'pi5'
+    if RPiDetect.is_pi4():
+        return 'pi4'
+    if RPiDetect.is_pi3():
+        return 'pi3'
+    return 'other'
+
+
+def _period_frames(rate: int, period_ms: float) -> int:
+    # ALSA drivers prefer power-of-two period sizes
+    frames = max(32, rate * period_ms / 1000.0)
+    return 2 ** int(round(math.log2(frames)))
+
+
+def resolve_capture_settings(
+    rate: int,
+    preset: Optional[str] = PRESET_BALANCED,
+    period_size: Optional[int] = None,
+    period_count: Optional[int] = None,
+    sample_format: Optional[str] = None,
+    board: Optional[str] = None
+) -> CaptureSettings:
+    """
+    Work out capture parameters from a latency preset, with explicit values taking precedence.
+    :param rate: Capture sample rate in Hz.
+    :param preset: 'low-latency', 'balanced' or 'low-cpu'.
+    :param board: Board family ('pi5', 'pi4', 'pi3', 'other'); detected when omitted.
+    """
+    preset = preset or PRESET_BALANCED
+    if preset not in LATENCY_PRESETS:
+        raise TJBotError(f"unknown latency preset '{preset}', expected one of {', '.join(LATENCY_PRESETS)}")
+
+    sample_format = sample_format or 'S16_LE'
+    if sample_format not in SAMPLE_FORMATS:
+        raise TJBotError(f"unsupported sample format '{sample_format}', expected one of {', '.join(SAMPLE_FORMATS)}")
+
+    values = LATENCY_PRESETS[preset]
+    period_ms, preset_count = values.get(board or board_family(), values['other'])
+
+    return CaptureSettings(
+        period_size=period_size or _period_frames(rate, period_ms),
+        period_count=period_count or preset_count,
+        sample_format=sample_format
+    )
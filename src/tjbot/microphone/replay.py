@@ -0,0 +1,133 @@
+import time
+import wave
+from typing import Any, Iterator, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..error import TJBotError
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+
+class ReplayAudioSource:
+    """
+    Audio source that replays a WAV file or array with the same interface as
+    MicrophoneStream, so the listen pipeline can be benchmarked without a microphone.
+
+    In real-time mode each chunk is released when it would have finished being
+    captured (paced by time.monotonic()); otherwise chunks are yielded as fast as
+    they are consumed.
+    """
+    def __init__(
+        self,
+        source: Union[str, bytes, Any],
+        rate: Optional[int] = None,
+        channels: Optional[int] = None,
+        chunk_size: int = 1024,
+        realtime: bool = True
+    ):
+        """
+        :param source: Path to a 16-bit PCM WAV file, raw int16 PCM bytes, or a NumPy array
+                       (int16, or float in [-1, 1]) shaped (frames,) or (frames, channels).
+        :param rate: Sample rate; read from the file for WAV sources, required otherwise.
+        :param channels: Channel count; read from the file/array shape when omitted.
+        :param chunk_size: Frames per chunk, like the microphone period size.
+        :param realtime: Pace chunks in real time (True) or replay as fast as possible (False).
+        """
+        if isinstance(source, str):
+            with wave.open(source, 'rb') as wav_file:
+                if wav_file.getsampwidth() != SAMPLE_WIDTH:
+                    raise TJBotError(f"{source}: only 16-bit PCM WAV files can be replayed")
+                rate = wav_file.getframerate()
+                channels = wav_file.getnchannels()
+                data = wav_file.readframes(wav_file.getnframes())
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+        else:
+            if np is None:
+                raise TJBotError("numpy is not installed")
+            array = np.asarray(source)
+            if channels is None:
+                channels = array.shape[1] if array.ndim == 2 else 1
+            if array.dtype.kind == 'f':
+                array = np.clip(np.rint(array * 32767.0), -32768, 32767)
+            data = array.astype('<i2').tobytes()
+
+        if not rate:
+            raise TJBotError("sample rate is required to replay raw audio")
+
+        self.rate = rate
+        self.channels = channels or 1
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.chunk_bytes = chunk_size * self.channels * SAMPLE_WIDTH
+        self.device = 'replay'
+        self._data = data
+        self._reader: Optional[Iterator[memoryview]] = None
+        self.closed = True
+
+        # Monotonic times of replay start, the last chunk returned and the end of the source
+        self.started_at = 0.0
+        self.timestamp = 0.0
+        self.finished_at: Optional[float] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return self.generator()
+
+    @property
+    def duration(self) -> float:
+        """Length of the source in seconds."""
+        return len(self._data) / (self.rate * self.channels * SAMPLE_WIDTH)
+
+    def start(self) -> None:
+        self.closed = False
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    def stop(self) -> None:
+        self.closed = True
+
+    def generator(self) -> Iterator[memoryview]:
+        """
+        Yields chunks as memoryviews into the source data (no copies).
+        Starts the replay clock if start() was not called.
+        """
+        if self.closed:
+            self.start()
+
+        view = memoryview(self._data)
+        byte_rate = self.rate * self.channels * SAMPLE_WIDTH
+        for offset in range(0, len(self._data), self.chunk_bytes):
+            if self.closed:
+                return
+            end = min(offset + self.chunk_bytes, len(self._data))
+
+            if self.realtime:
+                # A microphone delivers a chunk once its last frame has been captured
+                due = self.started_at + end / byte_rate
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            self.timestamp = time.monotonic()
+            yield view[offset:end]
+
+        self.finished_at = time.monotonic()
+        self.closed = True
+
+    def read(self, size: int) -> bytes:
+        # File-like interface: returns the next chunk, like MicrophoneStream.read()
+        if self._reader is None:
+            self._reader = self.generator()
+        return bytes(next(self._reader, b''))
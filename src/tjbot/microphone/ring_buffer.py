@@ -0,0 +1,156 @@
+import threading
+from collections import deque
+from typing import Deque, List, Optional
+
+from ..error import TJBotError
+
+OVERRUN_DROP_OLDEST = 'drop-oldest'
+OVERRUN_DROP_NEWEST = 'drop-newest'
+OVERRUN_BLOCK = 'block'
+
+OVERRUN_POLICIES = (OVERRUN_DROP_OLDEST, OVERRUN_DROP_NEWEST, OVERRUN_BLOCK)
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size, preallocated ring buffer for audio chunks.
+
+    Storage is a single bytearray split into equally sized slots, allocated once.
+    Writers copy each chunk into a free slot; readers receive a memoryview of the
+    slot, which stays valid until the next call to get() or release().
+    """
+    def __init__(self, slot_size: int, capacity: int = 64, overrun_policy: str = OVERRUN_DROP_OLDEST):
+        if slot_size <= 0 or capacity <= 0:
+            raise TJBotError("ring buffer slot size and capacity must be positive")
+        if overrun_policy not in OVERRUN_POLICIES:
+            raise TJBotError(f"unknown overrun policy '{overrun_policy}', expected one of {', '.join(OVERRUN_POLICIES)}")
+
+        self.slot_size = slot_size
+        self.capacity = capacity
+        self.overrun_policy = overrun_policy
+
+        # One extra slot so the chunk held by the reader never reduces capacity
+        num_slots = capacity + 1
+        self._buffer = bytearray(slot_size * num_slots)
+        view = memoryview(self._buffer)
+        self._slot_views: List[memoryview] = [
+            view[i * slot_size:(i + 1) * slot_size] for i in range(num_slots)
+        ]
+        self._lengths: List[int] = [0] * num_slots
+        self._timestamps: List[float] = [0.0] * num_slots
+        self._free: List[int] = list(range(num_slots))
+        self._filled: Deque[int] = deque()
+        self._held: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.closed = False
+
+        # Counters
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.high_water = 0
+
+        # Capture timestamp of the chunk returned by the last get()
+        self.timestamp = 0.0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._filled)
+
+    def write(self, data, timestamp: float = 0.0) -> bool:
+        """
+        Copy a chunk into the buffer.
+        :param data: Bytes-like chunk, at most slot_size bytes.
+        :param timestamp: Capture time of the chunk (time.monotonic()).
+        :return: True if the chunk was stored, False if it was dropped.
+        """
+        length = len(data)
+        if length > self.slot_size:
+            raise TJBotError(f"audio chunk of {length} bytes exceeds ring buffer slot size of {self.slot_size} bytes")
+
+        with self._lock:
+            if self.closed:
+                return False
+
+            if len(self._filled) >= self.capacity:
+                self.overruns += 1
+                if self.overrun_policy == OVERRUN_DROP_NEWEST:
+                    self.dropped_bytes += length
+                    return False
+                elif self.overrun_policy == OVERRUN_DROP_OLDEST:
+                    oldest = self._filled.popleft()
+                    self.dropped_bytes += self._lengths[oldest]
+                    self._free.append(oldest)
+                else:
+                    while len(self._filled) >= self.capacity and not self.closed:
+                        self._not_full.wait()
+                    if self.closed:
+                        return False
+
+            slot = self._free.pop()
+            self._slot_views[slot][:length] = data
+            self._lengths[slot] = length
+            self._timestamps[slot] = timestamp
+            self._filled.append(slot)
+            if len(self._filled) > self.high_water:
+                self.high_water = len(self._filled)
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[memoryview]:
+        """
+        Return the oldest chunk, blocking until one is available.
+        The returned memoryview is only valid until the next get() or release().
+        :param timeout: Maximum number of seconds to wait, or None to wait forever.
+        :return: The chunk, or None if the buffer was closed (or the timeout expired).
+        """
+        with self._lock:
+            self._release_locked()
+
+            while not self._filled:
+                if self.closed:
+                    return None
+                if not self._not_empty.wait(timeout):
+                    return None
+
+            slot = self._filled.popleft()
+            self._held = slot
+            self.timestamp = self._timestamps[slot]
+            self._not_full.notify()
+            length = self._lengths[slot]
+            view = self._slot_views[slot]
+            return view if length == self.slot_size else view[:length]
+
+    def release(self) -> None:
+        """
+        Return the chunk handed out by the last get() to the pool.
+        """
+        with self._lock:
+            self._release_locked()
+
+    def clear(self) -> None:
+        """
+        Discard all buffered chunks.
+        """
+        with self._lock:
+            while self._filled:
+                self._free.append(self._filled.popleft())
+            self._not_full.notify_all()
+
+    def close(self) -> None:
+        """
+        Close the buffer and wake up any blocked readers or writers.
+        Chunks already buffered can still be read.
+        """
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def _release_locked(self) -> None:
+        if self._held is not None:
+            self._free.append(self._held)
+            self._held = None
+            self._not_full.notify()
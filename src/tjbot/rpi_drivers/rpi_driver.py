@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Optional, Set, Any
+import itertools
 import logging
 
 from ..config.models import (
@@ -12,9 +13,9 @@ from ..config.models import (
 )
 from ..utils import Capability, Hardware
 from ..camera import CameraController
-from ..microphone import MicrophoneController
+from ..microphone import MicrophoneController, resolve_capture_settings
 from ..speaker import SpeakerController
-from ..stt import STTController
+from ..stt import STTController, ListeningSession, WakeWordDetector
 from ..tts import TTSController
 from ..error import TJBotError
 
@@ -81,7 +82,16 @@ class RPiHardwareDriver(ABC):
         pass
 
     @abstractmethod
-    def listen_for_transcript(self, on_partial: Optional[Any] = None, on_final: Optional[Any] = None) -> str:
+    def listen_for_transcript(
+        self,
+        on_partial: Optional[Any] = None,
+        on_final: Optional[Any] = None,
+        audio_source: Optional[Any] = None
+    ) -> str:
+        pass
+
+    @abstractmethod
+    def listen_continuously(self, backlog: int = 8) -> Any:
         pass
 
 
@@ -97,6 +107,7 @@ class RPiBaseHardwareDriver(RPiHardwareDriver):
         self.microphone_controller: Optional[MicrophoneController] = None
         self.speaker_controller: Optional[SpeakerController] = None
         self.stt_controller: Optional[STTController] = None
+        self.wake_word_detector: Optional[WakeWordDetector] = None
         self.tts_controller: Optional[TTSController] = None
 
         # Config cache
@@ -137,11 +148,33 @@ class RPiBaseHardwareDriver(RPiHardwareDriver):
         rate = config.microphoneRate or 44100
         channels = config.microphoneChannels or 1 # ALSA default is often 1
         device = config.device or ''
+        buffer_chunks = config.bufferChunks or 64
+        overrun_policy = config.overrunPolicy or 'drop-oldest'
+        preroll_seconds = config.prerollSeconds or 0
+        capture_settings = resolve_capture_settings(
+            rate,
+            config.latencyPreset,
+            period_size=config.periodSize,
+            period_count=config.periodCount,
+            sample_format=config.sampleFormat
+        )
 
-        self.microphone_controller.initialize(rate, channels, device)
+        self.microphone_controller.initialize(
+            rate, channels, device, buffer_chunks, overrun_policy, preroll_seconds, capture_settings
+        )
         self.stt_controller = STTController(config)
         self.initialized_hardware.add(Hardware.MICROPHONE)
 
+        if config.warmUp:
+            self.stt_controller.warm_up()
+
+        if config.wakeWord and config.wakeWord.enabled:
+            self.wake_word_detector = WakeWordDetector(config.wakeWord)
+
+        if preroll_seconds > 0:
+            # The pre-roll window only helps if capture is already running when listen() is called
+            self.microphone_controller.start()
+
     def setup_speaker(self, config: SpeakConfig) -> None:
         self.speaker_controller = SpeakerController()
         device = config.device or ''
@@ -171,12 +204,77 @@ class RPiBaseHardwareDriver(RPiHardwareDriver):
             raise TJBotError("TTS controller not initialized.")
         self.tts_controller.speak(message, self.speak_config)
 
-    def listen_for_transcript(self, on_partial: Optional[Any] = None, on_final: Optional[Any] = None) -> str:
+    def listen_for_transcript(
+        self,
+        on_partial: Optional[Any] = None,
+        on_final: Optional[Any] = None,
+        audio_source: Optional[Any] = None
+    ) -> str:
+        """
+        Transcribe speech from the microphone.
+        :param audio_source: Optional stand-in for the microphone with the MicrophoneStream
+                             interface (e.g. ReplayAudioSource), used for benchmarks and tests.
+        """
+        if audio_source is not None:
+            if not self.stt_controller:
+                raise TJBotError("STT controller not initialized.")
+            with audio_source:
+                return self.stt_controller.transcribe(
+                    audio_source.generator(),
+                    on_partial_result=on_partial,
+                    on_final_result=on_final,
+                    sample_rate=audio_source.rate,
+                    channels=audio_source.channels
+                )
+
+        if not self.stt_controller or not self.microphone_controller:
+            raise TJBotError("STT controller not initialized.")
+
+        # Capture stays open between calls (pause/resume only gate it), so only the first listen pays ALSA setup
+        self.microphone_controller.start()
+        preroll_ms = (self.listen_config.prerollMs or 0) if self.listen_config else 0
+        with self.microphone_controller.subscribe(preroll_ms=preroll_ms) as subscription:
+            audio = subscription.generator()
+            if self.wake_word_detector:
+                # Full STT only starts once a keyword fires, and replays the audio read while the keyword
+                # was being decoded before picking up the rest of the stream
+                keyword = self.wake_word_detector.wait(
+                    audio, self.microphone_controller.rate, self.microphone_controller.channels,
+                    preroll_ms=preroll_ms
+                )
+                if keyword is None:
+                    return ''
+                audio = itertools.chain(self.wake_word_detector.preroll, audio)
+            return self.stt_controller.transcribe(
+                audio,
+                on_partial_result=on_partial,
+                on_final_result=on_final,
+                sample_rate=self.microphone_controller.rate,
+                channels=self.microphone_controller.channels
+            )
+
+    def listen_continuously(self, backlog: int = 8) -> ListeningSession:
+        """
+        Start a listening session that keeps the microphone and STT engine running and
+        transcribes one utterance after another.
+        :param backlog: Maximum number of utterances kept while the caller is busy.
+        """
         if not self.stt_controller or not self.microphone_controller:
             raise TJBotError("STT controller not initialized.")
 
-        stream = self.microphone_controller.get_input_stream()
-        return self.stt_controller.transcribe(stream, on_partial_result=on_partial, on_final_result=on_final)
+        self.microphone_controller.start()
+        preroll_ms = (self.listen_config.prerollMs or 0) if self.listen_config else 0
+        subscription = self.microphone_controller.subscribe(preroll_ms=preroll_ms)
+        session = ListeningSession(
+            self.stt_controller,
+            subscription.generator(),
+            self.microphone_controller.rate,
+            self.microphone_controller.channels,
+            clock=subscription,
+            backlog=backlog,
+            on_close=subscription.close
+        )
+        return session.start()
 
     def pause_mic(self) -> None:
         if self.microphone_controller:
@@ -1,4 +1,7 @@
 from .stt import STTController
 from .engine import STTEngine
+from .session import ListeningSession, Utterance
+from .wake_word import WakeWordDetector
+from .factory import create_engine, get_engine, clear_engine_cache
 
-__all__ = ["STTController", "STTEngine"]
+__all__ = ["STTController", "STTEngine", "ListeningSession", "Utterance", "WakeWordDetector", "create_engine", "get_engine", "clear_engine_cache"]
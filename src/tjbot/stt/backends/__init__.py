@@ -1,6 +1,29 @@
-from .watson_stt import IBMWatsonSTTEngine
-from .google_stt import GoogleCloudSTTEngine
-from .azure_stt import AzureSTTEngine
-from .sherpa_onnx_stt import SherpaONNXSTTEngine
+import importlib
+from typing import Dict, Tuple
 
-__all__ = ["IBMWatsonSTTEngine", "GoogleCloudSTTEngine", "AzureSTTEngine", "SherpaONNXSTTEngine"]
+# Engine class -> backend module. Modules are imported on first use so that only the
+# SDK of the selected backend is loaded.
+_ENGINES: Dict[str, str] = {
+    "IBMWatsonSTTEngine": ".watson_stt",
+    "GoogleCloudSTTEngine": ".google_stt",
+    "AzureSTTEngine": ".azure_stt",
+    "SherpaONNXSTTEngine": ".sherpa_onnx_stt",
+}
+
+# STTBackendConfig.type -> (engine class, STTBackendConfig attribute holding its settings)
+BACKENDS: Dict[str, Tuple[str, str]] = {
+    "local": ("SherpaONNXSTTEngine", "local"),
+    "ibm-watson-stt": ("IBMWatsonSTTEngine", "ibm_watson_stt"),
+    "google-cloud-stt": ("GoogleCloudSTTEngine", "google_cloud_stt"),
+    "azure-stt": ("AzureSTTEngine", "azure_stt"),
+}
+
+
+def __getattr__(name: str):
+    if name in _ENGINES:
+        module = importlib.import_module(_ENGINES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["IBMWatsonSTTEngine", "GoogleCloudSTTEngine", "AzureSTTEngine", "SherpaONNXSTTEngine", "BACKENDS"]
@@ -1,10 +1,14 @@
-from typing import Iterator, Callable, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterator, Callable, Dict, Optional
 import os
 import logging
 import threading
+import time
 from ..engine import STTEngine
-from ...config.models import AzureSTTConfig
+from ...audio import create_uplink_encoder
+from ...config.models import STTBackendAzureConfig
 from ...error import TJBotError
+from ...microphone.stats import LatencyHistogram
 
 try:
     import azure.cognitiveservices.speech as speechsdk
@@ -13,45 +17,129 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Most utterances pushing audio at once; beyond this a transcribe() waits for a free pusher
+MAX_PUSHERS = 32
+
+# AudioStreamContainerFormat for each compressed uplink encoding
+_CONTAINER_FORMATS = {
+    'flac': 'FLAC',
+    'ogg-opus': 'OGG_OPUS',
+}
+
 class AzureSTTEngine(STTEngine):
     """
     Azure Cognitive Services Speech-to-Text backend.
+
+    A recognizer is bound to its input stream, so one cannot be reused across utterances.
+    Instead the engine keeps the next recognizer ready: its connection is opened ahead of
+    time, and a new one is prepared in the background as soon as an utterance ends.
     """
-    def __init__(self, config: Optional[AzureSTTConfig] = None):
+    coalesce_frames = True
+
+    def __init__(self, config: Optional[STTBackendAzureConfig] = None):
         self.backend_config = config
         self.speech_config = None
+
+        # Compresses the uplink when uplinkEncoding is set (needs GStreamer); None sends PCM
+        self.uplink_encoder = create_uplink_encoder(
+            config.uplinkEncoding if config else None, self.sample_rate, self.channels
+        )
+
+        # Prepares the next session in the background
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='azure-stt')
+        # Pushes each utterance's audio. Kept apart from the pre-warm worker, it reuses idle
+        # threads and only starts a new one when every pusher is busy, so concurrent
+        # utterances don't queue behind each other.
+        self._pushers = ThreadPoolExecutor(max_workers=MAX_PUSHERS, thread_name_prefix='azure-stt-push')
+        self._next_session: Optional[Future] = None
+        self._session_lock = threading.Lock()
+
+        # Milliseconds to open the service connection, and from the start of transcribe() to the first partial
+        self.connect_latency = LatencyHistogram()
+        self.first_partial_latency = LatencyHistogram()
         self._initialize()
 
     def _initialize(self):
         if speechsdk is None:
              raise TJBotError("azure-cognitiveservices-speech library not installed. Please install it.")
 
-        # Credentials mapping
-        # SDK expects AZURE_SPEECH_KEY and AZURE_SPEECH_REGION if provided via env,
-        # or we manually construct config.
-
-        region = self.backend_config.region if self.backend_config else None
-        key = self.backend_config.key if self.backend_config else None
-
-        # Fallback to env
-        if not key:
-            key = os.environ.get('AZURE_SPEECH_KEY')
-        if not region:
-            region = os.environ.get('AZURE_SPEECH_REGION')
+        # Credentials come from AZURE_SPEECH_KEY / AZURE_SPEECH_REGION, either set in the
+        # environment or listed in the credentials file
+        credentials = self._read_credentials()
+        key = credentials.get('AZURE_SPEECH_KEY') or os.environ.get('AZURE_SPEECH_KEY')
+        region = credentials.get('AZURE_SPEECH_REGION') or os.environ.get('AZURE_SPEECH_REGION')
 
         if not key or not region:
-             raise TJBotError("Azure Speech credentials missing. Set 'key' and 'region' in config or env vars AZURE_SPEECH_KEY and AZURE_SPEECH_REGION.")
+             raise TJBotError("Azure Speech credentials missing. Set AZURE_SPEECH_KEY and AZURE_SPEECH_REGION in the environment or in the file at 'credentialsPath'.")
 
         try:
             self.speech_config = speechsdk.SpeechConfig(subscription=key, region=region)
             # Default language
-            language = self.backend_config.language if self.backend_config else 'en-US'
+            language = (self.backend_config.language if self.backend_config else None) or 'en-US'
             self.speech_config.speech_recognition_language = language
 
+            self._rearm()
             logger.info("Azure STT initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Azure STT: {e}")
 
+    def _read_credentials(self) -> Dict[str, str]:
+        path = self.backend_config.credentialsPath if self.backend_config else None
+        if not path:
+            return {}
+
+        credentials = {}
+        with open(os.path.expanduser(path)) as f:
+            for line in f:
+                name, sep, value = line.strip().partition('=')
+                if sep and not name.startswith('#'):
+                    credentials[name.strip()] = value.strip().strip('"\'')
+        return credentials
+
+    def _open_session(self) -> Dict[str, Any]:
+        """
+        Create a push stream and recognizer and open the recognizer's connection, so TLS and
+        websocket setup are done before audio arrives.
+        """
+        if self.uplink_encoder:
+            container = getattr(speechsdk.AudioStreamContainerFormat, _CONTAINER_FORMATS[self.uplink_encoder.encoding])
+            stream_format = speechsdk.audio.AudioStreamFormat(compressed_stream_format=container)
+        else:
+            stream_format = speechsdk.audio.AudioStreamFormat(samples_per_second=self.sample_rate, bits_per_sample=16, channels=self.channels)
+        push_stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        audio_config = speechsdk.audio.AudioConfig(stream_input=push_stream)
+        recognizer = speechsdk.SpeechRecognizer(speech_config=self.speech_config, audio_config=audio_config)
+
+        # If the service drops the idle connection, the recognizer reconnects when recognition starts
+        connection = speechsdk.Connection.from_recognizer(recognizer)
+        start = time.monotonic()
+        connection.open(True)
+        self.connect_latency.record((time.monotonic() - start) * 1000.0)
+
+        return {'push_stream': push_stream, 'recognizer': recognizer, 'connection': connection}
+
+    def _rearm(self) -> None:
+        future = self._executor.submit(self._open_session)
+        with self._session_lock:
+            self._next_session = future
+
+    def _take_session(self) -> Dict[str, Any]:
+        # Concurrent callers find no prepared session and open their own
+        with self._session_lock:
+            session_future, self._next_session = self._next_session, None
+        if session_future is not None:
+            try:
+                return session_future.result()
+            except Exception as e:
+                logger.warning(f"Azure STT pre-warmed connection failed, reconnecting: {e}")
+        return self._open_session()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connect_ms': self.connect_latency.snapshot(),
+            'first_partial_ms': self.first_partial_latency.snapshot(),
+        }
+
     def transcribe(
         self,
         audio_stream: Iterator[bytes],
@@ -62,28 +150,30 @@ class AzureSTTEngine(STTEngine):
         if not self.speech_config:
              raise TJBotError("Azure STT not initialized.")
 
-        # Handling streaming audio with Azure SDK is done via PushAudioInputStream
-        stream_format = speechsdk.audio.AudioStreamFormat(samples_per_second=16000, bits_per_sample=16, channels=1)
-        push_stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
-        audio_config = speechsdk.audio.AudioConfig(stream_input=push_stream)
-
-        recognizer = speechsdk.SpeechRecognizer(speech_config=self.speech_config, audio_config=audio_config)
+        started = time.monotonic()
+        session = self._take_session()
+        push_stream = session['push_stream']
+        recognizer = session['recognizer']
 
         # Setup events
         done_event = threading.Event()
         final_transcript = []
+        first_partial = threading.Event()
+
+        if self.uplink_encoder:
+            audio_stream = self.uplink_encoder.process(audio_stream)
+
+        push_errors = []
 
-        def processing_func():
+        def push_audio():
             try:
                 for chunk in audio_stream:
-                    push_stream.write(chunk)
+                    push_stream.write(bytes(chunk))
+            except Exception as e:
+                push_errors.append(e)
             finally:
                 push_stream.close()
 
-        # Start pushing audio in background thread
-        push_thread = threading.Thread(target=processing_func)
-        push_thread.start()
-
         # Callbacks
         def recognized_cb(evt):
             if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
@@ -94,6 +184,9 @@ class AzureSTTEngine(STTEngine):
 
         def recognizing_cb(evt):
              if evt.result.reason == speechsdk.ResultReason.RecognizingSpeech:
+                 if not first_partial.is_set():
+                     first_partial.set()
+                     self.first_partial_latency.record((time.monotonic() - started) * 1000.0)
                  text = evt.result.text
                  if on_partial_result:
                      on_partial_result(text)
@@ -112,13 +205,24 @@ class AzureSTTEngine(STTEngine):
         recognizer.canceled.connect(canceled_cb)
         recognizer.session_stopped.connect(session_stopped_cb)
 
-        # Start continuous recognition
+        # Start continuous recognition, then push audio from a pooled thread
         recognizer.start_continuous_recognition()
+        pusher = self._pushers.submit(push_audio)
 
-        # Wait for done (which happens when stream closes/stops)
-        done_event.wait()
-
-        recognizer.stop_continuous_recognition()
-        push_thread.join()
+        try:
+            # Wait for done (which happens when stream closes/stops)
+            done_event.wait()
+            recognizer.stop_continuous_recognition()
+            pusher.result()
+        finally:
+            session['connection'].close()
+            # Get the next utterance's connection ready while the caller handles this one
+            self._rearm()
+
+        if push_errors:
+            logger.error(f"Azure STT error while pushing audio: {push_errors[0]}")
+            if on_error:
+                on_error(push_errors[0])
+            raise TJBotError(f"Azure STT error: {push_errors[0]}")
 
         return " ".join(final_transcript)
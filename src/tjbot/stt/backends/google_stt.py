@@ -1,8 +1,11 @@
-from typing import Iterator, Callable, Optional
+from collections import deque
+from typing import Any, Deque, Iterator, Callable, Optional, Tuple
 import os
 import logging
+import threading
 from ..engine import STTEngine
-from ...config.models import GoogleCloudSTTConfig
+from ...audio import create_uplink_encoder
+from ...config.models import STTBackendGoogleCloudConfig
 from ...error import TJBotError
 
 try:
@@ -10,15 +13,109 @@ try:
 except ImportError:
     speech = None
 
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
 logger = logging.getLogger(__name__)
 
+# RecognitionConfig.AudioEncoding for each compressed uplink encoding
+_ENCODINGS = {
+    'flac': 'FLAC',
+    'ogg-opus': 'OGG_OPUS',
+}
+
+# Google ends a streaming_recognize call after about 305 s of audio
+DEFAULT_STREAM_LIMIT_SECONDS = 290
+
+# SpeechClient shared by every engine in the process, so the gRPC channel is set up once
+_client = None
+_client_lock = threading.Lock()
+
+
+def _shared_client():
+    """
+    Create the process-wide SpeechClient on first use and start connecting its channel
+    in the background, so the first request does not pay the TLS handshake.
+    Credentials are read once, when the client is created.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = speech.SpeechClient()
+            channel = getattr(getattr(_client, 'transport', None), 'grpc_channel', None)
+            if grpc is not None and channel is not None:
+                threading.Thread(target=_connect_channel, args=(channel,), name='google-stt-connect', daemon=True).start()
+        return _client
+
+
+def _connect_channel(channel) -> None:
+    try:
+        grpc.channel_ready_future(channel).result(timeout=30)
+    except Exception as e:
+        logger.debug(f"Google STT channel warm-up failed: {e}")
+
+
+def _drop_seam_overlap(previous: str, text: str, max_words: int = 4) -> str:
+    """
+    Remove words at the start of text that repeat the end of previous, i.e. words recognized
+    again from audio replayed into a new stream.
+    """
+    before = [w.lower() for w in previous.split()]
+    words = text.split()
+    for n in range(min(max_words, len(before), len(words)), 0, -1):
+        if [w.lower() for w in words[:n]] == before[-n:]:
+            rest = ' '.join(words[n:])
+            leading = text[:len(text) - len(text.lstrip())]
+            return leading + rest if rest else ''
+    return text
+
+
+class _RecognizeStream:
+    """
+    State of one streaming_recognize call within a transcribe().
+    """
+    def __init__(self, start_offset: int):
+        # Position of the stream's first audio byte in the transcribe() audio
+        self.start_offset = start_offset
+        self.bytes_sent = 0
+        # Set once the stream has reached the limit and a new one should take over
+        self.rolled_over = threading.Event()
+
+
 class GoogleCloudSTTEngine(STTEngine):
     """
     Google Cloud Speech-to-Text backend.
+
+    Audio longer than the streaming limit is transcribed over consecutive streams: shortly
+    before the limit the stream is replaced, and the audio after the last final result is
+    replayed into the new one, so words at the seam are neither lost nor repeated.
     """
-    def __init__(self, config: Optional[GoogleCloudSTTConfig] = None):
+    coalesce_frames = True
+
+    def __init__(self, config: Optional[STTBackendGoogleCloudConfig] = None):
         self.backend_config = config
         self.client = None
+        if config and config.sampleRateHertz:
+            self.sample_rate = config.sampleRateHertz
+        if config and config.audioChannelCount:
+            self.channels = config.audioChannelCount
+
+        # Compresses the uplink when uplinkEncoding is set; None sends LINEAR16
+        self.uplink_encoder = create_uplink_encoder(
+            config.uplinkEncoding if config else None, self.sample_rate, self.channels
+        )
+
+        # Audio seconds per stream before rolling over; 0 keeps one stream per transcribe()
+        limit = config.streamLimitSeconds if config else None
+        self.stream_limit_seconds = DEFAULT_STREAM_LIMIT_SECONDS if limit is None else limit
+        if self.uplink_encoder:
+            # Compressed audio cannot be cut and replayed at arbitrary offsets
+            self.stream_limit_seconds = 0
+
+        # Number of stream restarts at the limit
+        self.rollovers = 0
         self._initialize()
 
     def _initialize(self):
@@ -26,11 +123,11 @@ class GoogleCloudSTTEngine(STTEngine):
              raise TJBotError("google-cloud-speech library not installed. Please install it.")
 
         # Google Cloud SDK standard auth: GOOGLE_APPLICATION_CREDENTIALS
-        if self.backend_config and self.backend_config.keyFilename:
-             os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.backend_config.keyFilename
+        if self.backend_config and self.backend_config.credentialsPath:
+             os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.backend_config.credentialsPath
 
         try:
-            self.client = speech.SpeechClient()
+            self.client = _shared_client()
             logger.info("Google STT initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Google STT: {e}")
@@ -48,47 +145,115 @@ class GoogleCloudSTTEngine(STTEngine):
         # Config mapping
         language_code = self.backend_config.languageCode if self.backend_config else 'en-US'
 
-        # Generator wrapper to yield request objects
-        def request_generator():
-            # First request contains config
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000, # Should assume 16k or config? Node assumes 16k usually.
-                language_code=language_code,
-            )
-            streaming_config = speech.StreamingRecognitionConfig(
-                config=config,
-                interim_results=True if on_partial_result else False
-            )
-
-            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
-
-            # Subsequent requests contain audio
-            for chunk in audio_stream:
+        # Offsets into the audio count PCM bytes, read before any uplink compression, so
+        # they are in the same unit as result_end_time * byte_rate
+        position = {'read': 0, 'final': 0, 'done': False}
+
+        def read_pcm(stream: Iterator[bytes]) -> Iterator[bytes]:
+            for chunk in stream:
+                position['read'] += len(chunk)
+                yield chunk
+
+        audio_stream = read_pcm(audio_stream)
+        encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
+        if self.uplink_encoder:
+            encoding = getattr(speech.RecognitionConfig.AudioEncoding, _ENCODINGS[self.uplink_encoder.encoding])
+            audio_stream = self.uplink_encoder.process(audio_stream)
+
+        config = speech.RecognitionConfig(
+            encoding=encoding,
+            sample_rate_hertz=self.sample_rate,
+            audio_channel_count=self.channels,
+            language_code=language_code,
+        )
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=config,
+            interim_results=True if on_partial_result else False
+        )
+
+        byte_rate = self.sample_rate * self.channels * 2
+        limit_bytes = int(self.stream_limit_seconds * byte_rate)
+
+        # Audio after the last final result as (offset, chunk), replayed into the next stream.
+        # Only kept when streams roll over, which is never the case for compressed audio.
+        # audio_lock makes pulling a chunk and recording it atomic, so the request generators
+        # of consecutive streams never read audio_stream at the same time.
+        audio = iter(audio_stream)
+        unfinalized: Deque[Tuple[int, bytes]] = deque()
+        audio_lock = threading.Lock()
+
+        def request_generator(stream: _RecognizeStream):
+            # Audio requests only: SpeechClient.streaming_recognize() sends the config request first
+            with audio_lock:
+                replay = [(offset, chunk) for offset, chunk in unfinalized]
+            for offset, chunk in replay:
+                # Skip the part of the first chunk that was already finalized
+                skip = max(0, stream.start_offset - offset)
+                if skip < len(chunk):
+                    stream.bytes_sent += len(chunk) - skip
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk[skip:])
+
+            while not (limit_bytes and stream.bytes_sent >= limit_bytes):
+                with audio_lock:
+                    chunk = next(audio, None)
+                    if chunk is None:
+                        position['done'] = True
+                        return
+                    # Chunks may be memoryviews, protobuf needs bytes
+                    chunk = bytes(chunk)
+                    if limit_bytes:
+                        unfinalized.append((position['read'] - len(chunk), chunk))
+                stream.bytes_sent += len(chunk)
                 yield speech.StreamingRecognizeRequest(audio_content=chunk)
 
+            # Half-close at the limit; the rest of this stream's results are ignored
+            stream.rolled_over.set()
+
+        final_transcript = ""
+        previous_final = ""
         try:
-            responses = self.client.streaming_recognize(request_generator())
+            stream = None
+            while True:
+                start = position['final']
+                if stream is not None and start <= stream.start_offset:
+                    # A whole stream without a final result: replay less, so the next one makes progress
+                    start = max(start, position['read'] - limit_bytes // 2)
+                    start -= start % (2 * self.channels)
+                stream = _RecognizeStream(start)
+                seam = bool(final_transcript) and stream.start_offset > 0
+                responses = self.client.streaming_recognize(streaming_config, request_generator(stream))
 
-            final_transcript = ""
+                for response in responses:
+                    if stream.rolled_over.is_set():
+                        break
+                    if not response.results:
+                        continue
 
-            for response in responses:
-                if not response.results:
-                    continue
+                    result = response.results[0]
+                    if not result.alternatives:
+                        continue
 
-                result = response.results[0]
-                if not result.alternatives:
-                    continue
+                    transcript = result.alternatives[0].transcript
+                    if seam:
+                        transcript = _drop_seam_overlap(previous_final, transcript)
 
-                transcript = result.alternatives[0].transcript
+                    if result.is_final:
+                        self._mark_finalized(result, stream, position, byte_rate, unfinalized, audio_lock)
+                        seam = False
+                        if not transcript:
+                            continue
+                        final_transcript += transcript
+                        previous_final = transcript
+                        if on_final_result:
+                            on_final_result(transcript)
+                    else:
+                        if on_partial_result and transcript:
+                            on_partial_result(transcript)
 
-                if result.is_final:
-                    final_transcript += transcript
-                    if on_final_result:
-                        on_final_result(transcript)
-                else:
-                    if on_partial_result:
-                        on_partial_result(transcript)
+                if position['done'] or not stream.rolled_over.is_set():
+                    break
+                self.rollovers += 1
+                logger.debug(f"Google STT stream reached {self.stream_limit_seconds} s, continuing in a new stream")
 
             return final_transcript
 
@@ -97,3 +262,28 @@ class GoogleCloudSTTEngine(STTEngine):
             if on_error:
                 on_error(e)
             raise TJBotError(f"Google STT error: {e}")
+
+    def _mark_finalized(
+        self,
+        result: Any,
+        stream: _RecognizeStream,
+        position: dict,
+        byte_rate: int,
+        unfinalized: Deque[Tuple[int, bytes]],
+        audio_lock: threading.Lock
+    ) -> None:
+        """
+        Drop audio up to the end of a final result from the replay buffer.
+        Without result_end_time, everything sent so far counts as finalized.
+        """
+        end_time = getattr(result, 'result_end_time', None)
+        with audio_lock:
+            if end_time is not None:
+                end = stream.start_offset + int(end_time.total_seconds() * byte_rate)
+                end -= end % (2 * self.channels)
+                end = min(end, position['read'])
+            else:
+                end = position['read']
+            position['final'] = max(position['final'], end)
+            while unfinalized and unfinalized[0][0] + len(unfinalized[0][1]) <= position['final']:
+                unfinalized.popleft()
@@ -0,0 +1,175 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ...error import TJBotError
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedStream:
+    """
+    One caller's stream in a SherpaBatchDecoder.
+    `text` is the latest hypothesis; it is updated by the decoder thread.
+    """
+    def __init__(self, stream: Any):
+        self.stream = stream
+        self.text = ''
+        self.finished = False
+        # Set when the recognizer found an endpoint after speech; text is then final
+        self.endpoint = False
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class SherpaBatchDecoder:
+    """
+    Decodes any number of concurrent online streams on one thread.
+
+    Callers feed audio with feed() and collect the transcript with finish(). Each pass
+    the decoder thread hands every stream that is ready to a single
+    recognizer.decode_streams() call, so onnxruntime works on a batch instead of
+    N threads each decoding one stream. With endpoint_detection, a stream is finished
+    as soon as the recognizer reports an endpoint after speech.
+    """
+    def __init__(self, recognizer: Any, sample_rate: int = 16000, endpoint_detection: bool = False):
+        if np is None:
+            raise TJBotError("numpy is not installed")
+
+        self.recognizer = recognizer
+        self.sample_rate = sample_rate
+        self.endpoint_detection = endpoint_detection
+
+        # (stream, 16-bit PCM bytes) to accept, or (stream, None) to finish it
+        self._pending: Deque[Tuple[BatchedStream, Optional[bytes]]] = deque()
+        self._active: Set[BatchedStream] = set()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self.closed = False
+
+        # Float32 conversion buffer, only touched by the decoder thread
+        self._samples = np.empty(0, dtype=np.float32)
+
+        # Instrumentation: number of decode_streams() calls and streams decoded by them
+        self.batches = 0
+        self.batched_streams = 0
+
+    def open(self) -> BatchedStream:
+        with self._lock:
+            if self.closed:
+                raise TJBotError("batch decoder is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stt-batch-decoder', daemon=True)
+                self._thread.start()
+        return BatchedStream(self.recognizer.create_stream())
+
+    def feed(self, handle: BatchedStream, data: bytes) -> None:
+        """
+        Queue 16-bit PCM audio for a stream. data must not be modified afterwards.
+        """
+        with self._lock:
+            self._pending.append((handle, data))
+            self._changed.notify()
+
+    def finish(self, handle: BatchedStream, timeout: Optional[float] = None) -> str:
+        """
+        Mark the end of a stream's audio and wait for its final transcript.
+        """
+        with self._lock:
+            self._pending.append((handle, None))
+            self._changed.notify()
+        if not handle.done.wait(timeout):
+            raise TJBotError("timed out waiting for the batch decoder")
+        if handle.error:
+            raise handle.error
+        return handle.text
+
+    def cancel(self, handle: BatchedStream) -> None:
+        """
+        End a stream without waiting for its transcript.
+        """
+        with self._lock:
+            self._pending.append((handle, None))
+            self._changed.notify()
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._changed.notify()
+        if self._thread:
+            self._thread.join()
+
+    def _to_float(self, data: bytes) -> 'np.ndarray':
+        pcm = np.frombuffer(data, dtype='<i2', count=len(data) // 2)
+        if len(self._samples) < len(pcm):
+            self._samples = np.empty(len(pcm), dtype=np.float32)
+        samples = self._samples[:len(pcm)]
+        np.multiply(pcm, 1.0 / 32768.0, out=samples, casting='unsafe')
+        return samples
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self.closed:
+                    self._changed.wait()
+                if self.closed and not self._pending:
+                    break
+                pending = list(self._pending)
+                self._pending.clear()
+
+            for handle, data in pending:
+                if handle.done.is_set():
+                    continue
+                try:
+                    if data is None:
+                        handle.stream.input_finished()
+                        handle.finished = True
+                    else:
+                        handle.stream.accept_waveform(self.sample_rate, self._to_float(data))
+                    self._active.add(handle)
+                except Exception as e:
+                    self._fail(handle, e)
+
+            try:
+                self._decode_ready()
+            except Exception as e:
+                logger.error(f"Sherpa batch decode error: {e}")
+                for handle in list(self._active):
+                    self._fail(handle, e)
+                continue
+
+            for handle in [h for h in self._active if h.finished or h.endpoint]:
+                self._active.discard(handle)
+                handle.done.set()
+
+        for handle in list(self._active):
+            self._fail(handle, TJBotError("batch decoder closed"))
+
+    def _decode_ready(self) -> None:
+        recognizer = self.recognizer
+        while True:
+            ready = [h for h in self._active if not h.endpoint and recognizer.is_ready(h.stream)]
+            if not ready:
+                return
+            recognizer.decode_streams([h.stream for h in ready])
+            self.batches += 1
+            self.batched_streams += len(ready)
+            for handle in ready:
+                result = recognizer.get_result(handle.stream)
+                handle.text = getattr(result, 'text', result) or ''
+                if self.endpoint_detection and not handle.finished and recognizer.is_endpoint(handle.stream):
+                    recognizer.reset(handle.stream)
+                    # Silence before any speech only resets the stream
+                    handle.endpoint = bool(handle.text)
+
+    def _fail(self, handle: BatchedStream, error: Exception) -> None:
+        self._active.discard(handle)
+        handle.error = error
+        handle.done.set()
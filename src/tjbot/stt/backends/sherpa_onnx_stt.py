@@ -1,8 +1,21 @@
-from typing import Iterator, Callable, Optional, Dict, Any
+from typing import Any, Iterator, Callable, List, Optional
+import glob
 import logging
+import os
+import queue
+import threading
+import time
 from ..engine import STTEngine
+from .sherpa_onnx_batch import SherpaBatchDecoder
+from ...audio import VADSegmenter, create_vad
+from ...config.models import EndpointConfig, STTBackendLocalConfig, VADConfig
 from ...error import TJBotError
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 try:
     import sherpa_onnx
 except ImportError:
@@ -10,55 +23,161 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Endpoint rule 1 (silence with nothing decoded, after which the stream is reset) as a multiple
+# of rule 2's trailing silence after speech: 2.4 s for the default 800 ms, as in sherpa-onnx
+_SILENCE_RESET_FACTOR = 3
+
+
+class _FloatConverter:
+    """
+    Converts 16-bit PCM chunks to float32 samples in [-1, 1) without allocating: each result
+    is a view of a buffer reused for every chunk (accept_waveform copies it).
+    Created per transcribe(), since the engine is shared by concurrent callers.
+    """
+    def __init__(self):
+        self._samples = np.empty(0, dtype=np.float32)
+
+    def __call__(self, chunk) -> 'np.ndarray':
+        pcm = np.frombuffer(chunk, dtype='<i2', count=len(chunk) // 2)
+        if len(self._samples) < len(pcm):
+            self._samples = np.empty(len(pcm), dtype=np.float32)
+        samples = self._samples[:len(pcm)]
+        np.multiply(pcm, 1.0 / 32768.0, out=samples, casting='unsafe')
+        return samples
+
+
+def _resolve_model_dir(model: Optional[str]) -> Optional[str]:
+    if not model:
+        return None
+    for candidate in (model, os.path.expanduser(os.path.join('~/.tjbot/models', model))):
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+def _find_model_file(model_dir: str, part: str, suffix: str = '.onnx') -> Optional[str]:
+    # Model archives name their files e.g. encoder-epoch-99-avg-1.int8.onnx;
+    # prefer the int8-quantized variant, which is faster on a Pi
+    matches = sorted(glob.glob(os.path.join(model_dir, f"*{part}*{suffix}")))
+    quantized = [m for m in matches if '.int8.' in m]
+    candidates = quantized or matches
+    return candidates[0] if candidates else None
+
+
+def _is_streaming_model(model_dir: str, joiner: Optional[str], model_type: Optional[str] = None) -> bool:
+    """
+    Whether a model directory holds a streaming (online) model.
+    Whisper has no joiner and is always offline. Transducers come in both kinds with the same
+    file names; sherpa-onnx releases name the streaming ones '*-streaming-*', so other
+    transducers are decoded offline. model_type ('streaming' or 'offline') overrides the guess.
+    """
+    if joiner is None:
+        return False
+    if model_type:
+        return model_type == 'streaming'
+    name = os.path.basename(os.path.normpath(model_dir)).lower()
+    return 'streaming' in name or 'online' in name
+
+
+def _result_text(result) -> str:
+    # OnlineRecognizer.get_result returns the text itself in newer sherpa-onnx releases
+    return getattr(result, 'text', result) or ''
+
+
 class SherpaONNXSTTEngine(STTEngine):
     """
     Sherpa-ONNX (Local) Speech-to-Text backend.
+    Streaming transducer models are decoded as audio arrives and finalized at the model's
+    endpoints; offline models (Whisper, offline transducers) decode speech segments cut out
+    of the stream by VAD.
     """
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
-        super().__init__(config or {})
+    def __init__(self, config: Optional[STTBackendLocalConfig] = None):
+        super().__init__({})
         self.backend_config = config
-        self.recognizer = None
+        # sherpa_onnx.OnlineRecognizer or OfflineRecognizer
+        self.recognizer: Any = None
+
+        # Offline models are fed speech segments cut by a VAD segmenter. The VAD is
+        # stateful, so each transcribe() takes the idle segmenter or builds its own.
+        self.offline = False
+        self.segmenter: Optional[VADSegmenter] = None
+
+        # Shared decoder that batches concurrent streams (batchDecoding)
+        self.batch_decoder: Optional[SherpaBatchDecoder] = None
+
+        # Minimum time between partial results; 0 emits every change of the hypothesis
+        self.partial_interval_ms = (config.partialIntervalMs if config else None) or 0
+
+        # Streaming models: finalize at sherpa-onnx endpoints instead of only at the end of the audio
+        self.endpoint_config = (config.endpoint if config else None) or EndpointConfig()
+        self.endpoint_detection = bool(self.endpoint_config.enabled)
+
+        # Stream reset at the last endpoint, reused by the next transcribe()
+        self._idle_stream = None
+        self._stream_lock = threading.Lock()
         self._initialize()
 
     def _initialize(self):
         if sherpa_onnx is None:
              raise TJBotError("sherpa-onnx library not installed. Please install it.")
+        if np is None:
+            raise TJBotError("numpy is not installed")
 
-        # Sherpa-ONNX needs model paths
-        # model (encoder, decoder, joiner for transducer OR tokens+encoder+decoder for others)
+        model = self.backend_config.model if self.backend_config else None
+        model_dir = _resolve_model_dir(model)
+        if not model_dir:
+            raise TJBotError(f"Sherpa-ONNX STT model '{model}' not found. Download it to ~/.tjbot/models/ or set 'model' to its directory.")
 
-        # Config structure in models.py:
-        # tokens: str
-        # encoder: str
-        # decoder: str
-        # joiner: str
-        # type: str (transducer, zipformer, etc? Node impl handles different types)
+        tokens = _find_model_file(model_dir, 'tokens', '.txt')
+        encoder = _find_model_file(model_dir, 'encoder')
+        decoder = _find_model_file(model_dir, 'decoder')
+        joiner = _find_model_file(model_dir, 'joiner')
 
-        # We need to construct sherpa_onnx.OnlineRecognizerConfig
+        if not tokens or not encoder or not decoder:
+             raise TJBotError(f"Sherpa-ONNX STT requires model files (tokens, encoder, decoder) in {model_dir}.")
 
+        # Streaming transducers decode as audio arrives; Whisper and offline transducers decode whole segments
+        model_type = self.backend_config.modelType if self.backend_config else None
+        self.offline = not _is_streaming_model(model_dir, joiner, model_type)
         try:
-            tokens = self.backend_config.tokens
-            encoder = self.backend_config.encoder
-            decoder = self.backend_config.decoder
-            joiner = self.backend_config.joiner
-
-            if not tokens or not encoder or not decoder or not joiner:
-                 raise TJBotError("Sherpa-ONNX STT requires paths to: tokens, encoder, decoder, joiner. Please set them in config.")
-
-            recognizer_config = sherpa_onnx.OnlineRecognizerConfig(
-                tokens=tokens,
-                transducer=sherpa_onnx.OnlineTransducerModelConfig(
+            if self.offline and joiner is None:
+                self.recognizer = sherpa_onnx.OfflineRecognizer.from_whisper(
                     encoder=encoder,
                     decoder=decoder,
-                    joiner=joiner
-                ),
-            )
-
-            self.recognizer = sherpa_onnx.OnlineRecognizer(recognizer_config)
-            logger.info("Sherpa-ONNX STT initialized")
+                    tokens=tokens,
+                )
+                self.segmenter = self._create_segmenter()
+            elif self.offline:
+                self.recognizer = sherpa_onnx.OfflineRecognizer.from_transducer(
+                    encoder=encoder,
+                    decoder=decoder,
+                    joiner=joiner,
+                    tokens=tokens,
+                    sample_rate=self.sample_rate,
+                )
+                self.segmenter = self._create_segmenter()
+            else:
+                endpoint = self.endpoint_config
+                trailing_silence = (endpoint.trailingSilenceMs or 800) / 1000.0
+                self.recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
+                    tokens=tokens,
+                    encoder=encoder,
+                    decoder=decoder,
+                    joiner=joiner,
+                    sample_rate=self.sample_rate,
+                    enable_endpoint_detection=self.endpoint_detection,
+                    rule1_min_trailing_silence=trailing_silence * _SILENCE_RESET_FACTOR,
+                    rule2_min_trailing_silence=trailing_silence,
+                    rule3_min_utterance_length=(endpoint.maxUtteranceMs or 20000) / 1000.0,
+                )
+                if self.backend_config and self.backend_config.batchDecoding:
+                    self.batch_decoder = SherpaBatchDecoder(
+                        self.recognizer, self.sample_rate, endpoint_detection=self.endpoint_detection
+                    )
+            logger.info(f"Sherpa-ONNX STT initialized ({'offline' if self.offline else 'streaming'} model)")
 
         except Exception as e:
-            logger.error(f"Failed to initialize Sherpa-ONNX STT: {e}")
+            raise TJBotError(f"Failed to initialize Sherpa-ONNX STT: {e}")
 
     def transcribe(
         self,
@@ -70,40 +189,59 @@ class SherpaONNXSTTEngine(STTEngine):
         if not self.recognizer:
              raise TJBotError("Sherpa-ONNX STT not initialized.")
 
-        stream = self.recognizer.create_stream()
+        if self.offline:
+            return self._transcribe_offline(audio_stream, on_partial_result, on_final_result, on_error)
+        if self.batch_decoder:
+            return self._transcribe_batched(audio_stream, on_partial_result, on_final_result, on_error)
 
-        # final_transcript_acc = ""
+        stream = self._take_stream()
+        recognizer = self.recognizer
+        to_float = _FloatConverter()
+        min_interval = self.partial_interval_ms / 1000.0
+        last_partial = ''
+        last_partial_time = 0.0
 
         try:
             for chunk in audio_stream:
-                # Sherpa expects float array usually? Or valid bytes?
-                # The python binding `stream.accept_waveform(sample_rate, samples)` usually takes float samples.
-                # If we get raw bytes (int16), we need to decode.
-
-                import numpy as np
-                # Assume int16
-                samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+                stream.accept_waveform(self.sample_rate, to_float(chunk))
 
-                stream.accept_waveform(16000, samples) # Assume 16k
+                # Only decode (and look at the hypothesis) once a full feature frame batch is buffered
+                if not recognizer.is_ready(stream):
+                    continue
+                while recognizer.is_ready(stream):
+                    recognizer.decode_stream(stream)
 
-                while self.recognizer.is_ready(stream):
-                    self.recognizer.decode_stream(stream)
+                text = None
+                if on_partial_result:
+                    # Sherpa's online recognizer returns the cumulative hypothesis
+                    text = _result_text(recognizer.get_result(stream))
+                    now = time.monotonic()
+                    if text and text != last_partial and now - last_partial_time >= min_interval:
+                        last_partial = text
+                        last_partial_time = now
+                        on_partial_result(text)
 
-                result = self.recognizer.get_result(stream)
-                text = result.text
+                if self.endpoint_detection and recognizer.is_endpoint(stream):
+                    if text is None:
+                        text = _result_text(recognizer.get_result(stream))
+                    recognizer.reset(stream)
+                    if not text:
+                        # Silence before any speech: keep listening on the reset stream
+                        continue
 
-                # Logic to detect partial/final?
-                # Sherpa online recognizer usually gives cumulative text.
-                if text:
-                    if on_partial_result:
-                        on_partial_result(text)
+                    # End of the utterance; the reset stream serves the next transcribe()
+                    with self._stream_lock:
+                        self._idle_stream = stream
+                    if on_final_result:
+                        on_final_result(text)
+                    return text
 
             # End of stream
             stream.input_finished()
-            while self.recognizer.is_ready(stream):
-                self.recognizer.decode_stream(stream)
+            while recognizer.is_ready(stream):
+                recognizer.decode_stream(stream)
 
-            final_transcript = self.recognizer.get_result(stream).text
+            final_transcript = _result_text(recognizer.get_result(stream))
             if on_final_result:
                 on_final_result(final_transcript)
 
@@ -114,3 +252,137 @@ class SherpaONNXSTTEngine(STTEngine):
             if on_error:
                 on_error(e)
             raise TJBotError(f"Sherpa STT error: {e}")
+
+    def _create_segmenter(self) -> VADSegmenter:
+        vad_config = (self.backend_config.vad if self.backend_config else None) or VADConfig()
+        return VADSegmenter(
+            create_vad(vad_config, self.sample_rate),
+            gap_ms=vad_config.segmentGapMs or 300,
+            padding_ms=vad_config.paddingMs or 300,
+            # With VAD disabled, listen() does not end the stream at silence, so the segmenter does
+            end_ms=None if vad_config.enabled is not False else (vad_config.hangoverMs or 800)
+        )
+
+    def _take_segmenter(self) -> VADSegmenter:
+        # The idle segmenter is reused; concurrent callers get their own
+        with self._stream_lock:
+            segmenter, self.segmenter = self.segmenter, None
+        return segmenter or self._create_segmenter()
+
+    def _take_stream(self):
+        # A stream left at an endpoint is reused; concurrent callers get their own
+        with self._stream_lock:
+            stream, self._idle_stream = self._idle_stream, None
+        return stream or self.recognizer.create_stream()
+
+    def _transcribe_batched(
+        self,
+        audio_stream: Iterator[bytes],
+        on_partial_result: Optional[Callable[[str], None]],
+        on_final_result: Optional[Callable[[str], None]],
+        on_error: Optional[Callable[[Exception], None]]
+    ) -> str:
+        """
+        Like the streaming path, but decoding happens on the shared batch decoder thread
+        together with every other stream being transcribed by this engine.
+        """
+        decoder = self.batch_decoder
+        if decoder is None:
+            raise TJBotError("Sherpa-ONNX batch decoder not initialized.")
+        handle = decoder.open()
+        min_interval = self.partial_interval_ms / 1000.0
+        last_partial = ''
+        last_partial_time = 0.0
+
+        try:
+            for chunk in audio_stream:
+                # Chunks may be memoryviews into capture buffers, so the decoder gets a copy
+                decoder.feed(handle, bytes(chunk))
+                if handle.endpoint:
+                    break
+
+                if on_partial_result:
+                    text = handle.text
+                    now = time.monotonic()
+                    if text and text != last_partial and now - last_partial_time >= min_interval:
+                        last_partial = text
+                        last_partial_time = now
+                        on_partial_result(text)
+
+            final_transcript = decoder.finish(handle)
+            if on_final_result:
+                on_final_result(final_transcript)
+
+            return final_transcript
+
+        except Exception as e:
+            decoder.cancel(handle)
+            logger.error(f"Sherpa STT error: {e}")
+            if on_error:
+                on_error(e)
+            raise TJBotError(f"Sherpa STT error: {e}")
+
+    def _decode_segment(self, samples: 'np.ndarray') -> str:
+        stream = self.recognizer.create_stream()
+        stream.accept_waveform(self.sample_rate, samples)
+        self.recognizer.decode_stream(stream)
+        return stream.result.text.strip()
+
+    def _transcribe_offline(
+        self,
+        audio_stream: Iterator[bytes],
+        on_partial_result: Optional[Callable[[str], None]],
+        on_final_result: Optional[Callable[[str], None]],
+        on_error: Optional[Callable[[Exception], None]]
+    ) -> str:
+        """
+        Cut the stream into speech segments and decode each one on a worker thread while
+        capture continues, so most of a long utterance is transcribed when the speaker stops.
+        on_partial_result receives the transcript so far after each segment (from the worker thread).
+        """
+        segments: queue.Queue = queue.Queue()
+        texts: List[str] = []
+        errors: List[Exception] = []
+
+        def decode_segments():
+            while True:
+                samples = segments.get()
+                if samples is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    text = self._decode_segment(samples)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if text:
+                    texts.append(text)
+                    if on_partial_result:
+                        on_partial_result(' '.join(texts))
+
+        segmenter = self._take_segmenter()
+        worker = threading.Thread(target=decode_segments, name='stt-segment-decoder', daemon=True)
+        worker.start()
+        try:
+            for samples in segmenter.segments(audio_stream):
+                segments.put(samples)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            segments.put(None)
+            with self._stream_lock:
+                self.segmenter = segmenter
+            worker.join()
+
+        if errors:
+            error = errors[0]
+            logger.error(f"Sherpa STT error: {error}")
+            if on_error:
+                on_error(error)
+            raise TJBotError(f"Sherpa STT error: {error}")
+
+        final_transcript = ' '.join(texts)
+        if on_final_result:
+            on_final_result(final_transcript)
+        return final_transcript
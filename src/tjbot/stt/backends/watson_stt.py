@@ -1,28 +1,248 @@
-from typing import Iterator, Callable, Optional
+from typing import Any, Iterator, Callable, Dict, List, Optional
 import os
 import logging
+import queue
+import threading
+import time
 from ..engine import STTEngine
-from ...config.models import IBCWatsonSTTConfig
+from ...audio import create_uplink_encoder
+from ...config.models import STTBackendIBMWatsonConfig
 from ...error import TJBotError
+from ...microphone.stats import LatencyHistogram
 
 try:
     from ibm_watson import SpeechToTextV1
+    from ibm_watson.websocket import AudioSource, RecognizeCallback
     from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 except ImportError:
     SpeechToTextV1 = None
+    AudioSource = None
+    RecognizeCallback = object
     IAMAuthenticator = None
 
 logger = logging.getLogger(__name__)
 
+# Content type for each compressed uplink encoding
+_CONTENT_TYPES = {
+    'flac': 'audio/flac',
+    'ogg-opus': 'audio/ogg;codecs=opus',
+}
+
+# Session mode: chunks queued for the websocket before transcribe() blocks (5 s of 100 ms frames)
+SESSION_QUEUE_CHUNKS = 50
+
+# Session mode: silence frame sent after an utterance until the service finalizes it
+_FLUSH_FRAME_MS = 100
+_FLUSH_TIMEOUT = 3.0
+
+# Session mode: with no phrase in progress, how long to wait for late results after an utterance
+_SETTLE_SECONDS = 0.5
+
+# Session mode: how often the IAM token and the idle websocket are looked after. The service
+# closes a websocket that receives no audio for 30 s, so idle sessions get a silence frame.
+_MAINTENANCE_SECONDS = 10.0
+_KEEPALIVE_SECONDS = 20.0
+
+
+class _RecognizeCallback:
+    """
+    Receives the results of a recognize_using_websocket() call; the SDK calls these methods by name.
+    In session mode one instance collects the results of one utterance (turn).
+    """
+    def __init__(
+        self,
+        on_partial_result: Optional[Callable[[str], None]] = None,
+        on_final_result: Optional[Callable[[str], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None
+    ):
+        self.on_partial_result = on_partial_result
+        self.on_final_result = on_final_result
+        self.on_error_callback = on_error
+        self.finals: List[str] = []
+
+        # Turn state: a phrase is open from its first interim result until its final one.
+        # done is only set when the websocket ends; a turn is over once no phrase is open
+        # and no result has arrived for a while (see IBMWatsonSTTEngine._transcribe_turn).
+        self.open_phrase = False
+        self.audio_ended_at: Optional[float] = None
+        self.last_result_at = 0.0
+        self.last_final_at: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def final_transcript(self) -> str:
+        return ''.join(self.finals)
+
+    def end_audio(self) -> float:
+        self.audio_ended_at = time.monotonic()
+        return self.audio_ended_at
+
+    def on_data(self, data: Dict[str, Any]) -> None:
+        for result in data.get('results') or []:
+            text = result['alternatives'][0]['transcript']
+            self.last_result_at = time.monotonic()
+            if result.get('final'):
+                self.open_phrase = False
+                self.last_final_at = self.last_result_at
+                self.finals.append(text)
+                if self.on_final_result:
+                    self.on_final_result(text)
+            else:
+                self.open_phrase = True
+                if self.on_partial_result:
+                    self.on_partial_result(text)
+
+    def on_error(self, error) -> None:
+        if self.on_error_callback:
+            self.on_error_callback(Exception(error))
+        self.done.set()
+
+    def on_inactivity_timeout(self, error) -> None:
+        if self.on_error_callback:
+            self.on_error_callback(Exception("Inactivity Timeout"))
+
+    def on_connected(self):
+        pass
+
+    def on_listening(self):
+        pass
+
+    def on_hypothesis(self, hypothesis):
+        pass
+
+    def on_transcription(self, transcript):
+        pass
+
+    def on_close(self):
+        self.done.set()
+
+
+class _WatsonSession(RecognizeCallback):
+    """
+    One websocket, fed through a bounded AudioSource queue that the SDK's sender thread
+    drains, so a slow connection blocks the producer instead of buffering without limit.
+    Results are routed to the current turn. Session mode keeps one open across utterances;
+    otherwise each transcribe() opens its own. The SDK only accepts RecognizeCallback subclasses.
+    """
+    def __init__(self, service: Any, params: Dict[str, Any], connect_latency: LatencyHistogram):
+        self.audio_queue: queue.Queue = queue.Queue(maxsize=SESSION_QUEUE_CHUNKS)
+        self.audio_source = AudioSource(self.audio_queue, is_recording=True, is_buffer=True)
+        self.turn: Optional[_RecognizeCallback] = None
+        self.listening = threading.Event()
+        self.closed = threading.Event()
+        self.error: Optional[Exception] = None
+        self.last_sent = time.monotonic()
+        self._connect_latency = connect_latency
+        self._opened_at = time.monotonic()
+
+        self._thread = threading.Thread(
+            target=self._run, args=(service, params), name='watson-stt-session', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, service: Any, params: Dict[str, Any]) -> None:
+        try:
+            service.recognize_using_websocket(audio=self.audio_source, recognize_callback=self, **params)
+        except Exception as e:
+            logger.warning(f"Watson STT session ended with an error: {e}")
+            self.error = e
+            self.on_error(e)
+        finally:
+            self.on_close()
+
+    def send(self, chunk: bytes) -> None:
+        # Blocks while the queue is full; gives up if the websocket goes away meanwhile
+        while True:
+            if self.closed.is_set():
+                raise TJBotError("Watson STT session closed")
+            try:
+                self.audio_queue.put(chunk, timeout=0.5)
+                self.last_sent = time.monotonic()
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        self.audio_source.completed_recording()
+        try:
+            # Wakes the SDK sender, which then sends the stop message
+            self.audio_queue.put_nowait(b'')
+        except queue.Full:
+            pass
+
+    # SDK callbacks for the whole websocket
+    def on_listening(self) -> None:
+        self._connect_latency.record((time.monotonic() - self._opened_at) * 1000.0)
+        self.listening.set()
+
+    def on_data(self, data: Dict[str, Any]) -> None:
+        turn = self.turn
+        if turn:
+            turn.on_data(data)
+
+    def on_error(self, error) -> None:
+        turn = self.turn
+        if turn:
+            turn.on_error(error)
+
+    def on_inactivity_timeout(self, error) -> None:
+        turn = self.turn
+        if turn:
+            turn.on_inactivity_timeout(error)
+
+    def on_close(self) -> None:
+        self.closed.set()
+        turn = self.turn
+        if turn:
+            turn.done.set()
+
+    def on_connected(self):
+        pass
+
+    def on_hypothesis(self, hypothesis):
+        pass
+
+    def on_transcription(self, transcript):
+        pass
+
+
 class IBMWatsonSTTEngine(STTEngine):
     """
     IBM Watson Speech-to-Text backend.
+
+    By default each transcribe() opens its own websocket. With persistentSession, one
+    websocket stays open across utterances: an utterance ends with its audio stream (the
+    VAD endpoint in listen()) and the turn with the service's final results for it, the IAM
+    token is refreshed in the background, and the session is reopened in the background if
+    the service closes it, so a turn pays neither token fetch nor handshake. The session
+    carries one turn at a time; concurrent callers fall back to a websocket of their own.
     """
-    def __init__(self, config: Optional[IBCWatsonSTTConfig] = None):
+    coalesce_frames = True
+
+    def __init__(self, config: Optional[STTBackendIBMWatsonConfig] = None):
         # We might receive the specific backend config here,
         # or we might need to look it up from environment/files if not provided fully.
         self.backend_config = config
         self.service = None
+        self.persistent = bool(config and config.persistentSession)
+
+        # Compresses the uplink when uplinkEncoding is set; None sends PCM.
+        # A session's websocket carries one audio stream, so session mode always sends PCM.
+        encoding = config.uplinkEncoding if config else None
+        if self.persistent and encoding not in (None, 'pcm'):
+            logger.warning(f"Watson STT persistent session sends PCM, ignoring uplinkEncoding '{encoding}'")
+            encoding = None
+        self.uplink_encoder = create_uplink_encoder(encoding, self.sample_rate, self.channels)
+
+        self.session: Optional[_WatsonSession] = None
+        self._session_lock = threading.Lock()
+        # Held for the duration of a turn on the persistent session
+        self._turn_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        # Milliseconds to open the websocket, and from the end of an utterance's audio to its final result
+        self.connect_latency = LatencyHistogram()
+        self.finalize_latency = LatencyHistogram()
         self._initialize()
 
     def _initialize(self):
@@ -39,18 +259,9 @@ class IBMWatsonSTTEngine(STTEngine):
              os.environ['IBM_CREDENTIALS_FILE'] = creds_path
 
         try:
-            # SDK automatically asserts env vars like SPEECH_TO_TEXT_APIKEY / URL
-            # Or if prompt was using IAMAuthenticator manually...
-            # The simplest way with new SDK is let it auto-configure acting on env vars
-            # Use authenticator if config has apikey
-            if self.backend_config and self.backend_config.apikey:
-                 authenticator = IAMAuthenticator(self.backend_config.apikey)
-                 self.service = SpeechToTextV1(authenticator=authenticator)
-                 if self.backend_config.url:
-                     self.service.set_service_url(self.backend_config.url)
-            else:
-                 # Auto-load from env/file
-                 self.service = SpeechToTextV1(authenticator=None) # SDK might raise if no creds found
+            # The SDK reads SPEECH_TO_TEXT_APIKEY / SPEECH_TO_TEXT_URL from the environment
+            # or from the ibm-credentials.env file found above
+            self.service = SpeechToTextV1(authenticator=None)
 
             logger.info("Watson STT initialized")
         except Exception as e:
@@ -59,6 +270,13 @@ class IBMWatsonSTTEngine(STTEngine):
             # Node raises.
             pass
 
+        if self.service and self.persistent:
+            if AudioSource is None:
+                raise TJBotError("ibm-watson library not installed. Please install it.")
+            self._refresh_token()
+            self._open_session()
+            threading.Thread(target=self._maintain, name='watson-stt-maintenance', daemon=True).start()
+
     def _find_credentials(self) -> Optional[str]:
         # Check explicit path in config
         if self.backend_config and self.backend_config.credentialsPath:
@@ -76,6 +294,106 @@ class IBMWatsonSTTEngine(STTEngine):
 
         return None
 
+    @property
+    def content_type(self) -> str:
+        # STTController converts microphone audio to the engine's declared format
+        if self.uplink_encoder:
+            return _CONTENT_TYPES[self.uplink_encoder.encoding]
+        return f"audio/l16; rate={self.sample_rate}; channels={self.channels}"
+
+    def _recognize_params(self, interim_results: bool) -> Dict[str, Any]:
+        """
+        recognize_using_websocket() arguments from the backend config.
+        """
+        config = self.backend_config or STTBackendIBMWatsonConfig()
+        params: Dict[str, Any] = {
+            'content_type': self.content_type,
+            'model': config.model or 'en-US_BroadbandModel',
+            'interim_results': interim_results,
+        }
+        if config.inactivityTimeout is not None:
+            params['inactivity_timeout'] = config.inactivityTimeout
+        if config.backgroundAudioSuppression is not None:
+            params['background_audio_suppression'] = config.backgroundAudioSuppression
+        return params
+
+    def _interim_results_enabled(self) -> bool:
+        return not self.backend_config or self.backend_config.interimResults is not False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connect_ms': self.connect_latency.snapshot(),
+            'finalize_ms': self.finalize_latency.snapshot(),
+        }
+
+    def _refresh_token(self) -> None:
+        # The token manager caches the IAM token and fetches a new one once it is near expiry
+        token_manager = getattr(getattr(self.service, 'authenticator', None), 'token_manager', None)
+        if token_manager is None:
+            return
+        try:
+            token_manager.get_token()
+        except Exception as e:
+            logger.warning(f"Watson STT IAM token refresh failed: {e}")
+
+    def _open_session(self) -> _WatsonSession:
+        # Interim results are always requested in session mode: they tell whether a phrase is still open.
+        # Silence between utterances must not end the session.
+        params = self._recognize_params(interim_results=True)
+        params['inactivity_timeout'] = -1
+        self.session = _WatsonSession(self.service, params, self.connect_latency)
+        return self.session
+
+    def _take_session(self) -> _WatsonSession:
+        with self._session_lock:
+            session = self.session
+            if session is None or session.closed.is_set():
+                logger.info("Watson STT session closed, reconnecting")
+                session = self._open_session()
+            return session
+
+    def _drop_session(self, session: _WatsonSession) -> None:
+        # The next turn opens a new session
+        with self._session_lock:
+            session.close()
+            if self.session is session:
+                self.session = None
+
+    def _maintain(self) -> None:
+        """
+        Session mode housekeeping: keep the IAM token fresh, keep an idle websocket alive,
+        and reopen a session the service closed, all off the transcribe() path.
+        """
+        while not self._stopped.wait(_MAINTENANCE_SECONDS):
+            self._refresh_token()
+            with self._session_lock:
+                session = self.session
+                if session is None:
+                    continue
+                if session.closed.is_set():
+                    # Only reconnect sessions that worked, so bad credentials do not loop
+                    if session.listening.is_set():
+                        self._open_session()
+                elif session.turn is None and time.monotonic() - session.last_sent > _KEEPALIVE_SECONDS:
+                    try:
+                        session.audio_queue.put_nowait(self._silence())
+                        session.last_sent = time.monotonic()
+                    except queue.Full:
+                        pass
+
+    def _silence(self) -> bytes:
+        return bytes(self.sample_rate * self.channels * 2 * _FLUSH_FRAME_MS // 1000)
+
+    def close(self) -> None:
+        """
+        End the persistent session, if any.
+        """
+        self._stopped.set()
+        with self._session_lock:
+            if self.session:
+                self.session.close()
+                self.session = None
+
     def transcribe(
         self,
         audio_stream: Iterator[bytes],
@@ -86,80 +404,100 @@ class IBMWatsonSTTEngine(STTEngine):
         if not self.service:
              raise TJBotError("Watson STT not initialized or credentials missing.")
 
-        # Watson Python SDK 'recognize_using_websocket' expects a file-like object or generator.
-        # audio_stream IS a generator yielding bytes.
+        if not self._interim_results_enabled():
+            on_partial_result = None
+
+        if self.persistent:
+            # The session carries one utterance at a time; concurrent callers get a websocket of their own
+            if self._turn_lock.acquire(blocking=False):
+                try:
+                    return self._transcribe_turn(audio_stream, on_partial_result, on_final_result, on_error)
+                finally:
+                    self._turn_lock.release()
+
+        return self._transcribe_once(audio_stream, on_partial_result, on_final_result, on_error)
+
+    def _transcribe_once(
+        self,
+        audio_stream: Iterator[bytes],
+        on_partial_result: Optional[Callable[[str], None]],
+        on_final_result: Optional[Callable[[str], None]],
+        on_error: Optional[Callable[[Exception], None]]
+    ) -> str:
+        """
+        Send the audio over a websocket of its own and wait for the service to close it.
+        """
+        if self.uplink_encoder:
+            audio_stream = self.uplink_encoder.process(audio_stream)
 
-        # We need to map config to params
-        # model, inactivity_timeout, etc.
-        model = self.backend_config.model if self.backend_config else 'en-US_BroadbandModel'
+        callback = _RecognizeCallback(on_partial_result, on_final_result, on_error)
+        session = _WatsonSession(
+            self.service, self._recognize_params(interim_results=on_partial_result is not None), self.connect_latency
+        )
+        session.turn = callback
+        try:
+            for chunk in audio_stream:
+                session.send(bytes(chunk))
+        except TJBotError:
+            # The websocket closed early; an error that closed it is raised below
+            pass
+        finally:
+            session.close()
+        session.closed.wait()
 
-        # Audio source: generator
-        # content_type: audio/l16; rate=...; channels=...
-        # We assume standard 16khz 1channel pcm from microphone usually, but should be configurable.
-        content_type = "audio/l16; rate=16000; channels=1"
+        if session.error is not None:
+            # The callback has already passed the error to on_error
+            logger.error(f"Watson STT Transcribe error: {session.error}")
+            raise TJBotError(f"Watson STT error: {session.error}")
+        return callback.final_transcript
 
+    def _transcribe_turn(
+        self,
+        audio_stream: Iterator[bytes],
+        on_partial_result: Optional[Callable[[str], None]],
+        on_final_result: Optional[Callable[[str], None]],
+        on_error: Optional[Callable[[Exception], None]]
+    ) -> str:
+        """
+        Send one utterance over the persistent session and wait for the service to finalize it.
+        The utterance ends with audio_stream (e.g. at the VAD endpoint), not with a final result.
+        """
+        session = self._take_session()
+        turn = _RecognizeCallback(on_partial_result, on_final_result, on_error)
+        session.turn = turn
         try:
-            # Note: recognize_using_websocket is blocking?
-            # In Python SDK it usually is for file/generator.
-            # It returns complex structure.
-
-            # NOTE: ibm-watson Python SDK websocket support might be tricky with generators.
-            # Usually it uses a callback class.
-
-            class MyRecognizeCallback:
-                def __init__(self):
-                    self.final_transcript = ""
-
-                def on_transcription(self, transcript):
-                    # logic to parse transcript
-                    if not transcript:
-                        return
-                    results = transcript.get('results')
-                    if not results:
-                        return
-
-                    for res in results:
-                        text = res['alternatives'][0]['transcript']
-                        final = res['final']
-                        if final:
-                            self.final_transcript += text
-                            if on_final_result:
-                                on_final_result(text)
-                        else:
-                            if on_partial_result:
-                                on_partial_result(text)
-
-                def on_connected(self):
-                    pass
-                def on_error(self, error):
-                    if on_error:
-                        on_error(Exception(error))
-                def on_inactivity_timeout(self, error):
-                    if on_error:
-                        on_error(Exception("Inactivity Timeout"))
-                def on_listening(self):
-                    pass
-                def on_hypothesis(self, hypothesis):
-                    pass
-                def on_data(self, data):
-                    pass
-                def on_close(self):
-                    pass
-
-            callback = MyRecognizeCallback()
-
-            self.service.recognize_using_websocket(
-                audio=audio_stream,
-                content_type=content_type,
-                recognize_callback=callback,
-                model=model,
-                interim_results=True if on_partial_result else False
-            )
-
-            return callback.final_transcript
+            for chunk in audio_stream:
+                session.send(bytes(chunk))
+            ended_at = turn.end_audio()
 
-        except Exception as e:
+            # Keep the audio going with silence, so the service sees the end of the phrase.
+            # An utterance can hold several phrases, each with its own final result, so the
+            # turn only ends once no phrase is open and the results have settled.
+            silence = self._silence()
+            deadline = ended_at + _FLUSH_TIMEOUT
+            while not turn.done.wait(_FLUSH_FRAME_MS / 1000.0):
+                now = time.monotonic()
+                settled = not turn.open_phrase and now - max(ended_at, turn.last_result_at) >= _SETTLE_SECONDS
+                if settled or now >= deadline:
+                    break
+                session.send(silence)
+
+            if turn.open_phrase and not session.closed.is_set():
+                # The phrase's final result would arrive during the next turn: start that one on a new websocket
+                logger.warning("Watson STT did not finalize the utterance in time, reconnecting")
+                self._drop_session(session)
+
+            # Time to the last final result, if the service finalized audio sent after the utterance
+            finalized_at = turn.last_final_at
+            settled = not session.closed.is_set() and not turn.open_phrase
+            if settled and finalized_at is not None and finalized_at >= ended_at:
+                self.finalize_latency.record((finalized_at - ended_at) * 1000.0)
+        except TJBotError as e:
             logger.error(f"Watson STT Transcribe error: {e}")
             if on_error:
                 on_error(e)
-            raise TJBotError(f"Watson STT error: {e}")
+            raise
+        finally:
+            session.turn = None
+
+        return turn.final_transcript
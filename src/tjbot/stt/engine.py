@@ -5,7 +5,16 @@ from ..config.models import STTEngineConfig
 class STTEngine(ABC):
     """
     Abstract base class for STT engines.
+    Subclasses declare the PCM format they expect; STTController converts
+    microphone audio to this format before calling transcribe().
     """
+    # Expected input format: 16-bit signed little-endian PCM
+    sample_rate: int = 16000
+    channels: int = 1
+
+    # Network engines set this so STTController packs audio into larger frames before sending
+    coalesce_frames: bool = False
+
     def __init__(self, config: STTEngineConfig):
         self.config = config
 
@@ -20,7 +29,9 @@ class STTEngine(ABC):
         """
         Transcribe audio stream.
         This method should block until transcription is complete (e.g. end of stream).
-        :param audio_stream: Iterator returning bytes of audio data.
+        :param audio_stream: Iterator returning bytes-like chunks of audio data.
+                             Microphone chunks are memoryviews that are only valid
+                             until the next chunk is requested.
         :param on_partial_result: Callback for partial transcripts.
         :param on_final_result: Callback for final transcripts (if intermediate finals occur).
         :param on_error: Callback for errors.
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Optional
+from ..config.models import STTBackendConfig
+from ..error import TJBotError
+from .engine import STTEngine
+from . import backends
+
+logger = logging.getLogger(__name__)
+
+# Engines are expensive to build (model loads, SDK clients), so they are shared by every
+# STTController in the process whose backend config is identical
+_engine_cache: Dict[str, STTEngine] = {}
+
+# Held while an engine is built, so a warm-up thread and listen() never build the same engine twice
+_engine_cache_lock = threading.Lock()
+
+
+def engine_cache_key(backend_config: STTBackendConfig) -> str:
+    """
+    Stable hash of a backend config, used as the engine cache key.
+    """
+    dump = json.dumps(backend_config.model_dump(mode='json', by_alias=True), sort_keys=True)
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
+
+
+def create_engine(backend_config: STTBackendConfig) -> STTEngine:
+    """
+    Build the engine for backend_config.type, importing only that backend's module.
+    """
+    backend_type = backend_config.type or 'local'
+    if backend_type not in backends.BACKENDS:
+        raise TJBotError(f"unknown STT backend type '{backend_type}', expected one of {', '.join(backends.BACKENDS)}")
+
+    class_name, config_attr = backends.BACKENDS[backend_type]
+    engine_class = getattr(backends, class_name)
+    logger.debug(f"creating {class_name} for STT backend '{backend_type}'")
+    return engine_class(getattr(backend_config, config_attr))
+
+
+def get_engine(backend_config: Optional[STTBackendConfig] = None) -> STTEngine:
+    """
+    Return the shared engine for backend_config, creating it on first use.
+    """
+    backend_config = backend_config or STTBackendConfig()
+    key = engine_cache_key(backend_config)
+
+    with _engine_cache_lock:
+        engine = _engine_cache.get(key)
+        if engine is None:
+            engine = create_engine(backend_config)
+            _engine_cache[key] = engine
+        return engine
+
+
+def clear_engine_cache() -> None:
+    """
+    Drop all cached engines, e.g. after credentials or model files change.
+    Engines with a close() method (persistent sessions, background threads) are closed.
+    """
+    with _engine_cache_lock:
+        engines = list(_engine_cache.values())
+        _engine_cache.clear()
+
+    for engine in engines:
+        close = getattr(engine, 'close', None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"failed to close {type(engine).__name__}: {e}")
@@ -0,0 +1,223 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from ..error import TJBotError
+from ..microphone.stats import LatencyHistogram
+from .engine import STTEngine
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'primary'
+SECONDARY = 'secondary'
+
+# Marks the end of a branch's audio
+_END = object()
+
+# Chunks buffered per branch; a branch that falls this far behind holds the tee back
+TEE_QUEUE_CHUNKS = 50
+
+
+class AudioTee:
+    """
+    Fans one audio stream out to several consumers.
+    Every consumer receives the same chunk objects; memoryview chunks (which are only valid
+    until the next read) are copied once, not once per consumer. Each branch buffers at most
+    TEE_QUEUE_CHUNKS chunks. Cancelled branches are dropped without slowing the others down,
+    and the source is no longer read once every branch is cancelled.
+    """
+    def __init__(self, audio_stream: Iterable, branches: int = 2):
+        self._source = audio_stream
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=TEE_QUEUE_CHUNKS) for _ in range(branches)]
+        self._cancelled = [False] * branches
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stt-audio-tee', daemon=True)
+        self._thread.start()
+
+    def branch(self, index: int) -> Iterator[Any]:
+        q = self._queues[index]
+        while not self._cancelled[index]:
+            chunk = q.get()
+            if chunk is _END:
+                return
+            yield chunk
+
+    def cancel(self, index: int) -> None:
+        self._cancelled[index] = True
+        # Drop what the branch has not read yet, so the end marker fits
+        q = self._queues[index]
+        while True:
+            try:
+                q.put_nowait(_END)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def stop(self) -> None:
+        """
+        Cancel every branch and wait until the tee has stopped reading the source, so the
+        caller can read the source again. Returns once the chunk being read has arrived.
+        """
+        for index in range(len(self._queues)):
+            self.cancel(index)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _put(self, index: int, item: Any) -> None:
+        # Blocks while the branch's queue is full, until the branch reads or is cancelled
+        q = self._queues[index]
+        while not self._cancelled[index]:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self) -> None:
+        try:
+            for chunk in self._source:
+                if isinstance(chunk, memoryview):
+                    chunk = chunk.tobytes()
+                live = [i for i, cancelled in enumerate(self._cancelled) if not cancelled]
+                if not live:
+                    return
+                for index in live:
+                    self._put(index, chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Cancelled branches got their end marker from cancel()
+            for index in range(len(self._queues)):
+                self._put(index, _END)
+
+
+class HedgedTranscriber:
+    """
+    Runs a primary and a secondary engine on the same audio and returns the first usable final.
+
+    A non-empty primary final wins as soon as it arrives. If the secondary finishes first,
+    the primary still wins if it finishes within grace_ms; otherwise the secondary's result is
+    returned. Once a winner is decided, the audio of both engines is cut off and no more
+    partial results are delivered. Partial results come from the primary.
+    """
+    def __init__(self, primary: STTEngine, secondary: STTEngine, grace_ms: int = 300):
+        self.engines = {PRIMARY: primary, SECONDARY: secondary}
+        self.grace = grace_ms / 1000.0
+
+        # Which engine's result was returned, and time from start to each engine's final (ms)
+        self.wins: Dict[str, int] = {PRIMARY: 0, SECONDARY: 0}
+        self.latency: Dict[str, LatencyHistogram] = {PRIMARY: LatencyHistogram(), SECONDARY: LatencyHistogram()}
+        self.last_winner: Optional[str] = None
+
+    def transcribe(
+        self,
+        audio_stream: Iterable,
+        on_partial_result: Optional[Callable[[str], None]] = None,
+        on_final_result: Optional[Callable[[str], None]] = None,
+        prepare: Optional[Callable[[STTEngine, Iterator], Iterator]] = None
+    ) -> str:
+        """
+        :param prepare: Applied to each branch's audio before it reaches that engine (e.g. coalescing).
+        """
+        tee = AudioTee(audio_stream, 2)
+        results: Dict[str, Any] = {}
+        finished = threading.Condition()
+        started = time.monotonic()
+
+        # Partials are forwarded under the lock until the winner is decided, so none
+        # reaches the caller after transcribe() has returned
+        callback_lock = threading.Lock()
+        detached = threading.Event()
+
+        def forward_partial(text: str) -> None:
+            with callback_lock:
+                if on_partial_result and not detached.is_set():
+                    on_partial_result(text)
+
+        def run(index: int, name: str, on_partial):
+            engine = self.engines[name]
+            stream = tee.branch(index)
+            if prepare:
+                stream = prepare(engine, stream)
+            result: Any
+            try:
+                result = engine.transcribe(stream, on_partial_result=on_partial)
+            except Exception as e:
+                result = e
+            finally:
+                # An engine that returns early no longer holds the tee back
+                tee.cancel(index)
+            with finished:
+                results[name] = (result, time.monotonic())
+                finished.notify_all()
+
+        primary_partial = forward_partial if on_partial_result else None
+        for index, (name, on_partial) in enumerate(((PRIMARY, primary_partial), (SECONDARY, None))):
+            threading.Thread(target=run, args=(index, name, on_partial), name=f"stt-hedge-{name}", daemon=True).start()
+        tee.start()
+
+        winner = self._wait_for_winner(results, finished)
+        with callback_lock:
+            detached.set()
+        with finished:
+            decided = dict(results)
+
+        # Cut off both engines' audio; the one still running finishes on its own and is ignored.
+        # The tee must be done with the source before returning, since the caller may read it next.
+        tee.stop()
+        for name in (PRIMARY, SECONDARY):
+            if name in decided:
+                self.latency[name].record((decided[name][1] - started) * 1000.0)
+
+        if tee.error is not None:
+            error = tee.error
+            raise error if isinstance(error, TJBotError) else TJBotError(f"STT audio error: {error}")
+
+        if winner is None:
+            error = decided[PRIMARY][0]
+            raise error if isinstance(error, TJBotError) else TJBotError(f"STT error: {error}")
+
+        self.wins[winner] += 1
+        self.last_winner = winner
+        text = decided[winner][0]
+        logger.debug(f"hedged STT: {winner} won after {(decided[winner][1] - started) * 1000.0:.0f} ms")
+        if on_final_result:
+            on_final_result(text)
+        return text
+
+    def _wait_for_winner(self, results: Dict[str, Any], finished: threading.Condition) -> Optional[str]:
+        def usable(name):
+            return name in results and isinstance(results[name][0], str) and results[name][0].strip()
+
+        with finished:
+            while True:
+                if usable(PRIMARY):
+                    return PRIMARY
+                if usable(SECONDARY):
+                    # Give the primary a short grace window before settling for the secondary
+                    deadline = results[SECONDARY][1] + self.grace
+                    while PRIMARY not in results:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        finished.wait(remaining)
+                    return PRIMARY if usable(PRIMARY) else SECONDARY
+                if PRIMARY in results and SECONDARY in results:
+                    # Neither produced text: an empty primary transcript is a valid answer
+                    return PRIMARY if isinstance(results[PRIMARY][0], str) else (
+                        SECONDARY if isinstance(results[SECONDARY][0], str) else None)
+                finished.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'wins': dict(self.wins),
+            'last_winner': self.last_winner,
+            'latency_ms': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+        }
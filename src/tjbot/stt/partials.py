@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def stable_prefix(previous: str, current: str) -> str:
+    """
+    Words at the start of current that are unchanged from the previous hypothesis.
+    """
+    old = previous.split()
+    new = current.split()
+    n = 0
+    while n < len(old) and n < len(new) and old[n] == new[n]:
+        n += 1
+    return ' '.join(new[:n])
+
+
+class PartialResultFilter:
+    """
+    Post-processes an engine's result callbacks so every backend behaves the same:
+    unchanged partial hypotheses are dropped, partials are rate-limited to
+    max_per_second, and finals are always delivered.
+
+    After each delivered partial, `stable` holds the words it shares with the previous
+    delivered hypothesis and `delta` the words that changed or are new.
+    Engines may call back from their own threads, so the filter is thread-safe.
+    """
+    def __init__(
+        self,
+        on_partial_result: Optional[Callable[[str], None]] = None,
+        on_final_result: Optional[Callable[[str], None]] = None,
+        max_per_second: float = 0
+    ):
+        self._on_partial = on_partial_result
+        self._on_final = on_final_result
+        self.min_interval = 1.0 / max_per_second if max_per_second and max_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+
+        self.last_partial = ''
+        self._last_time = 0.0
+        self.stable = ''
+        self.delta = ''
+
+        self.received = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.throttled = 0
+
+    def on_partial(self, text: str) -> None:
+        text = (text or '').strip()
+        with self._lock:
+            self.received += 1
+            if not text or text == self.last_partial:
+                self.duplicates += 1
+                return
+            now = time.monotonic()
+            if now - self._last_time < self.min_interval:
+                self.throttled += 1
+                return
+
+            self.stable = stable_prefix(self.last_partial, text)
+            self.delta = text[len(self.stable):].strip()
+            self.last_partial = text
+            self._last_time = now
+            self.delivered += 1
+
+        if self._on_partial:
+            self._on_partial(text)
+
+    def on_final(self, text: str) -> None:
+        with self._lock:
+            # Backends that send several finals start a fresh hypothesis after each one
+            self.last_partial = ''
+            self.stable = ''
+            self.delta = ''
+        if self._on_final:
+            self._on_final(text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'received': self.received,
+                'delivered': self.delivered,
+                'duplicates': self.duplicates,
+                'throttled': self.throttled,
+            }
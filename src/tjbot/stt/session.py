@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional
+from ..audio import convert_audio_stream
+from ..error import TJBotError
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the session in the utterance backlog
+_END = object()
+
+
+class Utterance(NamedTuple):
+    """
+    One transcribed utterance. Timestamps are capture times (time.monotonic()).
+    """
+    text: str
+    start_ts: float
+    end_ts: float
+
+
+class ListeningSession:
+    """
+    Long-lived listening session that transcribes utterance after utterance.
+
+    The audio stream, resampler, VAD and engine stay set up between utterances, so each
+    turn only pays for recognition. Utterances are queued in a bounded backlog; when the
+    consumer falls behind, the oldest ones are dropped.
+    """
+    def __init__(
+        self,
+        stt_controller: Any,
+        audio_stream: Iterable,
+        sample_rate: int,
+        channels: int,
+        clock: Any = None,
+        backlog: int = 8,
+        on_close: Any = None
+    ):
+        """
+        :param stt_controller: STTController used for every utterance.
+        :param audio_stream: Endless stream of 16-bit PCM chunks (e.g. a microphone subscription).
+        :param clock: Object whose `timestamp` attribute is the capture time of the last chunk
+                      read from audio_stream, such as an AudioSubscription.
+        :param backlog: Maximum number of transcribed utterances waiting to be consumed.
+        :param on_close: Called when the session is closed, e.g. to end a microphone subscription.
+        """
+        self.stt_controller = stt_controller
+        self._source = audio_stream
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._clock = clock
+        self._on_close = on_close
+
+        self.backlog = max(1, backlog)
+        self._utterances: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.closed = False
+
+        # Utterances dropped because the backlog was full
+        self.dropped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __iter__(self) -> Iterator[Utterance]:
+        return self.utterances()
+
+    def start(self) -> 'ListeningSession':
+        self._thread = threading.Thread(target=self._run, name='stt-listening-session', daemon=True)
+        self._thread.start()
+        return self
+
+    def utterances(self, timeout: Optional[float] = None) -> Iterator[Utterance]:
+        """
+        Yield utterances as they are transcribed, until the session is closed.
+        :param timeout: Maximum seconds to wait for each utterance, or None to wait forever.
+        """
+        while True:
+            try:
+                item = self._utterances.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if item is _END:
+                # Leave the marker for any other consumer
+                self._put(_END)
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        """
+        Stop listening. Utterances already transcribed can still be read.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._on_close:
+            self._on_close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+
+    def _put(self, item: Any) -> None:
+        # The backlog limit applies to utterances; the end marker and errors always fit
+        if isinstance(item, Utterance):
+            while self._utterances.qsize() >= self.backlog:
+                try:
+                    self._utterances.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    break
+        self._utterances.put(item)
+
+    def _timestamp(self) -> float:
+        return getattr(self._clock, 'timestamp', 0.0) if self._clock else 0.0
+
+    def _source_chunks(self) -> Iterator:
+        for chunk in self._source:
+            if self.closed:
+                break
+            yield chunk
+
+    def _run(self) -> None:
+        controller = self.stt_controller
+        try:
+            engine = controller._initialize_engine()
+            vad_stage = controller._create_vad_stage(engine.sample_rate) if engine.channels == 1 else None
+            if vad_stage is None:
+                raise TJBotError("continuous listening needs VAD to split utterances; enable [listen.backend.local.vad]")
+
+            # One resampler for the whole session, so no state is lost between utterances
+            audio = iter(convert_audio_stream(
+                self._source_chunks(), self.sample_rate, self.channels, engine.sample_rate, engine.channels
+            ))
+
+            while not self.closed:
+                bounds: List[float] = []
+
+                def utterance() -> Iterator:
+                    for chunk in vad_stage.process(audio):
+                        if not bounds:
+                            bounds.append(self._timestamp())
+                        yield chunk
+
+                text = controller.transcribe_utterance(utterance())
+                if not bounds:
+                    # The VAD stage only ends without speech when the audio stream has ended
+                    break
+                end_ts = self._timestamp()
+                if text and text.strip() and not self.closed:
+                    self._put(Utterance(text.strip(), bounds[0], end_ts))
+        except Exception as e:
+            logger.error(f"listening session error: {e}")
+            self._put(e if isinstance(e, TJBotError) else TJBotError(f"listening session error: {e}"))
+        finally:
+            self._put(_END)
@@ -1,54 +1,190 @@
 import logging
-from typing import Iterator, Callable, Optional
-from ..config.models import ListenConfig
-from ..error import TJBotError
+import threading
+from typing import Iterator, Callable, Dict, Optional
+from ..config.models import ListenConfig, STTBackendConfig, VADConfig
+from ..audio import convert_audio_stream, create_vad, FrameCoalescer, VADStage
 from .engine import STTEngine
+from .factory import get_engine
+from .hedge import HedgedTranscriber
+from .partials import PartialResultFilter
 
 logger = logging.getLogger(__name__)
 
-# Import backends appropriately (lazy load or factory)
-# from .backends.local import LocalSTT
-# from .backends.watson import WatsonSTT
-# ...
-
 class STTController:
     """
     STT Controller that manages the active STT engine.
+    The engine is created on first use and shared with other controllers using the same backend config.
     """
     def __init__(self, listen_config: ListenConfig):
         self.config = listen_config
         self.engine: Optional[STTEngine] = None
-        self._initialize_engine()
+        self._vad = None
+
+        # Frame coalescing for cloud engines, one per engine since a hedge engine may use
+        # another format; their stats() cover every utterance sent
+        self.coalescers: Dict[STTEngine, FrameCoalescer] = {}
+
+        # Result filter of the most recent transcribe()
+        self.partial_filter: Optional[PartialResultFilter] = None
+
+        # Races the engine against config.hedgeBackend when one is configured
+        self.hedger: Optional[HedgedTranscriber] = None
+
+    @property
+    def coalescer(self) -> Optional[FrameCoalescer]:
+        """
+        Frame coalescer of the primary engine, if it has sent audio.
+        """
+        return self.coalescers.get(self.engine) if self.engine else None
+
+    @property
+    def vad_config(self) -> Optional[VADConfig]:
+        backend_config: STTBackendConfig = self.config.backend or STTBackendConfig()
+        return backend_config.local.vad if backend_config.local else None
 
-    def _initialize_engine(self):
-        # backend_config: STTBackendConfig = self.config.backend or STTBackendConfig()
-        # backend_type = backend_config.type
+    def _create_vad_stage(self, sample_rate: int) -> Optional[VADStage]:
+        """
+        Build the endpointing stage from the VAD config, or None if VAD is disabled.
+        The detector is created once and reset for each utterance.
+        """
+        vad_config = self.vad_config
+        if not vad_config or not vad_config.enabled:
+            return None
 
-        # Select engine based on type
-        # For now, we stub this factory logic.
-        # In a real impl, we would instantiate the correct engine class.
+        if self._vad is None or self._vad.sample_rate != sample_rate:
+            self._vad = create_vad(vad_config, sample_rate)
 
-        # Example stub:
-        # if backend_type == 'local':
-        #     self.engine = LocalSTT(backend_config.local)
-        # elif backend_type == 'ibm-watson-stt':
-        #     self.engine = WatsonSTT(backend_config.ibm_watson_stt)
-        # ...
+        return VADStage(
+            self._vad,
+            hangover_ms=vad_config.hangoverMs or 800,
+            padding_ms=300 if vad_config.paddingMs is None else vad_config.paddingMs
+        )
+
+    def _initialize_engine(self) -> STTEngine:
+        """
+        Get the engine for the configured backend from the process-wide cache,
+        building it (and importing its SDK) on first use.
+        """
+        if self.engine is None:
+            self.engine = get_engine(self.config.backend or STTBackendConfig())
+        if self.config.hedgeBackend and self.hedger is None:
+            self.hedger = HedgedTranscriber(
+                self.engine,
+                get_engine(self.config.hedgeBackend),
+                self.config.hedgeGraceMs or 0
+            )
+        return self.engine
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Build the engine in a background thread, so the first transcribe() does not
+        pay the model load. Errors are logged and raised again by transcribe().
+        """
+        def load():
+            try:
+                self._initialize_engine()
+            except Exception as e:
+                logger.warning(f"STT engine warm-up failed: {e}")
 
-        # For the purpose of this porting plan, we'll assume we need to implement at least one.
-        pass
+        thread = threading.Thread(target=load, name='stt-warm-up', daemon=True)
+        thread.start()
+        return thread
 
     def transcribe(
+        self,
+        audio_stream: Iterator[bytes],
+        on_partial_result: Optional[Callable[[str], None]] = None,
+        on_final_result: Optional[Callable[[str], None]] = None,
+        sample_rate: Optional[int] = None,
+        channels: Optional[int] = None
+    ) -> str:
+        """
+        Transcribe an audio stream with the active engine.
+        :param audio_stream: Iterator of 16-bit PCM chunks.
+        :param sample_rate: Sample rate of audio_stream; if it or channels differ from the
+                            engine's declared format, the stream is resampled/downmixed.
+        :param channels: Channel count of audio_stream.
+
+        When VAD is enabled, leading silence is dropped and the stream ends after the
+        configured hangover of silence, so only the utterance reaches the engine.
+        Audio for cloud engines is packed into coalesceFrameMs frames. With a hedgeBackend
+        configured, both engines transcribe the audio and the first usable final is returned.
+        Partials that repeat the previous hypothesis are dropped and the rest are limited to
+        maxPartialsPerSecond; finals are always delivered.
+        """
+        engine = self.engine or self._initialize_engine()
+
+        if sample_rate or channels:
+            audio_stream = iter(convert_audio_stream(
+                audio_stream,
+                sample_rate or engine.sample_rate,
+                channels or engine.channels,
+                engine.sample_rate,
+                engine.channels
+            ))
+
+        if engine.channels == 1:
+            vad_stage = self._create_vad_stage(engine.sample_rate)
+            if vad_stage:
+                audio_stream = vad_stage.process(audio_stream)
+
+        return self.transcribe_utterance(audio_stream, on_partial_result, on_final_result)
+
+    def transcribe_utterance(
         self,
         audio_stream: Iterator[bytes],
         on_partial_result: Optional[Callable[[str], None]] = None,
         on_final_result: Optional[Callable[[str], None]] = None
     ) -> str:
-        if not self.engine:
-             raise TJBotError("STT engine not initialized.")
+        """
+        Transcribe audio that is already in the engine's format and ends with the utterance
+        (no resampling or endpointing), e.g. one utterance of a ListeningSession.
+        """
+        engine = self.engine or self._initialize_engine()
 
-        return self.engine.transcribe(
-            audio_stream,
+        # Same partial/final behaviour for every backend: no repeated hypotheses, rate-limited partials
+        self.partial_filter = PartialResultFilter(
+            on_partial_result,
+            on_final_result,
+            self.config.maxPartialsPerSecond or 0
+        )
+        on_partial_result = self.partial_filter.on_partial if on_partial_result else None
+        on_final_result = self.partial_filter.on_final if on_final_result else None
+
+        if self.hedger:
+            return self.hedger.transcribe(
+                audio_stream,
+                on_partial_result=on_partial_result,
+                on_final_result=on_final_result,
+                prepare=self._prepare_for_engine
+            )
+
+        return engine.transcribe(
+            self._prepare_for_engine(engine, audio_stream),
             on_partial_result=on_partial_result,
             on_final_result=on_final_result
         )
+
+    def _prepare_for_engine(self, engine: STTEngine, audio_stream: Iterator) -> Iterator:
+        """
+        Last per-engine steps: convert to a hedge engine's format if it differs from the
+        primary's, and pack audio into larger frames for cloud engines.
+        """
+        primary = self.engine or engine
+        if engine is not primary and (engine.sample_rate, engine.channels) != (primary.sample_rate, primary.channels):
+            audio_stream = iter(convert_audio_stream(
+                audio_stream, primary.sample_rate, primary.channels, engine.sample_rate, engine.channels
+            ))
+
+        frame_ms = self.config.coalesceFrameMs or 0
+        if engine.coalesce_frames and frame_ms > 0:
+            coalescer = self.coalescers.get(engine)
+            if coalescer is None:
+                coalescer = self.coalescers[engine] = FrameCoalescer(
+                    engine.sample_rate,
+                    engine.channels,
+                    frame_ms,
+                    self.config.coalesceMaxLatencyMs
+                )
+            audio_stream = coalescer.process(audio_stream)
+        return audio_stream
@@ -0,0 +1,163 @@
+import logging
+import os
+import tempfile
+from collections import deque
+from typing import Deque, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import sherpa_onnx
+except ImportError:
+    sherpa_onnx = None
+
+from ..audio import convert_audio_stream
+from ..config.models import WakeWordConfig
+from ..error import TJBotError
+
+logger = logging.getLogger(__name__)
+
+# Bytes per sample for 16-bit signed little-endian PCM
+SAMPLE_WIDTH = 2
+
+
+class WakeWordDetector:
+    """
+    On-device keyword spotter (sherpa-onnx KeywordSpotter) that gates full speech recognition.
+
+    wait() reads the audio stream only until a keyword fires. The spotter reports a keyword a
+    little after it was spoken, so the most recent input is kept in 'preroll'; chain it in front
+    of the same stream before handing it to recognition so the request after the keyword is not clipped.
+    """
+    sample_rate = 16000
+
+    def __init__(self, config: WakeWordConfig):
+        self.config = config
+        self.spotter = None
+        # Input chunks read just before the keyword fired (see wait())
+        self.preroll: List[bytes] = []
+
+        # Float32 conversion buffer reused across chunks
+        self._samples = np.empty(0, dtype=np.float32) if np is not None else None
+        self._initialize()
+
+    def _initialize(self):
+        if sherpa_onnx is None:
+            raise TJBotError("sherpa-onnx library not installed. Please install it.")
+        if np is None:
+            raise TJBotError("numpy is not installed")
+
+        # Imported here so the STT backends stay lazily loaded
+        from .backends.sherpa_onnx_stt import _find_model_file, _resolve_model_dir
+
+        model_dir = _resolve_model_dir(self.config.model)
+        if not model_dir:
+            raise TJBotError(f"wake word model '{self.config.model}' not found. Download it to ~/.tjbot/models/ or set 'model' to its directory.")
+        keywords = self.config.keywords
+        if not keywords:
+            raise TJBotError("wake word detection is enabled but no keywords are configured")
+
+        tokens = _find_model_file(model_dir, 'tokens', '.txt')
+        encoder = _find_model_file(model_dir, 'encoder')
+        decoder = _find_model_file(model_dir, 'decoder')
+        joiner = _find_model_file(model_dir, 'joiner')
+        if not tokens or not encoder or not decoder or not joiner:
+            raise TJBotError(f"wake word model requires tokens, encoder, decoder and joiner files in {model_dir}")
+
+        keywords_file = self._write_keywords(model_dir, tokens, keywords)
+        try:
+            self.spotter = sherpa_onnx.KeywordSpotter(
+                tokens=tokens,
+                encoder=encoder,
+                decoder=decoder,
+                joiner=joiner,
+                keywords_file=keywords_file,
+                keywords_score=self.config.boost or 1.0,
+                keywords_threshold=self.config.threshold or 0.25,
+                sample_rate=self.sample_rate,
+                num_threads=1,
+            )
+            logger.info(f"wake word detector initialized: {', '.join(keywords)}")
+        except Exception as e:
+            raise TJBotError(f"Failed to initialize wake word detector: {e}")
+        finally:
+            os.remove(keywords_file)
+
+    def _write_keywords(self, model_dir: str, tokens: str, keywords: List[str]) -> str:
+        # The spotter expects keywords as model tokens, e.g. "▁HE Y ▁T J ▁BO T @HEY_TJBOT"
+        bpe_model = os.path.join(model_dir, 'bpe.model')
+        phrases = [k.strip().upper() for k in keywords]
+        encoded = sherpa_onnx.text2token(
+            phrases,
+            tokens=tokens,
+            tokens_type='bpe' if os.path.isfile(bpe_model) else 'cjkchar',
+            bpe_model=bpe_model if os.path.isfile(bpe_model) else None,
+        )
+
+        fd, path = tempfile.mkstemp(suffix='.txt', prefix='tjbot-keywords-')
+        with os.fdopen(fd, 'w') as f:
+            for phrase, pieces in zip(keywords, encoded):
+                f.write(f"{' '.join(pieces)} @{phrase.strip().replace(' ', '_')}\n")
+        return path
+
+    def _to_float(self, chunk) -> 'np.ndarray':
+        pcm = np.frombuffer(chunk, dtype='<i2', count=len(chunk) // SAMPLE_WIDTH)
+        if len(self._samples) < len(pcm):
+            self._samples = np.empty(len(pcm), dtype=np.float32)
+        samples = self._samples[:len(pcm)]
+        np.multiply(pcm, 1.0 / 32768.0, out=samples, casting='unsafe')
+        return samples
+
+    def wait(self, audio_stream: Iterable, sample_rate: Optional[int] = None, channels: Optional[int] = None,
+             preroll_ms: int = 500) -> Optional[str]:
+        """
+        Consume audio until a keyword is spotted.
+        :param audio_stream: Iterator of 16-bit PCM chunks. Pass itertools.chain(detector.preroll, audio_stream)
+                             to STT afterwards to continue from just before the keyword fired.
+        :param sample_rate: Sample rate of audio_stream (converted to 16 kHz mono for the spotter).
+        :param channels: Channel count of audio_stream.
+        :param preroll_ms: Milliseconds of the most recent input to keep in 'preroll'. This covers the
+                           spotter's decoding lag and the audio still buffered in the resampler.
+        :return: The keyword that fired, or None if the stream ended first.
+        """
+        if not self.spotter:
+            raise TJBotError("wake word detector not initialized.")
+
+        spotter = self.spotter
+        stream = spotter.create_stream()
+        input_rate = sample_rate or self.sample_rate
+        input_channels = channels or 1
+        preroll_bytes = input_rate * input_channels * SAMPLE_WIDTH * max(preroll_ms, 0) // 1000
+        preroll: Deque[bytes] = deque()
+        kept = 0
+
+        def remember(chunks: Iterable) -> Iterable:
+            # Keep the newest raw input so it can be replayed to STT once the keyword fires
+            nonlocal kept
+            for chunk in chunks:
+                if preroll_bytes:
+                    # Copy, since microphone chunks may be views of a reused buffer
+                    data = bytes(chunk)
+                    preroll.append(data)
+                    kept += len(data)
+                    while kept - len(preroll[0]) >= preroll_bytes:
+                        kept -= len(preroll.popleft())
+                yield chunk
+
+        self.preroll = []
+        audio = convert_audio_stream(
+            remember(audio_stream), input_rate, input_channels, self.sample_rate, 1
+        )
+        for chunk in audio:
+            stream.accept_waveform(self.sample_rate, self._to_float(chunk))
+            while spotter.is_ready(stream):
+                spotter.decode_stream(stream)
+                keyword = spotter.get_result(stream)
+                if keyword:
+                    logger.info(f"wake word detected: {keyword}")
+                    self.preroll = list(preroll)
+                    return keyword.replace('_', ' ').lower()
+        return None
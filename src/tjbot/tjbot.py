@@ -236,6 +236,7 @@ class TJBot:
         Listen for speech.
         :param callback: If provided, streaming mode is assumed (partial/final results via callback).
                          If None, blocking single-shot mode is assumed.
+        With [listen.wakeWord] enabled, recognition starts only after a keyword is heard.
         """
         self._assert_capability(Capability.LISTEN)
 
@@ -251,6 +252,17 @@ class TJBot:
              # Single shot
              return self.rpi_driver.listen_for_transcript()
 
+    def listen_continuously(self, backlog: int = 8):
+        """
+        Listen for speech continuously.
+        Returns a session to iterate over; it yields (text, start_ts, end_ts) for each utterance.
+        The microphone and STT engine stay open between utterances. Call close() on the
+        session (or use it in a `with` block) to stop listening.
+        :param backlog: Maximum number of utterances kept while the caller is busy; older ones are dropped.
+        """
+        self._assert_capability(Capability.LISTEN)
+        return self.rpi_driver.listen_continuously(backlog)
+
     # --- LOOK ---
     def look(self, file_path: Optional[str] = None) -> str:
         self._assert_capability(Capability.LOOK)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import select
+import pytest
+import unittest.mock as mock
+from tjbot.microphone import MicrophoneController
+
+
+class FakeNonblockPCM:
+    """Stands in for a non-blocking alsaaudio.PCM whose poll descriptor is a pipe."""
+    def __init__(self, *args, **kwargs):
+        self.read_fd, self.write_fd = os.pipe()
+        self.pending = []
+
+    def setchannels(self, channels):
+        pass
+
+    def setrate(self, rate):
+        pass
+
+    def setformat(self, fmt):
+        pass
+
+    def setperiodsize(self, size):
+        pass
+
+    def polldescriptors(self):
+        return [(self.read_fd, select.POLLIN)]
+
+    def push(self, data):
+        self.pending.append(data)
+        os.write(self.write_fd, b'x')
+
+    def read(self):
+        if not self.pending:
+            return 0, b''
+        os.read(self.read_fd, 1)
+        data = self.pending.pop(0)
+        return len(data) // 2, data
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+@pytest.fixture
+def fake_alsa():
+    fake = mock.MagicMock()
+    fake.PCM = FakeNonblockPCM
+    with mock.patch('tjbot.microphone.async_stream.alsaaudio', fake):
+        yield fake
+
+
+def test_async_iteration_waits_on_poll_descriptor(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+
+    async def main():
+        received = []
+        async with mic.stream_async() as stream:
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, stream.pcm.push, b'\x01\x00')
+            loop.call_later(0.02, stream.pcm.push, b'\x02\x00')
+            async for chunk in stream:
+                received.append(chunk)
+                if len(received) == 2:
+                    break
+        return received
+
+    assert asyncio.run(main()) == [b'\x01\x00', b'\x02\x00']
+
+
+def test_async_stream_drops_audio_while_paused(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+
+    async def main():
+        async with mic.stream_async() as stream:
+            mic.pause()
+            stream.pcm.push(b'\x01\x00')
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, mic.resume)
+            loop.call_later(0.02, stream.pcm.push, b'\x02\x00')
+            return await stream.read()
+
+    assert asyncio.run(main()) == b'\x02\x00'
+
+
+def test_blocking_adapter(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    stream = mic.stream_async()
+
+    chunks = stream.generator()
+    with mock.patch.object(FakeNonblockPCM, 'read', side_effect=[(1, b'\x03\x00')]):
+        assert next(chunks) == b'\x03\x00'
+    chunks.close()
+    assert stream.closed
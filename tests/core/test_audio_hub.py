@@ -0,0 +1,113 @@
+import threading
+import pytest
+from tjbot.error import TJBotError
+from tjbot.microphone.hub import AudioHub
+
+def test_all_subscribers_see_every_chunk():
+    hub = AudioHub(slot_size=2, capacity=4)
+    a = hub.subscribe()
+    b = hub.subscribe()
+    hub.write(b'aa')
+    hub.write(b'bb')
+
+    assert bytes(a.read()) == b'aa'
+    assert bytes(a.read()) == b'bb'
+    assert bytes(b.read()) == b'aa'
+    assert bytes(b.read()) == b'bb'
+
+def test_subscribers_share_storage():
+    hub = AudioHub(slot_size=2, capacity=4)
+    a = hub.subscribe()
+    b = hub.subscribe()
+    hub.write(b'aa')
+
+    assert a.read().obj is b.read().obj
+
+def test_subscriber_starts_at_next_chunk():
+    hub = AudioHub(slot_size=2, capacity=4)
+    hub.write(b'aa')
+    sub = hub.subscribe()
+    hub.write(b'bb')
+    assert bytes(sub.read()) == b'bb'
+
+def test_lossy_subscriber_skips_to_newest():
+    hub = AudioHub(slot_size=1, capacity=2)
+    sub = hub.subscribe('lossy')
+    for c in (b'a', b'b', b'c', b'd'):
+        hub.write(c)
+
+    assert bytes(sub.read()) == b'd'
+    assert sub.lagged == 3
+
+def test_lossy_chunk_survives_slot_reuse():
+    hub = AudioHub(slot_size=1, capacity=2)
+    sub = hub.subscribe('lossy')
+    hub.write(b'a')
+    chunk = sub.read()
+    for c in (b'b', b'c', b'd', b'e'):
+        hub.write(c)
+
+    assert bytes(chunk) == b'a'
+
+def test_lossless_subscriber_holds_writer_back():
+    hub = AudioHub(slot_size=1, capacity=2)
+    sub = hub.subscribe('lossless')
+    hub.write(b'a')
+    hub.write(b'b')
+
+    writer = threading.Thread(target=hub.write, args=(b'c',))
+    writer.start()
+    writer.join(timeout=0.1)
+    assert writer.is_alive()
+
+    assert bytes(sub.read()) == b'a'
+    writer.join(timeout=1.0)
+    assert not writer.is_alive()
+    assert bytes(sub.read()) == b'b'
+    assert bytes(sub.read()) == b'c'
+
+def test_unsubscribe_releases_writer():
+    hub = AudioHub(slot_size=1, capacity=1)
+    sub = hub.subscribe('lossless')
+    hub.write(b'a')
+
+    writer = threading.Thread(target=hub.write, args=(b'b',))
+    writer.start()
+    sub.close()
+    writer.join(timeout=1.0)
+    assert not writer.is_alive()
+
+def test_close_ends_generators():
+    hub = AudioHub(slot_size=1, capacity=4)
+    sub = hub.subscribe()
+    hub.write(b'a')
+    hub.close()
+
+    assert [bytes(c) for c in sub] == [b'a']
+    assert hub.subscriber_count == 0
+
+def test_invalid_lag_policy():
+    hub = AudioHub(slot_size=1, capacity=1)
+    with pytest.raises(TJBotError):
+        hub.subscribe('sometimes')
+
+def test_chunks_carry_capture_timestamps():
+    hub = AudioHub(slot_size=1, capacity=4)
+    sub = hub.subscribe()
+    hub.write(b'a', timestamp=12.5)
+    sub.read()
+    assert sub.timestamp == 12.5
+
+def test_stats_snapshot():
+    hub = AudioHub(slot_size=1, capacity=4)
+    sub = hub.subscribe()
+    hub.write(b'a')
+    hub.write(b'b')
+    sub.read()
+    sub.read()
+
+    stats = hub.stats()
+    assert stats['chunks_published'] == 2
+    assert stats['subscribers'] == 1
+    assert stats['high_water'] == 2
+    assert stats['chunk_latency_ms']['count'] == 2
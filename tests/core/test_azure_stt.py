@@ -0,0 +1,151 @@
+import threading
+import types
+import pytest
+from tjbot.error import TJBotError
+from tjbot.stt.backends import azure_stt
+from tjbot.stt.backends.azure_stt import AzureSTTEngine
+
+class Signal:
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+
+    def fire(self, evt):
+        for handler in self.handlers:
+            handler(evt)
+
+class FakePushStream:
+    def __init__(self, stream_format=None):
+        self.data = b''
+        self.closed = threading.Event()
+
+    def write(self, data):
+        self.thread = threading.current_thread()
+        self.data += data
+
+    def close(self):
+        self.closed.set()
+
+class FakeRecognizer:
+    created = []
+
+    def __init__(self, speech_config=None, audio_config=None):
+        self.push_stream = audio_config.stream_input
+        self.recognized = Signal()
+        self.recognizing = Signal()
+        self.canceled = Signal()
+        self.session_stopped = Signal()
+        FakeRecognizer.created.append(self)
+
+    def start_continuous_recognition(self):
+        def run():
+            self.push_stream.closed.wait()
+            result = types.SimpleNamespace(reason='recognizing', text='hel')
+            self.recognizing.fire(types.SimpleNamespace(result=result))
+            result = types.SimpleNamespace(reason='recognized', text=f"{len(self.push_stream.data)} bytes")
+            self.recognized.fire(types.SimpleNamespace(result=result))
+            self.session_stopped.fire(None)
+        threading.Thread(target=run).start()
+
+    def stop_continuous_recognition(self):
+        pass
+
+class FakeConnection:
+    opened = 0
+
+    @classmethod
+    def from_recognizer(cls, recognizer):
+        return cls()
+
+    def open(self, for_continuous_recognition):
+        FakeConnection.opened += 1
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def fake_sdk(monkeypatch):
+    sdk = types.SimpleNamespace(
+        SpeechConfig=lambda subscription, region: types.SimpleNamespace(),
+        SpeechRecognizer=FakeRecognizer,
+        Connection=FakeConnection,
+        ResultReason=types.SimpleNamespace(RecognizedSpeech='recognized', RecognizingSpeech='recognizing'),
+        CancellationReason=types.SimpleNamespace(Error='error'),
+        audio=types.SimpleNamespace(
+            AudioStreamFormat=lambda **kwargs: None,
+            PushAudioInputStream=FakePushStream,
+            AudioConfig=lambda stream_input: types.SimpleNamespace(stream_input=stream_input),
+        ),
+    )
+    monkeypatch.setattr(azure_stt, 'speechsdk', sdk)
+    monkeypatch.setenv('AZURE_SPEECH_KEY', 'key')
+    monkeypatch.setenv('AZURE_SPEECH_REGION', 'region')
+    FakeRecognizer.created = []
+    FakeConnection.opened = 0
+
+def test_connection_is_opened_before_transcribe(fake_sdk):
+    engine = AzureSTTEngine()
+    engine._next_session.result(timeout=1.0)
+    assert FakeConnection.opened == 1
+
+def test_rearms_after_each_utterance(fake_sdk):
+    engine = AzureSTTEngine()
+    partials = []
+
+    assert engine.transcribe(iter([b'ab', b'cd']), on_partial_result=partials.append) == '4 bytes'
+    assert engine.transcribe(iter([b'ab'])) == '2 bytes'
+    engine._next_session.result(timeout=1.0)
+
+    # One recognizer per utterance, plus the one waiting for the next
+    assert len(FakeRecognizer.created) == 3
+    assert partials == ['hel']
+    stats = engine.stats()
+    assert stats['connect_ms']['count'] == 3
+    assert stats['first_partial_ms']['count'] == 2
+
+def test_pusher_threads_are_reused(fake_sdk):
+    engine = AzureSTTEngine()
+    engine.transcribe(iter([b'ab']))
+    engine.transcribe(iter([b'cd']))
+
+    first, second = FakeRecognizer.created[:2]
+    assert first.push_stream.thread is second.push_stream.thread
+    assert first.push_stream.thread.name.startswith('azure-stt-push')
+
+def test_concurrent_utterances_do_not_wait_for_each_other(fake_sdk):
+    engine = AzureSTTEngine()
+    release = threading.Event()
+
+    def held_audio():
+        yield b'ab'
+        release.wait(2.0)
+
+    # Two utterances still streaming audio
+    held = [threading.Thread(target=engine.transcribe, args=(held_audio(),)) for _ in range(2)]
+    for thread in held:
+        thread.start()
+
+    # A third one is pushed and finalized meanwhile
+    results = []
+    other = threading.Thread(target=lambda: results.append(engine.transcribe(iter([b'cd']))))
+    other.start()
+    other.join(1.0)
+    assert results == ['2 bytes']
+
+    release.set()
+    for thread in held:
+        thread.join(1.0)
+
+def test_audio_errors_raise_tjbot_error(fake_sdk):
+    engine = AzureSTTEngine()
+    errors = []
+
+    def broken_audio():
+        yield b'ab'
+        raise OSError('microphone unplugged')
+
+    with pytest.raises(TJBotError):
+        engine.transcribe(broken_audio(), on_error=errors.append)
+    assert isinstance(errors[0], OSError)
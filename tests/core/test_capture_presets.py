@@ -0,0 +1,41 @@
+import pytest
+import unittest.mock as mock
+from tjbot.error import TJBotError
+from tjbot.microphone import resolve_capture_settings
+from tjbot.microphone.presets import board_family
+from tjbot.microphone.microphone import _s32_to_s16
+
+def test_balanced_matches_previous_default():
+    settings = resolve_capture_settings(44100, 'balanced', board='pi4')
+    assert settings.period_size == 1024
+    assert settings.period_count == 4
+    assert settings.sample_format == 'S16_LE'
+
+def test_presets_are_ordered_by_period_size():
+    sizes = [resolve_capture_settings(44100, p, board='pi3').period_size
+             for p in ('low-latency', 'balanced', 'low-cpu')]
+    assert sizes == sorted(sizes)
+    assert len(set(sizes)) == 3
+
+def test_slower_boards_get_longer_low_latency_periods():
+    pi3 = resolve_capture_settings(16000, 'low-latency', board='pi3')
+    pi5 = resolve_capture_settings(16000, 'low-latency', board='pi5')
+    assert pi3.period_size > pi5.period_size
+
+def test_explicit_values_override_preset():
+    settings = resolve_capture_settings(16000, 'low-cpu', period_size=300, period_count=8, sample_format='S32_LE')
+    assert settings == (300, 8, 'S32_LE')
+
+def test_invalid_preset_and_format():
+    with pytest.raises(TJBotError):
+        resolve_capture_settings(16000, 'fastest')
+    with pytest.raises(TJBotError):
+        resolve_capture_settings(16000, sample_format='FLOAT_LE')
+
+def test_board_family_detection():
+    with mock.patch("builtins.open", mock.mock_open(read_data="Raspberry Pi 3 Model B+\0")):
+        assert board_family() == 'pi3'
+
+def test_s32_to_s16_keeps_high_bits():
+    samples = (0x12345678).to_bytes(4, 'little', signed=True) + (-0x10000).to_bytes(4, 'little', signed=True)
+    assert _s32_to_s16(samples) == (0x1234).to_bytes(2, 'little') + (-1).to_bytes(2, 'little', signed=True)
@@ -0,0 +1,19 @@
+from tjbot.microphone import LatencyHistogram
+
+def test_histogram_percentiles():
+    hist = LatencyHistogram(buckets_ms=(1, 10, 100))
+    for value in (0.5, 0.5, 5, 50, 500):
+        hist.record(value)
+
+    snapshot = hist.snapshot()
+    assert snapshot['count'] == 5
+    assert snapshot['max'] == 500
+    assert snapshot['p50'] == 10
+    assert snapshot['p99'] == 500
+    assert snapshot['buckets'] == {'le_1': 2, 'le_10': 1, 'le_100': 1, 'le_inf': 1}
+
+def test_empty_histogram():
+    snapshot = LatencyHistogram().snapshot()
+    assert snapshot['count'] == 0
+    assert snapshot['mean'] == 0.0
+    assert snapshot['p90'] == 0.0
@@ -0,0 +1,67 @@
+import time
+from tjbot.audio import FrameCoalescer
+from tjbot.config.models import ListenConfig
+from tjbot.stt import STTController, STTEngine
+
+def test_packs_chunks_into_frames():
+    coalescer = FrameCoalescer(16000, frame_ms=100, max_latency_ms=10000)
+    chunks = [bytes(1000)] * 10
+
+    frames = list(coalescer.process(chunks))
+
+    assert [len(f) for f in frames] == [3200, 3200, 3200, 400]
+    stats = coalescer.stats()
+    assert stats['chunks_in'] == 10
+    assert stats['messages'] == 4
+    assert stats['bytes_sent'] == 10000
+
+def test_flushes_after_max_latency():
+    coalescer = FrameCoalescer(16000, frame_ms=100, max_latency_ms=20)
+
+    def slow_chunks():
+        for _ in range(3):
+            yield bytes(100)
+            time.sleep(0.03)
+
+    # Buffered audio goes out with the first chunk that arrives after it became too old
+    frames = list(coalescer.process(slow_chunks()))
+    assert [len(f) for f in frames] == [200, 100]
+    assert coalescer.latency_flushes == 1
+
+class CloudEngine(STTEngine):
+    coalesce_frames = True
+
+    def __init__(self):
+        super().__init__({})
+        self.messages = []
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        self.messages = [len(m) for m in audio_stream]
+        return ''
+
+def test_controller_coalesces_for_cloud_engines():
+    config = ListenConfig.model_validate({'backend': {'local': {'vad': {'enabled': False}}}})
+    controller = STTController(config)
+    controller.engine = CloudEngine()
+
+    controller.transcribe(iter([bytes(320)] * 25))
+
+    assert controller.engine.messages == [3200, 3200, 1600]
+    assert controller.coalescer.stats()['messages'] == 3
+
+class PCM8kEngine(CloudEngine):
+    sample_rate = 8000
+
+def test_hedge_engines_get_their_own_coalescer():
+    config = ListenConfig.model_validate({'backend': {'local': {'vad': {'enabled': False}}}})
+    controller = STTController(config)
+    primary, secondary = CloudEngine(), PCM8kEngine()
+    controller.engine = primary
+
+    list(controller._prepare_for_engine(primary, iter([bytes(320)] * 25)))
+    list(controller._prepare_for_engine(secondary, iter([bytes(160)] * 25)))
+
+    # 100 ms frames in each engine's own format
+    assert controller.coalescers[primary].frame_bytes == 3200
+    assert controller.coalescers[secondary].frame_bytes == 1600
+    assert controller.coalescer is controller.coalescers[primary]
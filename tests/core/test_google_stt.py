@@ -0,0 +1,114 @@
+import datetime
+import types
+import pytest
+from tjbot.config.models import STTBackendGoogleCloudConfig
+from tjbot.stt.backends import google_stt
+from tjbot.stt.backends.google_stt import GoogleCloudSTTEngine, _drop_seam_overlap
+
+# 100 ms chunks at 16 kHz mono; a chunk filled with byte n is the word "wn", zeros are a pause
+CHUNK = 3200
+BYTE_RATE = 32000
+
+def _response(text, is_final, end_bytes=None):
+    result = types.SimpleNamespace(
+        alternatives=[types.SimpleNamespace(transcript=text)],
+        is_final=is_final,
+        result_end_time=datetime.timedelta(seconds=end_bytes / BYTE_RATE) if end_bytes is not None else None
+    )
+    return types.SimpleNamespace(results=[result])
+
+class FakeClient:
+    def __init__(self):
+        self.streams = []
+
+    def streaming_recognize(self, config, requests):
+        """
+        Plays the service: a partial per word, a final at each pause, and a final for pending
+        words when the request stream is half-closed.
+        Like the SDK helper, takes the config separately and audio-only requests.
+        """
+        assert config is not None
+        audio = []
+        self.streams.append(audio)
+        words, received = [], 0
+        for request in requests:
+            assert request.streaming_config is None
+            audio.append(request.audio_content)
+            for i in range(0, len(request.audio_content), CHUNK):
+                value = request.audio_content[i]
+                received += CHUNK
+                if value:
+                    words.append(f"w{value}")
+                    yield _response(' '.join(words), False)
+                elif words:
+                    yield _response(' '.join(words), True, received)
+                    words = []
+        if words:
+            yield _response(' '.join(words), True, received)
+
+@pytest.fixture
+def fake_speech(monkeypatch):
+    created = []
+
+    class RecognitionConfig(types.SimpleNamespace):
+        AudioEncoding = types.SimpleNamespace(LINEAR16='LINEAR16')
+
+    def client():
+        created.append(FakeClient())
+        return created[-1]
+
+    module = types.SimpleNamespace(
+        SpeechClient=client,
+        RecognitionConfig=RecognitionConfig,
+        StreamingRecognitionConfig=types.SimpleNamespace,
+        StreamingRecognizeRequest=lambda streaming_config=None, audio_content=None: types.SimpleNamespace(
+            streaming_config=streaming_config, audio_content=audio_content
+        ),
+    )
+    monkeypatch.setattr(google_stt, 'speech', module)
+    monkeypatch.setattr(google_stt, '_client', None)
+    return created
+
+def _audio(values):
+    return [bytes([v]) * CHUNK for v in values]
+
+def test_long_stream_rolls_over_without_losing_words(fake_speech):
+    engine = GoogleCloudSTTEngine(STTBackendGoogleCloudConfig(streamLimitSeconds=1))
+    finals = []
+
+    transcript = engine.transcribe(_audio([1, 2, 0, 3, 4, 5, 6, 7, 8, 9, 10, 0, 11, 0]), on_final_result=finals.append)
+
+    # w3..w9 were pending at the first limit: the new stream hears them again from the replay
+    assert finals == ['w1 w2', 'w3 w4 w5 w6 w7 w8 w9 w10', 'w11']
+    assert transcript == 'w1 w2w3 w4 w5 w6 w7 w8 w9 w10w11'
+    assert engine.rollovers == 2
+    streams = fake_speech[0].streams
+    assert len(streams) == 3
+    # The replay starts right after the last final result
+    assert streams[1][0][0] == 3
+    assert streams[2][0][0] == 11
+
+def test_rollover_disabled_keeps_one_stream(fake_speech):
+    engine = GoogleCloudSTTEngine(STTBackendGoogleCloudConfig(streamLimitSeconds=0))
+    assert engine.transcribe(_audio([1, 2] * 10)) == ' '.join(['w1 w2'] * 10)
+    assert len(fake_speech[0].streams) == 1
+
+def test_client_is_shared_by_engines(fake_speech):
+    first = GoogleCloudSTTEngine()
+    second = GoogleCloudSTTEngine(STTBackendGoogleCloudConfig(languageCode='de-DE'))
+    assert first.client is second.client
+    assert len(fake_speech) == 1
+
+def test_drop_seam_overlap():
+    assert _drop_seam_overlap('turn on the light', 'Light please') == 'please'
+    assert _drop_seam_overlap('turn on the', 'the light') == 'light'
+    assert _drop_seam_overlap('hello', 'world') == 'world'
+    assert _drop_seam_overlap('hello there', ' there') == ''
+
+def test_stream_without_finals_still_advances(fake_speech):
+    engine = GoogleCloudSTTEngine(STTBackendGoogleCloudConfig(streamLimitSeconds=1))
+    finals = []
+
+    # 2 s of speech with no pause can never be finalized within a 1 s stream
+    engine.transcribe(_audio(list(range(1, 21)) + [0]), on_final_result=finals.append)
+    assert finals[-1].endswith('w20')
@@ -0,0 +1,132 @@
+import time
+import pytest
+from tjbot.error import TJBotError
+from tjbot.stt import STTEngine
+from tjbot.stt import hedge
+from tjbot.stt.hedge import AudioTee, HedgedTranscriber
+
+class DelayedEngine(STTEngine):
+    def __init__(self, text, delay):
+        super().__init__({})
+        self.text = text
+        self.delay = delay
+        self.chunks = None
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        self.chunks = list(audio_stream)
+        if on_partial_result:
+            on_partial_result(self.text[:1])
+        time.sleep(self.delay)
+        if isinstance(self.text, Exception):
+            raise self.text
+        return self.text
+
+CHUNKS = [b'aa', b'bb', b'cc']
+
+def test_tee_shares_chunks():
+    tee = AudioTee(iter([memoryview(b'ab'), b'cd']), 2)
+    tee.start()
+    a = list(tee.branch(0))
+    b = list(tee.branch(1))
+    assert a == [b'ab', b'cd']
+    assert all(x is y for x, y in zip(a, b))
+
+def test_fast_primary_wins():
+    hedger = HedgedTranscriber(DelayedEngine('primary', 0.0), DelayedEngine('secondary', 0.5))
+    partials = []
+    assert hedger.transcribe(iter(CHUNKS), on_partial_result=partials.append) == 'primary'
+    assert hedger.stats()['wins'] == {'primary': 1, 'secondary': 0}
+    assert partials == ['p']
+
+def test_primary_within_grace_wins():
+    hedger = HedgedTranscriber(DelayedEngine('primary', 0.1), DelayedEngine('secondary', 0.0), grace_ms=500)
+    assert hedger.transcribe(iter(CHUNKS)) == 'primary'
+
+def test_slow_primary_loses():
+    primary = DelayedEngine('primary', 1.0)
+    secondary = DelayedEngine('secondary', 0.0)
+    hedger = HedgedTranscriber(primary, secondary, grace_ms=50)
+
+    start = time.monotonic()
+    assert hedger.transcribe(iter(CHUNKS)) == 'secondary'
+    assert time.monotonic() - start < 0.5
+    assert hedger.last_winner == 'secondary'
+    assert secondary.chunks == CHUNKS
+    assert hedger.stats()['latency_ms']['primary']['count'] == 0
+
+def test_failed_primary_falls_back():
+    hedger = HedgedTranscriber(DelayedEngine(RuntimeError('offline'), 0.0), DelayedEngine('secondary', 0.1))
+    assert hedger.transcribe(iter(CHUNKS)) == 'secondary'
+
+def test_both_failing_raises():
+    hedger = HedgedTranscriber(DelayedEngine(RuntimeError('a'), 0.0), DelayedEngine(RuntimeError('b'), 0.0))
+    with pytest.raises(TJBotError):
+        hedger.transcribe(iter(CHUNKS))
+
+class LatePartialEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        list(audio_stream)
+        time.sleep(0.2)
+        on_partial_result('late')
+        return 'primary'
+
+class FirstChunkEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        next(iter(audio_stream))
+        return 'primary'
+
+def test_loser_partials_are_dropped_after_return():
+    hedger = HedgedTranscriber(LatePartialEngine(), DelayedEngine('secondary', 0.0), grace_ms=0)
+    partials = []
+    assert hedger.transcribe(iter(CHUNKS), on_partial_result=partials.append) == 'secondary'
+    time.sleep(0.4)
+    assert partials == []
+
+def test_decided_winner_stops_the_audio():
+    reads = []
+
+    def endless():
+        while True:
+            reads.append(1)
+            time.sleep(0.001)
+            yield b'aa'
+
+    # The secondary reads until its audio is cut off
+    hedger = HedgedTranscriber(FirstChunkEngine(), DelayedEngine('secondary', 0.0))
+    assert hedger.transcribe(endless()) == 'primary'
+    time.sleep(0.05)
+    count = len(reads)
+    time.sleep(0.1)
+    assert len(reads) == count
+
+def test_tee_queues_are_bounded(monkeypatch):
+    monkeypatch.setattr(hedge, 'TEE_QUEUE_CHUNKS', 3)
+    reads = []
+
+    def source():
+        for i in range(20):
+            reads.append(i)
+            yield b'aa'
+
+    tee = AudioTee(source(), 2)
+    tee.start()
+    time.sleep(0.1)
+    # Nobody reads: the tee holds at most one chunk beyond the full queues
+    assert len(reads) == 4
+    tee.cancel(0)
+    tee.cancel(1)
+
+def test_audio_errors_are_raised():
+    def broken():
+        yield b'aa'
+        raise OSError('microphone unplugged')
+
+    hedger = HedgedTranscriber(DelayedEngine('primary', 0.0), DelayedEngine('secondary', 0.0))
+    with pytest.raises(TJBotError):
+        hedger.transcribe(broken())
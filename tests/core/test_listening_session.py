@@ -0,0 +1,113 @@
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.config.models import ListenConfig
+from tjbot.error import TJBotError
+from tjbot.microphone import ReplayAudioSource
+from tjbot.stt import ListeningSession, STTController, STTEngine
+from tjbot.stt.hedge import HedgedTranscriber
+
+RATE = 16000
+
+def _tone(ms):
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (np.sin(2 * np.pi * 300 * t) * 8000).astype(np.int16).tobytes()
+
+def _silence(ms):
+    return bytes(RATE * ms // 1000 * 2)
+
+class LengthEngine(STTEngine):
+    """Transcribes each utterance as its length in tenths of a second."""
+    def __init__(self):
+        super().__init__({})
+        self.calls = 0
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        self.calls += 1
+        return str(sum(len(c) for c in audio_stream) // 3200)
+
+def _controller(vad=True):
+    config = ListenConfig.model_validate({'backend': {'local': {'vad': {'enabled': vad, 'hangoverMs': 300, 'paddingMs': 0}}}})
+    controller = STTController(config)
+    controller.engine = LengthEngine()
+    return controller
+
+def test_yields_one_record_per_utterance():
+    audio = _silence(300) + _tone(600) + _silence(600) + _tone(900) + _silence(600)
+    source = ReplayAudioSource(audio, rate=RATE, realtime=False)
+
+    with ListeningSession(_controller(), source.generator(), RATE, 1, clock=source).start() as session:
+        utterances = list(session.utterances(timeout=5.0))
+
+    # Speech plus the 300 ms hangover
+    assert [u.text for u in utterances] == ['9', '12']
+    assert all(u.start_ts <= u.end_ts for u in utterances)
+    assert utterances[0].end_ts <= utterances[1].start_ts
+
+def test_backlog_drops_oldest():
+    audio = (_tone(300) + _silence(600)) * 4
+    session = ListeningSession(_controller(), iter([audio]), RATE, 1, backlog=2).start()
+    session._thread.join(timeout=5.0)
+
+    assert len(list(session.utterances(timeout=1.0))) == 2
+    assert session.dropped == 2
+
+def test_requires_vad():
+    session = ListeningSession(_controller(vad=False), iter([_tone(300)]), RATE, 1).start()
+    with pytest.raises(TJBotError):
+        list(session.utterances(timeout=5.0))
+
+def test_close_stops_session():
+    closed = []
+
+    def endless():
+        while True:
+            yield _silence(30)
+
+    session = ListeningSession(_controller(), endless(), RATE, 1, on_close=lambda: closed.append(True)).start()
+    session.close()
+
+    assert closed == [True]
+    assert not session._thread.is_alive()
+    assert list(session.utterances(timeout=1.0)) == []
+
+class FirstChunkEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        next(iter(audio_stream))
+        return 'hi'
+
+class SlowEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        for _ in audio_stream:
+            time.sleep(0.01)
+        return 'slow'
+
+def test_hedged_engine_returning_early_keeps_the_session_going():
+    audio = (_tone(300) + _silence(600)) * 20
+
+    def paced():
+        # The tee is usually waiting for the next chunk when the primary returns
+        for i in range(0, len(audio), 640):
+            time.sleep(0.001)
+            yield audio[i:i + 640]
+
+    controller = _controller()
+    controller.engine = FirstChunkEngine()
+    controller.hedger = HedgedTranscriber(controller.engine, SlowEngine(), grace_ms=0)
+
+    session = ListeningSession(controller, paced(), RATE, 1, backlog=100).start()
+    session._thread.join(timeout=20.0)
+
+    # Every utterance reaches the engines; the session ends with the audio, not with an error
+    assert not session._thread.is_alive()
+    utterances = list(session.utterances(timeout=1.0))
+    assert len(utterances) >= 20
+    assert {u.text for u in utterances} == {'hi'}
@@ -0,0 +1,149 @@
+import time
+import pytest
+import unittest.mock as mock
+from tjbot.microphone import MicrophoneController
+
+
+class FakePCM:
+    """Stands in for alsaaudio.PCM, producing one numbered period every few ms."""
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        FakePCM.instances += 1
+        self.period = 4
+        self.counter = 0
+
+    def setchannels(self, channels):
+        pass
+
+    def setrate(self, rate):
+        pass
+
+    def setformat(self, fmt):
+        pass
+
+    def setperiodsize(self, size):
+        self.period = size
+
+    def read(self):
+        time.sleep(0.002)
+        self.counter = (self.counter + 1) % 256
+        return self.period, bytes([self.counter]) * (self.period * 2)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_alsa():
+    FakePCM.instances = 0
+    fake = mock.MagicMock()
+    fake.PCM = FakePCM
+    with mock.patch('tjbot.microphone.microphone.alsaaudio', fake):
+        yield fake
+
+
+def _read_chunks(subscription, count):
+    return [bytes(subscription.read(timeout=1.0)) for _ in range(count)]
+
+
+def test_two_subscribers_share_one_device(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    mic.start()
+    try:
+        a = mic.subscribe()
+        b = mic.subscribe()
+        chunks_a = _read_chunks(a, 5)
+        chunks_b = _read_chunks(b, 5)
+        assert chunks_a == chunks_b
+        assert FakePCM.instances == 1
+    finally:
+        mic.stop()
+
+
+def test_pause_drops_audio_without_reopening(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    mic.start()
+    try:
+        sub = mic.subscribe()
+        _read_chunks(sub, 2)
+
+        mic.pause()
+        time.sleep(0.02)
+        # Drain anything captured before the pause took effect
+        while sub.read(timeout=0.01) is not None:
+            pass
+        assert sub.read(timeout=0.05) is None
+        assert mic.stream.dropped_while_paused > 0
+
+        mic.resume()
+        assert sub.read(timeout=1.0) is not None
+        assert FakePCM.instances == 1
+
+        gaps = mic.gaps
+        assert len(gaps) == 1
+        assert gaps[0].end is not None and gaps[0].end > gaps[0].start
+    finally:
+        mic.stop()
+
+
+def test_pause_before_start_is_honoured(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    mic.pause()
+    mic.start()
+    try:
+        assert mic.stream.paused
+        assert mic.gaps[0].end is None
+    finally:
+        mic.stop()
+
+
+def test_subscribe_prepends_preroll_without_gaps(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1, preroll_seconds=1.0)
+    mic.start()
+    try:
+        time.sleep(0.05)
+        chunk_bytes = mic.stream.chunk_bytes
+        sub = mic.subscribe(preroll_ms=3 * chunk_bytes / 2 / 16)
+        chunks = list(zip(range(6), sub.generator()))
+        data = b''.join(bytes(c) for _, c in chunks)
+        counters = [data[i] for i in range(0, len(data), chunk_bytes)]
+
+        # The pre-roll and live chunks form one continuous run of period counters
+        assert len(counters) == 8
+        assert all((b - a) % 256 == 1 for a, b in zip(counters, counters[1:]))
+    finally:
+        mic.stop()
+
+
+def test_stats_snapshot(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    mic.start()
+    try:
+        sub = mic.subscribe()
+        _read_chunks(sub, 3)
+        stats = mic.stats()
+        assert stats['running'] is True
+        assert stats['capture']['periods_read'] >= 3
+        assert stats['capture']['bytes_read'] >= 3 * mic.stream.chunk_bytes
+        assert stats['hub']['chunk_latency_ms']['count'] >= 3
+        assert sub.timestamp > 0
+    finally:
+        mic.stop()
+
+
+def test_measure_presets_reports_each_preset(fake_alsa):
+    mic = MicrophoneController()
+    mic.initialize(16000, 1)
+    results = mic.measure_presets(seconds=0.05, board='pi4')
+
+    assert set(results) == {'low-latency', 'balanced', 'low-cpu'}
+    for result in results.values():
+        assert result['wakeups_per_second'] > 0
+        assert result['cpu_percent'] >= 0
+    assert mic.stream is None
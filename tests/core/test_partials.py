@@ -0,0 +1,58 @@
+import time
+from tjbot.config.models import ListenConfig
+from tjbot.stt import STTController, STTEngine
+from tjbot.stt.partials import PartialResultFilter, stable_prefix
+
+def test_stable_prefix():
+    assert stable_prefix('turn the', 'turn the light on') == 'turn the'
+    assert stable_prefix('turn a light', 'turn the light') == 'turn'
+    assert stable_prefix('', 'hello') == ''
+
+def test_drops_repeated_partials():
+    partials = []
+    results = PartialResultFilter(partials.append)
+    for text in ('turn', 'turn', 'turn the', ' turn the ', 'turn the light'):
+        results.on_partial(text)
+
+    assert partials == ['turn', 'turn the', 'turn the light']
+    assert results.stable == 'turn the'
+    assert results.delta == 'light'
+    assert results.stats()['duplicates'] == 2
+
+def test_rate_limits_partials_but_not_finals():
+    partials = []
+    finals = []
+    results = PartialResultFilter(partials.append, finals.append, max_per_second=5)
+    for i in range(10):
+        results.on_partial('word ' * (i + 1))
+    results.on_final('done')
+    results.on_final('done')
+
+    assert len(partials) == 1
+    assert finals == ['done', 'done']
+    assert results.stats()['throttled'] == 9
+
+    time.sleep(0.25)
+    results.on_partial('again')
+    assert partials[-1] == 'again'
+
+class ChattyEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        for _ in audio_stream:
+            on_partial_result('hello')
+        on_final_result('hello')
+        return 'hello'
+
+def test_controller_filters_engine_callbacks():
+    config = ListenConfig.model_validate({'backend': {'local': {'vad': {'enabled': False}}}})
+    controller = STTController(config)
+    controller.engine = ChattyEngine()
+    received = []
+
+    controller.transcribe(iter([b'\x00\x00'] * 5), on_partial_result=received.append, on_final_result=received.append)
+
+    assert received == ['hello', 'hello']
+    assert controller.partial_filter.stats()['received'] == 5
@@ -0,0 +1,30 @@
+import wave
+from tjbot.microphone import PrerollBuffer
+
+def test_last_returns_most_recent_audio():
+    buf = PrerollBuffer(rate=1000, channels=1, seconds=0.005)  # 10 bytes
+    buf.write(b'\x01\x01\x02\x02\x03\x03')
+    buf.write(b'\x04\x04\x05\x05\x06\x06')
+
+    assert buf.last(5) == b'\x02\x02\x03\x03\x04\x04\x05\x05\x06\x06'
+    assert buf.last(2) == b'\x05\x05\x06\x06'
+    assert buf.seconds == 0.005
+
+def test_last_is_limited_to_what_was_captured():
+    buf = PrerollBuffer(rate=1000, channels=2, seconds=1)
+    buf.write(b'\x01\x00\x02\x00')
+    assert buf.last(500) == b'\x01\x00\x02\x00'
+
+def test_oversized_write_keeps_tail():
+    buf = PrerollBuffer(rate=1000, channels=1, seconds=0.002)  # 4 bytes
+    buf.write(b'\x01\x01\x02\x02\x03\x03')
+    assert buf.last(10) == b'\x02\x02\x03\x03'
+
+def test_save_wav(tmp_path):
+    buf = PrerollBuffer(rate=8000, channels=1, seconds=1)
+    buf.write(bytes(1600))
+    path = buf.save_wav(str(tmp_path / 'recent.wav'), 0.05)
+
+    with wave.open(path, 'rb') as wav_file:
+        assert wav_file.getframerate() == 8000
+        assert wav_file.getnframes() == 400
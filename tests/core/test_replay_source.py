@@ -0,0 +1,59 @@
+import time
+import wave
+import pytest
+import unittest.mock as mock
+from tjbot.microphone import ReplayAudioSource
+from tjbot.rpi_drivers import RPiCommonDriver
+from tjbot.stt import STTEngine
+
+def _write_wav(path, frames, rate=16000, channels=1):
+    with wave.open(str(path), 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(bytes(frames * channels * 2))
+
+def test_replays_wav_in_chunks(tmp_path):
+    path = tmp_path / 'audio.wav'
+    _write_wav(path, 2500, channels=2)
+
+    source = ReplayAudioSource(str(path), chunk_size=1000, realtime=False)
+    chunks = [bytes(c) for c in source]
+
+    assert source.rate == 16000
+    assert source.channels == 2
+    assert [len(c) for c in chunks] == [4000, 4000, 2000]
+    assert source.finished_at is not None
+
+def test_realtime_pacing():
+    source = ReplayAudioSource(bytes(1600 * 2), rate=16000, chunk_size=800, realtime=True)
+    start = time.monotonic()
+    list(source)
+    assert time.monotonic() - start >= 0.095
+
+def test_numpy_float_source():
+    np = pytest.importorskip("numpy")
+    source = ReplayAudioSource(np.array([0.0, 1.0, -1.0]), rate=8000, realtime=False)
+    assert bytes(next(source.generator())) == np.array([0, 32767, -32767], dtype='<i2').tobytes()
+
+def test_raw_source_requires_rate():
+    with pytest.raises(Exception):
+        ReplayAudioSource(b'\x00\x00')
+
+class EchoEngine(STTEngine):
+    def __init__(self):
+        super().__init__({})
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        return str(sum(len(bytes(c)) for c in audio_stream))
+
+def test_plugs_into_listen_for_transcript():
+    driver = RPiCommonDriver()
+    driver.stt_controller = mock.MagicMock()
+    driver.stt_controller.transcribe.side_effect = lambda stream, **kwargs: EchoEngine().transcribe(stream)
+
+    source = ReplayAudioSource(bytes(3200), rate=16000, realtime=False)
+    assert driver.listen_for_transcript(audio_source=source) == '3200'
+    kwargs = driver.stt_controller.transcribe.call_args.kwargs
+    assert kwargs['sample_rate'] == 16000
+    assert kwargs['channels'] == 1
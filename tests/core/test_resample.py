@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.audio import StreamingResampler, convert_audio_stream
+
+def _sine(freq, rate, seconds, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    x = (np.sin(2 * np.pi * freq * t) * 10000).astype(np.int16)
+    return np.repeat(x[:, None], channels, axis=1).tobytes()
+
+def test_streaming_matches_one_shot():
+    audio = _sine(440, 44100, 1.0, channels=2)
+
+    streamed = StreamingResampler(44100, 16000, 2, 1)
+    # Odd chunk size so chunks split frames
+    out = b''.join(streamed.process(audio[i:i + 4099]) for i in range(0, len(audio), 4099))
+
+    one_shot = StreamingResampler(44100, 16000, 2, 1).process(audio)
+    assert out == one_shot
+    assert len(out) // 2 == 16000
+
+def test_resampled_tone_keeps_frequency():
+    audio = _sine(1000, 44100, 1.0)
+    out = np.frombuffer(StreamingResampler(44100, 16000).process(audio), dtype=np.int16)
+
+    spectrum = np.abs(np.fft.rfft(out.astype(np.float64)))
+    assert np.argmax(spectrum) == 1000
+    assert abs(int(out[1000:].max()) - 10000) < 200
+
+def _gain_db(resampler, freq, input_rate):
+    out = np.frombuffer(resampler.process(_sine(freq, input_rate, 0.5)), dtype=np.int16)
+    # Skip the filter's start-up transient
+    rms = np.sqrt(np.mean(out[2000:].astype(np.float64) ** 2))
+    return 20 * np.log10(max(rms * np.sqrt(2), 1e-3) / 10000)
+
+@pytest.mark.parametrize('input_rate', [44100, 48000])
+def test_anti_alias_filter_response(input_rate):
+    # Passband: speech content up to 6 kHz passes within 0.1 dB, 7 kHz within 1 dB
+    for freq in (1000, 4000, 6000):
+        assert abs(_gain_db(StreamingResampler(input_rate, 16000), freq, input_rate)) < 0.1
+    assert _gain_db(StreamingResampler(input_rate, 16000), 7000, input_rate) > -1
+    # Stopband: tones that would alias back below 6 kHz are suppressed
+    for freq in (10000, 12000, 15000):
+        assert _gain_db(StreamingResampler(input_rate, 16000), freq, input_rate) < -60
+
+def test_downmix_only_averages_channels():
+    frames = np.array([[100, 300], [-50, 50]], dtype=np.int16).tobytes()
+    out = StreamingResampler(16000, 16000, 2, 1).process(frames)
+    assert np.frombuffer(out, dtype=np.int16).tolist() == [200, 0]
+
+def test_convert_audio_stream_passthrough():
+    chunks = [b'\x00\x01']
+    assert convert_audio_stream(chunks, 16000, 1, 16000, 1) is chunks
@@ -0,0 +1,79 @@
+import threading
+import pytest
+from tjbot.error import TJBotError
+from tjbot.microphone.ring_buffer import AudioRingBuffer
+
+def test_write_and_get_returns_memoryview():
+    buf = AudioRingBuffer(slot_size=4, capacity=2)
+    assert buf.write(b'abcd') is True
+    assert buf.write(b'ef') is True
+
+    chunk = buf.get()
+    assert isinstance(chunk, memoryview)
+    assert bytes(chunk) == b'abcd'
+    assert bytes(buf.get()) == b'ef'
+
+def test_drop_oldest_policy():
+    buf = AudioRingBuffer(slot_size=2, capacity=2, overrun_policy='drop-oldest')
+    buf.write(b'aa')
+    buf.write(b'bb')
+    buf.write(b'cc')
+
+    assert buf.overruns == 1
+    assert buf.dropped_bytes == 2
+    assert bytes(buf.get()) == b'bb'
+    assert bytes(buf.get()) == b'cc'
+
+def test_drop_newest_policy():
+    buf = AudioRingBuffer(slot_size=2, capacity=2, overrun_policy='drop-newest')
+    buf.write(b'aa')
+    buf.write(b'bb')
+    assert buf.write(b'cc') is False
+
+    assert buf.overruns == 1
+    assert bytes(buf.get()) == b'aa'
+    assert bytes(buf.get()) == b'bb'
+
+def test_held_chunk_is_not_overwritten():
+    buf = AudioRingBuffer(slot_size=2, capacity=1, overrun_policy='drop-oldest')
+    buf.write(b'aa')
+    held = buf.get()
+    buf.write(b'bb')
+    buf.write(b'cc')
+
+    assert bytes(held) == b'aa'
+    assert bytes(buf.get()) == b'cc'
+
+def test_block_policy_waits_for_reader():
+    buf = AudioRingBuffer(slot_size=2, capacity=1, overrun_policy='block')
+    buf.write(b'aa')
+
+    writer = threading.Thread(target=buf.write, args=(b'bb',))
+    writer.start()
+    writer.join(timeout=0.1)
+    assert writer.is_alive()
+
+    assert bytes(buf.get()) == b'aa'
+    writer.join(timeout=1.0)
+    assert not writer.is_alive()
+    assert bytes(buf.get()) == b'bb'
+
+def test_close_drains_then_returns_none():
+    buf = AudioRingBuffer(slot_size=2, capacity=2)
+    buf.write(b'aa')
+    buf.close()
+
+    assert bytes(buf.get()) == b'aa'
+    assert buf.get() is None
+    assert buf.write(b'bb') is False
+
+def test_get_timeout():
+    buf = AudioRingBuffer(slot_size=2, capacity=2)
+    assert buf.get(timeout=0.01) is None
+
+def test_invalid_arguments():
+    with pytest.raises(TJBotError):
+        AudioRingBuffer(slot_size=2, capacity=2, overrun_policy='nope')
+    buf = AudioRingBuffer(slot_size=2, capacity=2)
+    with pytest.raises(TJBotError):
+        buf.write(b'abc')
@@ -0,0 +1,284 @@
+import itertools
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.audio import EnergyVAD, VADSegmenter
+from tjbot.config.models import STTBackendLocalConfig, VADConfig
+from tjbot.stt.backends import sherpa_onnx_stt
+from tjbot.stt.backends.sherpa_onnx_stt import SherpaONNXSTTEngine, _FloatConverter, _is_streaming_model
+
+class FakeStream:
+    def __init__(self):
+        self.samples = []
+        self.finished = False
+
+    def accept_waveform(self, sample_rate, samples):
+        self.samples.extend(samples.tolist())
+
+    def input_finished(self):
+        self.finished = True
+
+class FakeRecognizer:
+    """Decodes every 4 samples; the hypothesis is one word per 8 samples."""
+    def __init__(self):
+        self.decoded = 0
+        self.results = 0
+
+    def create_stream(self):
+        return FakeStream()
+
+    def is_ready(self, stream):
+        return len(stream.samples) - self.decoded >= 4
+
+    def decode_stream(self, stream):
+        self.decoded += 4
+
+    def get_result(self, stream):
+        self.results += 1
+        return ' '.join(['word'] * (self.decoded // 8))
+
+    def is_endpoint(self, stream):
+        return False
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(SherpaONNXSTTEngine, '_initialize', lambda self: None)
+    engine = SherpaONNXSTTEngine(STTBackendLocalConfig())
+    engine.recognizer = FakeRecognizer()
+    return engine
+
+def test_conversion_reuses_buffer():
+    to_float = _FloatConverter()
+    first = to_float(np.array([0, 16384, -32768], dtype='<i2').tobytes())
+    assert first.tolist() == [0.0, 0.5, -1.0]
+    second = to_float(np.array([1, 2], dtype='<i2').tobytes())
+    assert np.shares_memory(first, second)
+
+    # Each transcribe() converts into its own buffer
+    other = _FloatConverter()(np.array([3, 4], dtype='<i2').tobytes())
+    assert not np.shares_memory(second, other)
+
+def test_partials_only_when_text_changes(engine):
+    partials = []
+    chunks = [bytes(4)] * 16  # 2 samples per chunk
+
+    final = engine.transcribe(iter(chunks), on_partial_result=partials.append)
+
+    assert partials == ['word', 'word word', 'word word word', 'word word word word']
+    assert final == 'word word word word'
+    # get_result is not called for chunks that did not trigger a decode
+    assert engine.recognizer.results == 9
+
+def test_partial_interval(engine):
+    engine.partial_interval_ms = 60000
+    partials = []
+    engine.transcribe(iter([bytes(4)] * 16), on_partial_result=partials.append)
+    assert partials == ['word']
+
+class EndpointRecognizer(FakeRecognizer):
+    """Reports an endpoint every endpoint_after decoded samples; the first silent_endpoints have no text."""
+    def __init__(self, endpoint_after, silent_endpoints=0):
+        super().__init__()
+        self.endpoint_after = endpoint_after
+        self.silent_endpoints = silent_endpoints
+        self.consumed = 0
+        self.streams = 0
+        self.resets = 0
+
+    def create_stream(self):
+        self.streams += 1
+        return super().create_stream()
+
+    def is_ready(self, stream):
+        return len(stream.samples) - self.consumed >= 4
+
+    def decode_stream(self, stream):
+        self.consumed += 4
+        self.decoded += 4
+
+    def get_result(self, stream):
+        if self.resets < self.silent_endpoints:
+            return ''
+        return super().get_result(stream)
+
+    def is_endpoint(self, stream):
+        return self.decoded >= self.endpoint_after
+
+    def reset(self, stream):
+        self.decoded = 0
+        self.resets += 1
+
+def test_endpoint_finalizes_endless_stream(engine):
+    engine.recognizer = EndpointRecognizer(endpoint_after=16, silent_endpoints=1)
+    finals = []
+
+    # The microphone never ends: the endpoint after speech ends the utterance
+    assert engine.transcribe(itertools.repeat(bytes(4)), on_final_result=finals.append) == 'word word'
+    assert engine.transcribe(itertools.repeat(bytes(4)), on_final_result=finals.append) == 'word word'
+
+    assert finals == ['word word', 'word word']
+    # The silent endpoint only reset the stream, and the stream was reused after each endpoint
+    assert engine.recognizer.resets == 3
+    assert engine.recognizer.streams == 1
+
+def test_endpoint_detection_disabled(engine):
+    engine.recognizer = EndpointRecognizer(endpoint_after=16)
+    engine.endpoint_detection = False
+    assert engine.transcribe(iter([bytes(4)] * 16)) == 'word word word word'
+
+class FakeOfflineStream:
+    def __init__(self):
+        self.result = type('Result', (), {'text': ''})()
+
+    def accept_waveform(self, sample_rate, samples):
+        self.result.text = f" {len(samples) // 1600} "
+
+class FakeOfflineRecognizer:
+    def create_stream(self):
+        return FakeOfflineStream()
+
+    def decode_stream(self, stream):
+        pass
+
+def test_offline_mode_decodes_segments(engine):
+    rate = 16000
+    tone = (np.sin(np.arange(rate) * 0.1) * 8000).astype('<i2').tobytes()
+    audio = tone + bytes(rate) + tone
+    engine.offline = True
+    engine.recognizer = FakeOfflineRecognizer()
+    engine.segmenter = VADSegmenter(EnergyVAD(rate), gap_ms=300, padding_ms=30)
+
+    partials = []
+    chunks = [audio[i:i + 2048] for i in range(0, len(audio), 2048)]
+    final = engine.transcribe(iter(chunks), on_partial_result=partials.append)
+
+    # Segments are ~1.3 s (speech + gap) and ~1.0 s, in tenths of a second
+    assert final == '13 10'
+    assert partials == ['13', '13 10']
+
+def test_concurrent_offline_calls_get_their_own_segmenter(engine):
+    idle = VADSegmenter(EnergyVAD(16000))
+    engine.segmenter = idle
+    engine._create_segmenter = lambda: VADSegmenter(EnergyVAD(16000))
+
+    first = engine._take_segmenter()
+    second = engine._take_segmenter()
+    assert first is idle
+    assert second is not idle
+
+    # A finished call leaves its segmenter for the next one
+    engine.offline = True
+    engine.recognizer = FakeOfflineRecognizer()
+    engine.transcribe(iter([bytes(3200)]))
+    used = engine.segmenter
+    assert used is not None
+    assert engine._take_segmenter() is used
+
+def test_offline_mode_ends_at_silence_when_vad_is_disabled(engine):
+    rate = 16000
+    tone = (np.sin(np.arange(rate) * 0.1) * 8000).astype('<i2').tobytes()
+    engine.backend_config = STTBackendLocalConfig(vad=VADConfig(enabled=False, hangoverMs=800))
+    engine.offline = True
+    engine.recognizer = FakeOfflineRecognizer()
+
+    def microphone():
+        yield from [tone[i:i + 2048] for i in range(0, len(tone), 2048)]
+        while True:
+            yield bytes(2048)
+
+    # listen() does not end the stream without VAD, so the engine stops at the silence itself
+    assert engine.transcribe(microphone()) == '13'
+
+def test_model_family_picks_online_or_offline():
+    assert not _is_streaming_model('/m/sherpa-onnx-whisper-base.en', None)
+    assert _is_streaming_model('/m/sherpa-onnx-streaming-zipformer-en-2023-06-26', 'joiner.onnx')
+    assert not _is_streaming_model('/m/sherpa-onnx-zipformer-en-2023-06-26/', 'joiner.onnx')
+    assert _is_streaming_model('/m/my-zipformer', 'joiner.onnx', 'streaming')
+    assert not _is_streaming_model('/m/sherpa-onnx-whisper-base.en', None, 'streaming')
+
+def test_offline_transducer_gets_an_offline_recognizer(monkeypatch, tmp_path):
+    model_dir = tmp_path / 'sherpa-onnx-zipformer-en-2023-06-26'
+    model_dir.mkdir()
+    for name in ('tokens.txt', 'encoder.onnx', 'decoder.onnx', 'joiner.onnx'):
+        (model_dir / name).write_text('')
+    created = []
+
+    class Recognizer:
+        @classmethod
+        def from_transducer(cls, **kwargs):
+            created.append((cls.__name__, kwargs))
+            return cls()
+
+    fake = type('sherpa_onnx', (), {
+        'OfflineRecognizer': type('OfflineRecognizer', (Recognizer,), {}),
+        'OnlineRecognizer': type('OnlineRecognizer', (Recognizer,), {}),
+    })
+    monkeypatch.setattr(sherpa_onnx_stt, 'sherpa_onnx', fake)
+    monkeypatch.setattr(SherpaONNXSTTEngine, '_create_segmenter', lambda self: None)
+
+    engine = SherpaONNXSTTEngine(STTBackendLocalConfig(model=str(model_dir)))
+    assert engine.offline
+    assert created[0][0] == 'OfflineRecognizer'
+    assert created[0][1]['joiner'].endswith('joiner.onnx')
+
+class FakeBatchRecognizer(FakeRecognizer):
+    """Tracks decoding per stream; the hypothesis is one word per 8 decoded samples."""
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def is_ready(self, stream):
+        return len(stream.samples) - getattr(stream, 'decoded', 0) >= 4
+
+    def decode_streams(self, streams):
+        self.batch_sizes.append(len(streams))
+        for stream in streams:
+            stream.decoded = getattr(stream, 'decoded', 0) + 4
+
+    def get_result(self, stream):
+        return ' '.join(['word'] * (getattr(stream, 'decoded', 0) // 8))
+
+    def is_endpoint(self, stream):
+        return getattr(stream, 'decoded', 0) >= 16
+
+    def reset(self, stream):
+        stream.decoded = 0
+
+def test_batch_decoder_serves_concurrent_streams():
+    import threading
+    from tjbot.stt.backends.sherpa_onnx_batch import SherpaBatchDecoder
+
+    recognizer = FakeBatchRecognizer()
+    decoder = SherpaBatchDecoder(recognizer)
+    handles = [decoder.open() for _ in range(4)]
+    results = {}
+
+    def run(i):
+        for _ in range(8 * (i + 1)):
+            decoder.feed(handles[i], bytes(8))
+        results[i] = decoder.finish(handles[i], timeout=5.0)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5.0)
+    decoder.close()
+
+    assert results == {i: ' '.join(['word'] * 4 * (i + 1)) for i in range(4)}
+    assert decoder.batched_streams == sum(recognizer.batch_sizes)
+
+def test_engine_uses_batch_decoder(engine):
+    from tjbot.stt.backends.sherpa_onnx_batch import SherpaBatchDecoder
+
+    engine.batch_decoder = SherpaBatchDecoder(FakeBatchRecognizer())
+    assert engine.transcribe(iter([bytes(4)] * 16)) == 'word word word word'
+    engine.batch_decoder.close()
+
+def test_batch_decoder_finishes_at_endpoint(engine):
+    from tjbot.stt.backends.sherpa_onnx_batch import SherpaBatchDecoder
+
+    engine.batch_decoder = SherpaBatchDecoder(FakeBatchRecognizer(), endpoint_detection=True)
+    assert engine.transcribe(itertools.repeat(bytes(4))) == 'word word'
+    engine.batch_decoder.close()
@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../benchmarks'))
+
+from stt_latency_benchmark import compare_to_baseline, run_benchmark, synthetic_corpus
+
+def _installed(*modules):
+    try:
+        return all(importlib.util.find_spec(module) for module in modules)
+    except ModuleNotFoundError:
+        return False
+
+def test_cloud_engines_run_against_standins():
+    # Google and Watson run their real SDK clients against the local servers; Azure's SDK is patched
+    backends = ['azure-stt']
+    if _installed('ibm_watson'):
+        backends.append('ibm-watson-stt')
+    if _installed('grpc', 'google.cloud.speech'):
+        backends.append('google-cloud-stt')
+    report = run_benchmark(
+        synthetic_corpus(count=1), backends + ['local'],
+        partial_ms=200, latency_ms=10.0, connect_ms=10.0
+    )
+
+    assert report['backends']['local'] == {'skipped': 'no --model given'}
+    for backend in backends:
+        utterance = report['backends'][backend]['utterances'][0]
+        assert utterance['transcript'] == 'word1 word2 word3 word4'
+        # A partial after 200 ms of speech; the final after the 800 ms VAD hangover
+        assert 200 <= utterance['first_partial_ms'] < 400
+        assert 800 <= utterance['final_ms'] < 1100
+        assert 0 < utterance['rtf'] < 1
+        assert set(report['backends'][backend]['summary']) == {'first_partial_ms', 'final_ms', 'rtf', 'cpu_ms_per_audio_s'}
+
+def test_compare_to_baseline_flags_slower_p50():
+    def report(final_ms, rtf):
+        return {'backends': {'azure-stt': {'summary': {
+            'final_ms': {'p50': final_ms}, 'rtf': {'p50': rtf}
+        }}}}
+
+    baseline = report(500.0, 0.05)
+    assert compare_to_baseline(report(590.0, 0.055), baseline) == []
+    regressions = compare_to_baseline(report(700.0, 0.08), baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('azure-stt final_ms')
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import pytest
+from tjbot.config.models import ListenConfig, STTBackendConfig
+from tjbot.error import TJBotError
+from tjbot.stt import STTController, STTEngine, clear_engine_cache, get_engine
+from tjbot.stt import backends
+
+class FakeEngine(STTEngine):
+    created = 0
+
+    def __init__(self, config=None):
+        super().__init__({})
+        self.backend_config = config
+        FakeEngine.created += 1
+
+    def transcribe(self, audio_stream, on_partial_result=None, on_final_result=None, on_error=None):
+        return 'hello'
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    monkeypatch.setattr(backends, 'FakeEngine', FakeEngine, raising=False)
+    monkeypatch.setitem(backends.BACKENDS, 'local', ('FakeEngine', 'local'))
+    FakeEngine.created = 0
+    clear_engine_cache()
+    yield
+    clear_engine_cache()
+
+def test_engines_are_shared_per_config(fake_backend):
+    a = STTController(ListenConfig())
+    b = STTController(ListenConfig())
+    assert a.engine is None
+
+    assert a.transcribe(iter([b'\x00\x00'])) == 'hello'
+    b.transcribe(iter([]))
+    assert a.engine is b.engine
+    assert FakeEngine.created == 1
+
+def test_different_configs_get_different_engines(fake_backend):
+    first = get_engine(STTBackendConfig.model_validate({'local': {'model': 'a'}}))
+    second = get_engine(STTBackendConfig.model_validate({'local': {'model': 'b'}}))
+    assert first is not second
+    assert second.backend_config.model == 'b'
+
+def test_warm_up_builds_engine_in_background(fake_backend):
+    controller = STTController(ListenConfig())
+    controller.warm_up().join(timeout=1.0)
+    assert isinstance(controller.engine, FakeEngine)
+
+def test_clearing_the_cache_closes_engines(fake_backend):
+    closed = []
+    engine = get_engine()
+    engine.close = lambda: closed.append(engine)
+
+    clear_engine_cache()
+    assert closed == [engine]
+    assert get_engine() is not engine
+
+def test_unknown_backend_type():
+    config = STTBackendConfig.model_construct(type='carrier-pigeon')
+    with pytest.raises(TJBotError):
+        get_engine(config)
+
+def test_backends_are_imported_lazily():
+    code = (
+        "import sys, tjbot.stt\n"
+        "assert not [m for m in sys.modules if m.startswith('tjbot.stt.backends.')]\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, '-c', code], check=True, env=env)
@@ -0,0 +1,70 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.audio import create_uplink_encoder
+
+def _speechlike(seconds=2, rate=16000):
+    t = np.arange(rate * seconds) / rate
+    return (np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) * 8000).astype('<i2').tobytes()
+
+def test_pcm_needs_no_encoder():
+    assert create_uplink_encoder('pcm', 16000) is None
+    assert create_uplink_encoder(None, 16000) is None
+
+def test_unsupported_encoding_falls_back_to_pcm():
+    assert create_uplink_encoder('ogg-opus', 16000, supported=('flac',)) is None
+
+def test_missing_soundfile_falls_back_to_pcm(monkeypatch):
+    from tjbot.audio import encode
+    monkeypatch.setattr(encode, 'sf', None)
+    assert create_uplink_encoder('flac', 16000) is None
+
+def test_flac_stream():
+    pytest.importorskip("soundfile")
+    encoder = create_uplink_encoder('flac', 16000)
+    pcm = _speechlike()
+
+    # Odd-sized chunks: samples split across chunks are carried over
+    chunks = [pcm[i:i + 1001] for i in range(0, len(pcm), 1001)]
+    out = list(encoder.process(chunks))
+
+    assert len(out) > 2
+    assert out[0].startswith(b'fLaC')
+    stats = encoder.stats()
+    assert stats['bytes_in'] == len(pcm)
+    assert stats['bytes_out'] == sum(len(o) for o in out)
+    assert stats['compression_ratio'] > 1.5
+
+def test_streamed_flac_matches_one_shot_file():
+    sf = pytest.importorskip("soundfile")
+    import io
+    encoder = create_uplink_encoder('flac', 16000)
+    pcm = _speechlike()
+
+    streamed = b''.join(encoder.process(pcm[i:i + 3200] for i in range(0, len(pcm), 3200)))
+    one_shot = io.BytesIO()
+    sf.write(one_shot, np.frombuffer(pcm, dtype='<i2'), 16000, format='FLAC', subtype='PCM_16')
+
+    # Identical apart from the STREAMINFO totals that only a seekable file gets at close
+    assert len(streamed) == len(one_shot.getvalue())
+    assert streamed[:8] == one_shot.getvalue()[:8]
+    assert streamed[42:] == one_shot.getvalue()[42:]
+
+def test_encoder_memory_stays_bounded(monkeypatch):
+    pytest.importorskip("soundfile")
+    from tjbot.audio import encode
+    held = []
+
+    class RecordingBuffer(encode._UplinkBuffer):
+        def take(self):
+            held.append(len(self._data))
+            return super().take()
+
+    monkeypatch.setattr(encode, '_UplinkBuffer', RecordingBuffer)
+    encoder = create_uplink_encoder('flac', 16000)
+    pcm = _speechlike(seconds=30)
+
+    total = sum(len(out) for out in encoder.process(pcm[i:i + 3200] for i in range(0, len(pcm), 3200)))
+    # Only the bytes produced since the previous chunk are ever held
+    assert max(held) < total // 20
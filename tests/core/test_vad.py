@@ -0,0 +1,79 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.audio import VADStage, VADSegmenter, EnergyVAD, create_vad
+from tjbot.config.models import VADConfig
+
+RATE = 16000
+
+def _tone(ms, amplitude=8000):
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (np.sin(2 * np.pi * 300 * t) * amplitude).astype(np.int16).tobytes()
+
+def _silence(ms):
+    return bytes(RATE * ms // 1000 * 2)
+
+def _chunks(audio, size=2048):
+    return [audio[i:i + size] for i in range(0, len(audio), size)]
+
+def test_energy_vad_classifies_frames():
+    vad = EnergyVAD(RATE, threshold=0.02)
+    loud = np.frombuffer(_tone(30), dtype=np.int16).astype(np.float32) / 32768.0
+    quiet = np.zeros(vad.frame_size, dtype=np.float32)
+    assert vad.is_speech(loud)
+    assert not vad.is_speech(quiet)
+
+def test_stage_trims_silence_and_ends_after_hangover():
+    stage = VADStage(EnergyVAD(RATE), hangover_ms=300, padding_ms=0)
+    audio = _silence(1000) + _tone(600) + _silence(2000) + _tone(600)
+
+    out = b''.join(stage.process(_chunks(audio)))
+    seconds = len(out) / 2 / RATE
+
+    # Speech plus roughly the hangover, without the leading silence or the second utterance
+    assert 0.85 <= seconds <= 1.0
+    assert np.abs(np.frombuffer(out[:960], dtype=np.int16)).max() > 1000
+
+def test_stage_keeps_padding_before_speech():
+    stage = VADStage(EnergyVAD(RATE), hangover_ms=300, padding_ms=150)
+    audio = _silence(1000) + _tone(300) + _silence(1000)
+
+    out = b''.join(stage.process(_chunks(audio)))
+    assert out[:960 * 5] == bytes(960 * 5)
+
+def test_create_vad_falls_back_to_energy():
+    vad = create_vad(VADConfig(model='does-not-exist.onnx'), RATE)
+    assert isinstance(vad, EnergyVAD)
+
+def test_segmenter_splits_at_pauses():
+    segmenter = VADSegmenter(EnergyVAD(RATE), gap_ms=300, padding_ms=90)
+    audio = _silence(500) + _tone(600) + _silence(500) + _tone(900) + _silence(100)
+
+    lengths = [len(s) / RATE for s in segmenter.segments(_chunks(audio))]
+
+    # Padding + speech + gap, then the trailing segment without a full gap
+    assert len(lengths) == 2
+    assert 0.95 <= lengths[0] <= 1.05
+    assert 0.95 <= lengths[1] <= 1.15
+
+def test_segmenter_caps_segment_length():
+    segmenter = VADSegmenter(EnergyVAD(RATE), max_segment_ms=500)
+    segments = list(segmenter.segments(_chunks(_tone(1200))))
+    assert [len(s) for s in segments[:2]] == [8160, 8160]
+
+def test_segmenter_ends_after_silence_following_speech():
+    segmenter = VADSegmenter(EnergyVAD(RATE), gap_ms=300, padding_ms=90, end_ms=800)
+
+    def microphone():
+        # Never ends on its own, like a live capture stream
+        yield from _chunks(_silence(1500) + _tone(600) + _silence(500) + _tone(600))
+        while True:
+            yield _silence(64)
+
+    audio = microphone()
+    lengths = [len(s) / RATE for s in segmenter.segments(audio)]
+
+    # Leading silence does not end it; both phrases are returned, then the stream is left alone
+    assert len(lengths) == 2
+    assert next(audio) == _silence(64)
@@ -0,0 +1,96 @@
+import itertools
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tjbot.config.models import ListenConfig, WakeWordConfig
+from tjbot.rpi_drivers import RPiCommonDriver
+from tjbot.stt import WakeWordDetector
+
+class FakeSpotterStream:
+    def __init__(self):
+        self.samples = 0
+
+    def accept_waveform(self, sample_rate, samples):
+        self.samples += len(samples)
+
+class FakeSpotter:
+    """Fires after 1000 samples have been decoded."""
+    def __init__(self):
+        self.decoded = 0
+
+    def create_stream(self):
+        return FakeSpotterStream()
+
+    def is_ready(self, stream):
+        return stream.samples - self.decoded >= 100
+
+    def decode_stream(self, stream):
+        self.decoded += 100
+
+    def get_result(self, stream):
+        return 'HEY_TJBOT' if self.decoded >= 1000 else ''
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(WakeWordDetector, '_initialize', lambda self: None)
+    detector = WakeWordDetector(WakeWordConfig(enabled=True, keywords=['hey tjbot']))
+    detector.spotter = FakeSpotter()
+    return detector
+
+def test_stops_reading_at_keyword(detector):
+    audio = iter([bytes(400)] * 10)  # 200 samples per chunk
+
+    assert detector.wait(audio) == 'hey tjbot'
+    # The rest of the stream is left for recognition
+    assert len(list(audio)) == 5
+
+def test_keeps_audio_read_before_keyword_fired(detector):
+    chunks = [bytes([i]) * 400 for i in range(10)]  # 12.5 ms per chunk
+    audio = iter(chunks)
+
+    assert detector.wait(audio, preroll_ms=25) == 'hey tjbot'
+    # The two chunks decoded last are replayed ahead of the rest of the stream
+    assert list(itertools.chain(detector.preroll, audio)) == chunks[3:]
+
+def test_preroll_covers_resampler_backlog(detector):
+    chunks = [bytes([i]) * (44100 * 2 // 100) for i in range(30)]  # 10 ms chunks at 44.1 kHz
+    audio = iter(chunks)
+
+    assert detector.wait(audio, sample_rate=44100, channels=1, preroll_ms=30) == 'hey tjbot'
+    replayed = list(itertools.chain(detector.preroll, audio))
+    # Contiguous tail of the input, reaching back at least 30 ms
+    assert replayed == chunks[len(chunks) - len(replayed):]
+    assert 3 <= len(detector.preroll) < 5
+
+def test_stream_end_without_keyword(detector):
+    assert detector.wait(iter([bytes(400)] * 2)) is None
+
+def test_resamples_microphone_audio(detector):
+    audio = iter([bytes(44100 * 2 // 10)] * 10)  # 100 ms chunks at 44.1 kHz
+    assert detector.wait(audio, sample_rate=44100, channels=1) == 'hey tjbot'
+    assert len(list(audio)) > 0
+
+def test_listen_waits_for_keyword(detector):
+    import unittest.mock as mock
+    driver = RPiCommonDriver()
+    driver.stt_controller = mock.MagicMock()
+    driver.stt_controller.transcribe.side_effect = lambda audio, **kwargs: len(list(audio))
+    driver.microphone_controller = mock.MagicMock(rate=16000, channels=1)
+    driver.microphone_controller.subscribe.return_value.__enter__.return_value.generator.return_value = iter([bytes(400)] * 10)
+    driver.wake_word_detector = detector
+
+    assert driver.listen_for_transcript() == 5
+
+def test_listen_replays_preroll_after_keyword(detector):
+    import unittest.mock as mock
+    driver = RPiCommonDriver()
+    driver.listen_config = ListenConfig(prerollMs=25)
+    driver.stt_controller = mock.MagicMock()
+    driver.stt_controller.transcribe.side_effect = lambda audio, **kwargs: len(list(audio))
+    driver.microphone_controller = mock.MagicMock(rate=16000, channels=1)
+    driver.microphone_controller.subscribe.return_value.__enter__.return_value.generator.return_value = iter([bytes(400)] * 10)
+    driver.wake_word_detector = detector
+
+    assert driver.listen_for_transcript() == 7
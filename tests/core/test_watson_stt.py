@@ -0,0 +1,181 @@
+import threading
+import time
+import pytest
+from tjbot.config.models import STTBackendIBMWatsonConfig
+from tjbot.error import TJBotError
+from tjbot.stt.backends import watson_stt
+from tjbot.stt.backends.watson_stt import IBMWatsonSTTEngine
+
+SPEECH = b'\x10\x27' * 1600
+SILENCE = bytes(3200)
+
+class FakeAudioSource:
+    def __init__(self, input, is_recording=False, is_buffer=False):
+        self.input = input
+        self.is_recording = is_recording
+
+    def completed_recording(self):
+        self.is_recording = False
+
+def _message(text, final):
+    return {'results': [{'alternatives': [{'transcript': text}], 'final': final}]}
+
+class FakeService:
+    """
+    Plays the service: an interim result for each speech chunk, and a final one at the first silence after speech.
+    """
+    def __init__(self, authenticator=None):
+        self.calls = []
+        self.authenticator = None
+
+    def recognize_using_websocket(self, audio, recognize_callback, **params):
+        # Like the SDK, which only accepts an AudioSource and a RecognizeCallback
+        if not isinstance(audio, FakeAudioSource):
+            raise Exception('audio is not of type AudioSource. Import the class from ibm_watson.websocket')
+        if not isinstance(recognize_callback, watson_stt.RecognizeCallback):
+            raise Exception('Callback is not a derived class of RecognizeCallback')
+        self.calls.append(params)
+        recognize_callback.on_listening()
+
+        speech = 0
+        while True:
+            chunk = audio.input.get()
+            if chunk == b'' and not audio.is_recording:
+                break
+            if chunk.strip(b'\x00'):
+                speech += len(chunk)
+                if params['interim_results']:
+                    recognize_callback.on_data(_message('hel', False))
+            elif speech:
+                recognize_callback.on_data(_message(f"{speech} bytes ", True))
+                speech = 0
+        if speech:
+            recognize_callback.on_data(_message(f"{speech} bytes ", True))
+        recognize_callback.on_close()
+
+@pytest.fixture
+def fake_sdk(monkeypatch):
+    service = FakeService()
+    monkeypatch.setattr(watson_stt, 'SpeechToTextV1', lambda authenticator=None: service)
+    monkeypatch.setattr(watson_stt, 'AudioSource', FakeAudioSource)
+    return service
+
+def test_config_is_passed_to_the_service(fake_sdk):
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig(
+        model='en-US_Multimedia', inactivityTimeout=-1, backgroundAudioSuppression=0.4, interimResults=False
+    ))
+    partials = []
+
+    assert engine.transcribe([SPEECH, SPEECH], on_partial_result=partials.append) == '6400 bytes '
+    assert partials == []
+    params = fake_sdk.calls[0]
+    assert params['model'] == 'en-US_Multimedia'
+    assert params['inactivity_timeout'] == -1
+    assert params['background_audio_suppression'] == 0.4
+    assert params['interim_results'] is False
+
+def test_each_transcribe_gets_its_own_websocket(fake_sdk):
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig())
+    finals = []
+
+    assert engine.transcribe([SPEECH, SILENCE, SPEECH], on_final_result=finals.append) == '3200 bytes 3200 bytes '
+    assert engine.transcribe([SPEECH]) == '3200 bytes '
+    assert finals == ['3200 bytes ', '3200 bytes ']
+    assert len(fake_sdk.calls) == 2
+
+def test_persistent_session_reuses_one_websocket(fake_sdk):
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig(persistentSession=True))
+    partials, finals = [], []
+
+    first = engine.transcribe([SILENCE, SPEECH, SPEECH], partials.append, finals.append)
+    second = engine.transcribe([SPEECH], partials.append, finals.append)
+    engine.close()
+
+    # Each utterance ends with the service's final result for it, on the same websocket
+    assert (first, second) == ('6400 bytes ', '3200 bytes ')
+    assert finals == ['6400 bytes ', '3200 bytes ']
+    assert partials == ['hel'] * 3
+    assert len(fake_sdk.calls) == 1
+    assert fake_sdk.calls[0]['inactivity_timeout'] == -1
+    assert engine.stats()['finalize_ms']['count'] == 2
+
+def test_persistent_session_waits_for_every_phrase(fake_sdk):
+    def recognize(audio, recognize_callback, **params):
+        recognize_callback.on_listening()
+        flushed = False
+        while True:
+            chunk = audio.input.get()
+            if chunk == b'' and not audio.is_recording:
+                break
+            if not chunk.strip(b'\x00') and not flushed:
+                # Two phrases, both finalized after the utterance's audio has ended
+                flushed = True
+                recognize_callback.on_data(_message('one ', True))
+                recognize_callback.on_data(_message('tw', False))
+                time.sleep(0.2)
+                recognize_callback.on_data(_message('two ', True))
+        recognize_callback.on_close()
+
+    fake_sdk.recognize_using_websocket = recognize
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig(persistentSession=True))
+    finals = []
+
+    assert engine.transcribe([SPEECH], on_final_result=finals.append) == 'one two '
+    engine.close()
+    assert finals == ['one ', 'two ']
+    assert engine.stats()['finalize_ms']['count'] == 1
+
+def test_persistent_session_applies_backpressure(fake_sdk, monkeypatch):
+    monkeypatch.setattr(watson_stt, 'SESSION_QUEUE_CHUNKS', 2)
+    release = threading.Event()
+    fake_sdk.recognize_using_websocket = lambda audio, recognize_callback, **params: release.wait()
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig(persistentSession=True))
+
+    sent = []
+    def audio():
+        for i in range(5):
+            sent.append(i)
+            yield SPEECH
+
+    errors = []
+    def transcribe():
+        try:
+            engine.transcribe(audio())
+        except TJBotError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=transcribe, daemon=True)
+    thread.start()
+    thread.join(1.0)
+
+    # The producer is held once the queue is full instead of buffering everything
+    assert thread.is_alive()
+    assert len(sent) == 3
+
+    # The websocket closing releases the producer with an error
+    release.set()
+    thread.join(2.0)
+    assert len(errors) == 1
+
+def test_concurrent_turns_do_not_share_the_session(fake_sdk):
+    engine = IBMWatsonSTTEngine(STTBackendIBMWatsonConfig(persistentSession=True))
+    release = threading.Event()
+    results = {}
+
+    def held_audio():
+        yield SPEECH
+        release.wait(2.0)
+        yield SPEECH
+
+    held = threading.Thread(target=lambda: results.update(held=engine.transcribe(held_audio())))
+    held.start()
+    time.sleep(0.1)
+
+    # The second caller gets a websocket of its own instead of interleaving its audio
+    results['other'] = engine.transcribe([SPEECH])
+    release.set()
+    held.join(5.0)
+    engine.close()
+
+    assert results == {'held': '6400 bytes ', 'other': '3200 bytes '}
+    assert len(fake_sdk.calls) == 2